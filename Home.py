@@ -4,7 +4,12 @@ from glucose_cgm_agents import extract_pdf_text, run_cgm_analysis
 import tempfile
 import os
 import json
+from profiling import profile_page_start, profile_page_end
+from llm_meter import set_llm_user, user_totals, user_budget
+from model_router import preload_llm_libraries
 
+profile_page_start("Home")
+preload_llm_libraries()
 st.set_page_config(page_title="🏠 Glucose Dashboard", layout="wide")
 
 # === Login Form ===
@@ -16,10 +21,16 @@ if "user" not in st.session_state:
             st.session_state["user"] = username
             st.success(f"Welcome back, {username}!")
             st.rerun()
+    profile_page_end()
     st.stop()
 
 # === Logout Button ===
 st.sidebar.success(f"Logged in as: {st.session_state['user']}")
+set_llm_user(st.session_state["user"])
+spent_usd, spent_tokens = user_totals()
+budget_usd, budget_tokens = user_budget()
+st.sidebar.caption(f"AI usage this month: ${spent_usd:.2f}" + (f" of ${budget_usd:.2f}" if budget_usd else "") +
+                   f", {spent_tokens:,} tokens" + (f" of {budget_tokens:,}" if budget_tokens else ""))
 if st.sidebar.button("Logout"):
     st.session_state.clear()
     st.rerun()
@@ -126,3 +137,5 @@ for i in range(0, len(hacks), 3):
                         <p style="font-size: 14px; color: #444;">{hack['desc']}</p>
                     </div>
                 """, unsafe_allow_html=True)
+
+profile_page_end()
@@ -0,0 +1,248 @@
+import os
+import time
+import threading
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from cache_store import PersistentLRUCache
+from tracing import span
+from resilience import NotProviderFailure
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('api_scheduler')
+
+def _env_number(name, default):
+    value = os.getenv(name)
+    return float(value) if value else default
+
+# Per-provider request rate (tokens per second), burst size and optional
+# monthly quota. Quotas are shared by every user of this deployment.
+PROVIDERS = {
+    "places": {
+        "rate": _env_number("PLACES_RATE_PER_SECOND", 10),
+        "burst": 10,
+        "monthly_quota": _env_number("PLACES_MONTHLY_QUOTA", None)
+    },
+    "serper": {
+        "rate": _env_number("SERPER_RATE_PER_SECOND", 5),
+        "burst": 5,
+        "monthly_quota": _env_number("SERPER_MONTHLY_QUOTA", None)
+    },
+    "serpapi": {
+        "rate": _env_number("SERPAPI_RATE_PER_SECOND", 1),
+        "burst": 3,
+        "monthly_quota": _env_number("SERPAPI_MONTHLY_QUOTA", None)
+    },
+    # Nominatim usage policy: an absolute maximum of 1 request per second
+    "nominatim": {
+        "rate": 1,
+        "burst": 1,
+        "monthly_quota": None
+    }
+}
+INTERACTIVE = "interactive"
+PREFETCH = "prefetch"
+# Prefetch calls stop once this share of a monthly quota is used, leaving
+# the rest for interactive requests
+PREFETCH_QUOTA_SHARE = 0.9
+# Seconds a provider is paused after it answers with HTTP 429
+RATE_LIMITED_BACKOFF = 5.0
+USAGE_FLUSH_SECONDS = 5.0
+
+_priority = ContextVar("api_priority", default=INTERACTIVE)
+
+class QuotaExceeded(NotProviderFailure):
+    pass
+
+class RateLimitTimeout(NotProviderFailure):
+    pass
+
+def _is_rate_limited(result):
+    """HTTP 429, or a Google API answering OVER_QUERY_LIMIT in an HTTP 200 body"""
+    status_code = getattr(result, 'status_code', None)
+    if status_code == 429:
+        return True
+    return (status_code == 200 and 'json' in (getattr(result, 'headers', None) or {}).get('Content-Type', '')
+            and '"OVER_QUERY_LIMIT"' in (getattr(result, 'text', '') or ''))
+
+@contextmanager
+def prefetch_priority():
+    """Mark API calls made in this block (and this thread) as prefetch work"""
+    token = _priority.set(PREFETCH)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self):
+        """Seconds until a token is available"""
+        paused = max(0.0, self.paused_until - time.monotonic())
+        if paused:
+            return paused
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+class ApiScheduler:
+    """
+    Token-bucket scheduler for outbound API calls. Every call takes a token
+    from its provider's bucket, waiting if none is left. Interactive calls
+    go first: prefetch calls wait while any interactive call is waiting and
+    stop before the monthly quota is used up. Usage is counted per provider
+    and month and persisted under CACHE_DIR.
+    """
+    def __init__(self, providers=PROVIDERS):
+        self.providers = providers
+        self._cond = threading.Condition()
+        self._buckets = {name: TokenBucket(limits["rate"], limits["burst"]) for name, limits in providers.items()}
+        self._interactive_waiting = {name: 0 for name in providers}
+        self._usage_store = PersistentLRUCache("api_usage", max_entries=1000)
+        self._usage = {}
+        self._dirty = False
+        self._flushed_at = time.monotonic()
+
+    def _usage_for(self, provider):
+        key = f"{provider}|{time.strftime('%Y-%m')}"
+        usage = self._usage.get(key)
+        if usage is None:
+            usage = self._usage[key] = dict(self._usage_store.get(key) or {
+                'calls': 0, 'prefetch_calls': 0, 'waits': 0, 'wait_seconds': 0.0, 'rate_limited': 0, 'rejected': 0
+            })
+        return key, usage
+
+    def _take_unflushed(self, force=False):
+        """Copies of the usage counters to persist, or None; called with the condition held"""
+        if self._dirty and (force or time.monotonic() - self._flushed_at >= USAGE_FLUSH_SECONDS):
+            self._dirty = False
+            self._flushed_at = time.monotonic()
+            return {key: dict(usage) for key, usage in self._usage.items()}
+        return None
+
+    def _flush(self, unflushed):
+        """Persist what _take_unflushed returned; called without the condition held"""
+        if unflushed:
+            self._usage_store.set_many(unflushed)
+
+    def _check_quota(self, provider, prefetch):
+        quota = self.providers[provider]["monthly_quota"]
+        if not quota:
+            return
+        _, usage = self._usage_for(provider)
+        limit = quota * PREFETCH_QUOTA_SHARE if prefetch else quota
+        if usage['calls'] >= limit:
+            usage['rejected'] += 1
+            self._dirty = True
+            raise QuotaExceeded(f"Monthly {provider} quota used ({usage['calls']}/{int(quota)})")
+
+    def acquire(self, provider, max_wait=None):
+        """
+        Block until a call to provider is allowed. Raises QuotaExceeded when
+        the monthly quota is used, or RateLimitTimeout after max_wait seconds.
+        """
+        if provider not in self.providers:
+            raise ValueError(f"Unknown API provider: {provider}")
+        prefetch = _priority.get() == PREFETCH
+        started = time.monotonic()
+        give_up_at = None if max_wait is None else started + max_wait
+
+        with self._cond:
+            self._check_quota(provider, prefetch)
+            bucket = self._buckets[provider]
+            if not prefetch:
+                self._interactive_waiting[provider] += 1
+            try:
+                while True:
+                    bucket.refill()
+                    blocked_by_interactive = prefetch and self._interactive_waiting[provider] > 0
+                    wait = bucket.wait_time()
+                    if wait == 0 and not blocked_by_interactive:
+                        bucket.tokens -= 1
+                        break
+                    if blocked_by_interactive:
+                        wait = max(wait, 1 / bucket.rate)
+                    if give_up_at is not None:
+                        remaining = give_up_at - time.monotonic()
+                        if remaining <= 0:
+                            raise RateLimitTimeout(f"No {provider} capacity within {max_wait:.1f}s")
+                        wait = min(wait, remaining)
+                    self._cond.wait(wait)
+            finally:
+                if not prefetch:
+                    self._interactive_waiting[provider] -= 1
+                    self._cond.notify_all()
+
+            waited = time.monotonic() - started
+            _, usage = self._usage_for(provider)
+            usage['calls'] += 1
+            if prefetch:
+                usage['prefetch_calls'] += 1
+            if waited > 0.01:
+                usage['waits'] += 1
+                usage['wait_seconds'] = round(usage['wait_seconds'] + waited, 3)
+            self._dirty = True
+            unflushed = self._take_unflushed()
+        self._flush(unflushed)
+
+    def report_rate_limited(self, provider):
+        """Pause a provider after it rejected a call as over its rate limit"""
+        with self._cond:
+            bucket = self._buckets[provider]
+            bucket.tokens = 0
+            bucket.paused_until = time.monotonic() + RATE_LIMITED_BACKOFF
+            _, usage = self._usage_for(provider)
+            usage['rate_limited'] += 1
+            self._dirty = True
+        logger.warning(f"{provider} is rate limiting; pausing calls for {RATE_LIMITED_BACKOFF}s")
+
+    def call(self, provider, fn, *args, max_wait=None, **kwargs):
+        """Acquire a token for provider, then return fn(*args, **kwargs)"""
+        with span("api_call", provider=provider, priority=_priority.get()) as call_span:
+            started = time.monotonic()
+            self.acquire(provider, max_wait=max_wait)
+            call_span.set(wait_ms=round((time.monotonic() - started) * 1000, 1))
+            result = fn(*args, **kwargs)
+            status_code = getattr(result, 'status_code', None)
+            if status_code is not None:
+                call_span.set(status=status_code)
+            if _is_rate_limited(result):
+                # Circuit breakers count a marked result as a failure
+                result.rate_limited = True
+                self.report_rate_limited(provider)
+            return result
+
+    def usage_report(self):
+        """This month's usage, quota and available tokens per provider"""
+        with self._cond:
+            report = {}
+            for provider, limits in self.providers.items():
+                _, usage = self._usage_for(provider)
+                bucket = self._buckets[provider]
+                bucket.refill()
+                quota = limits["monthly_quota"]
+                report[provider] = dict(usage, monthly_quota=quota,
+                                        remaining=max(0, int(quota - usage['calls'])) if quota else None,
+                                        tokens=round(bucket.tokens, 2))
+            unflushed = self._take_unflushed(force=True)
+        self._flush(unflushed)
+        return report
+
+scheduler = ApiScheduler()
+
+def api_call(provider, fn, *args, max_wait=None, **kwargs):
+    """Run an outbound API call through the shared scheduler"""
+    return scheduler.call(provider, fn, *args, max_wait=max_wait, **kwargs)
+
+def api_usage():
+    return scheduler.usage_report()
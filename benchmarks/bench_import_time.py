@@ -0,0 +1,120 @@
+"""
+Import cost of each Streamlit page: the time a fresh process spends on the
+page's top-level imports (what every new server process and every reload
+of a changed module pays before the page can render), measured with
+python -X importtime. Streamlit itself is imported first and not counted,
+since the server has it loaded already.
+
+For every page, reports the best of --repeat runs and the packages that
+took the longest. With --max-ms the script exits with status 1 when a page
+is over budget, so it can guard against regressions in CI.
+
+Usage:
+    python benchmarks/bench_import_time.py [--repeat 3] [--top 8] [--max-ms 1500] [--max-ms Travel=2000] [--json]
+"""
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+PAGES = {
+    "Home": "Home.py",
+    "Travel": "pages/Travel.py",
+    "Chat": "pages/Chat.py",
+    "Menu_Analyzer": "pages/Menu_Analyzer.py"
+}
+MARKER = "import time: -- page imports --"
+
+def page_imports(path):
+    """The top-level import statements of a page script, as source"""
+    with open(os.path.join(ROOT, path)) as f:
+        tree = ast.parse(f.read())
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+def parse_importtime(stderr):
+    """
+    -X importtime lines -> (total seconds, {top-level package: seconds}).
+    Only modules imported after the MARKER line count.
+    """
+    total, packages, counting = 0.0, {}, False
+    for line in stderr.splitlines():
+        if line == MARKER:
+            counting = True
+            continue
+        if not counting or not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # the header line
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0.0) + int(self_us) / 1e6
+        if not name.startswith("  "):
+            total += int(cumulative_us) / 1e6
+    return total, packages
+
+def measure(page, path):
+    # Streamlit is loaded first; the marker separates its imports from the page's
+    code = (f"import sys; sys.path.insert(0, {ROOT!r})\n"
+            "import streamlit, streamlit.runtime.scriptrunner\n"
+            f"sys.stderr.write({MARKER + chr(10)!r}); sys.stderr.flush()\n" + page_imports(path))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"exit status {result.returncode}"
+        raise RuntimeError(f"{page}: {error}")
+    return parse_importtime(result.stderr)
+
+def parse_budgets(values):
+    """['1500', 'Travel=2000'] -> {'*': 1.5, 'Travel': 2.0} in seconds"""
+    budgets = {}
+    for value in values or []:
+        page, _, ms = value.rpartition("=")
+        budgets[page or "*"] = float(ms) / 1000
+    return budgets
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per page; the fastest counts")
+    parser.add_argument("--top", type=int, default=8, help="packages listed per page")
+    parser.add_argument("--max-ms", action="append", help="import budget for every page, or PAGE=ms for one")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    budgets = parse_budgets(args.max_ms)
+    results = {}
+    for page, path in PAGES.items():
+        try:
+            runs = [measure(page, path) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            results[page] = {"error": str(e)}
+            continue
+        total, packages = min(runs, key=lambda run: run[0])
+        top = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]
+        results[page] = {"import_ms": round(total * 1000, 1),
+                         "packages_ms": {package: round(seconds * 1000, 1) for package, seconds in top}}
+        budget = budgets.get(page, budgets.get("*"))
+        if budget is not None:
+            results[page]["budget_ms"] = budget * 1000
+            results[page]["over_budget"] = total > budget
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for page, row in results.items():
+            if "error" in row:
+                print(f"{page:<14} failed: {row['error']}")
+                continue
+            verdict = ""
+            if "budget_ms" in row:
+                verdict = f"  {'OVER' if row['over_budget'] else 'within'} budget of {row['budget_ms']:.0f} ms"
+            print(f"{page:<14} {row['import_ms']:>8.1f} ms{verdict}")
+            print("    " + ", ".join(f"{package} {ms:.1f}" for package, ms in row["packages_ms"].items()))
+    if any(row.get("over_budget") or "error" in row for row in results.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Per-call overhead of the crewai LLM tasks, measured against the stub chat
+completions endpoint in stub_services.py with no added latency, so the
+time is the app's own work plus a local round trip. Compares:
+
+  per-call  LLM (and its OpenAI clients and connections) built for every
+            call, verbose agents (LLM_POOL_MAX_IDLE=0, AGENT_VERBOSE=1)
+  verbose   pooled LLMs, verbose agents
+  pooled    pooled LLMs, quiet agents (the default)
+
+Each configuration runs in its own process, since both settings are read
+at import. Agent output is discarded, as it would be by a log pipe.
+
+Usage:
+    python benchmarks/bench_llm_call_overhead.py [--calls 30] [--json]
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from stub_services import StubServices
+from bench_travel_pipeline import summarize, GLUCOSE_SUMMARY
+from bench_model_routing import MENU_TEXT
+
+CONFIGURATIONS = {
+    "per-call": {"LLM_POOL_MAX_IDLE": "0", "AGENT_VERBOSE": "1"},
+    "verbose": {"AGENT_VERBOSE": "1"},
+    "pooled": {}
+}
+
+def measure(calls, output):
+    """Child process: time the LLM tasks and write the results to output"""
+    stubs = StubServices(0).start()
+    os.environ.update(stubs.env(), CACHE_DIR=tempfile.mkdtemp(prefix="overhead-bench-"), OPENAI_API_KEY="stub-key",
+                      LLM_USER_MONTHLY_BUDGET_USD="0", LLM_USER_MONTHLY_TOKEN_BUDGET="0")
+    logging.disable(logging.WARNING)
+    from glucose_cgm_agents import analyze_menu
+    from pages.glucose_chat_agent import get_glucose_advice
+    from model_router import router
+    from llm_meter import usage_report
+
+    tasks = {
+        "get_glucose_advice": lambda i: get_glucose_advice(f"Snack before a walk, option {i}?"),
+        "analyze_menu": lambda i: analyze_menu(f"{MENU_TEXT}, Special {i}", GLUCOSE_SUMMARY)
+    }
+    results = {}
+    try:
+        for name, call in tasks.items():
+            call(-1)  # first call pays for imports and lazy setup
+            timings = []
+            for i in range(calls):
+                start = time.perf_counter()
+                call(i)
+                timings.append(time.perf_counter() - start)
+            results[name] = summarize(timings)
+    finally:
+        stubs.stop()
+    usage = usage_report().get("anonymous", {})
+    results["llm_clients_built"] = router.pool.created
+    results["connections"] = stubs.connections
+    results["llm_requests"] = stubs.counts["llm"]["requests"]
+    results["metered_tokens_per_call"] = {feature: round(totals["total_tokens"] / totals["calls"])
+                                          for feature, totals in usage.items()}
+    with open(output, "w") as f:
+        json.dump(results, f)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=30, help="timed calls per task")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        measure(args.calls, args.child)
+        return
+
+    results = {}
+    for name, env in CONFIGURATIONS.items():
+        with tempfile.NamedTemporaryFile(suffix=".json") as output:
+            child = subprocess.run([sys.executable, __file__, "--calls", str(args.calls), "--child", output.name],
+                                   env=dict(os.environ, **env), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            if child.returncode != 0:
+                print(f"{name}: failed\n{child.stderr.decode(errors='replace')[-2000:]}")
+                return
+            results[name] = json.load(open(output.name))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{args.calls} calls per task, stub LLM with no added latency")
+    print(f"{'config':<10} {'task':<20} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for name, row in results.items():
+        for task in ("get_glucose_advice", "analyze_menu"):
+            stats = row[task]
+            print(f"{name:<10} {task:<20} {stats['mean_ms']:>9.1f} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f}")
+    for name, row in results.items():
+        print(f"{name}: {row['llm_clients_built']} LLM clients built and {row['connections']} connections opened "
+              f"for {row['llm_requests']} LLM requests; tokens metered per call {row['metered_tokens_per_call']}")
+
+if __name__ == "__main__":
+    main()
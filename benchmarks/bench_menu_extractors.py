@@ -0,0 +1,75 @@
+"""
+Compare the BeautifulSoup menu extractor (real_menu_fetcher.parse_menu_items_from_html)
+with the single-pass extractor (menu_html_extractor.extract_menu_items) on saved pages.
+
+Usage:
+    python benchmarks/bench_menu_extractors.py [--pages DIR] [--repeat N] [--synthetic 200,800,3200]
+"""
+import argparse
+import glob
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from real_menu_fetcher import parse_menu_items_from_html
+from menu_html_extractor import extract_menu_items
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def synthetic_page(n_items, depth=12):
+    """
+    A large page of nested divs without menu class names, which sends the
+    BeautifulSoup extractor to its last fallback (get_text() on every div)
+    """
+    wrappers_open = ''.join(f'<div class="wrap-{i}">' for i in range(depth))
+    wrappers_close = '</div>' * depth
+    items = ''.join(
+        f'<div class="row"><div class="col"><span>Dish number {i} with seasonal vegetables</span>'
+        f'<span>${i % 30 + 5}.00</span></div></div>'
+        for i in range(n_items)
+    )
+    return (f'<html><body>{wrappers_open}<p>Our menu changes with the seasons.</p>'
+            f'<div class="grid">{items}</div>{wrappers_close}</body></html>')
+
+def time_extractor(extractor, html, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = extractor(html)
+        timings.append(time.perf_counter() - start)
+    items = result[0] if isinstance(result, tuple) and result[0] else []
+    return statistics.median(timings), len(items)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", default=FIXTURES_DIR, help="directory of saved .html pages")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per page (median is reported)")
+    parser.add_argument("--synthetic", default="200,800,3200", help="sizes of generated nested pages, or '' to skip")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    pages = [(os.path.basename(path), open(path, encoding="utf-8", errors="replace").read())
+             for path in sorted(glob.glob(os.path.join(args.pages, "*.html")))]
+    for size in filter(None, args.synthetic.split(",")):
+        pages.append((f"synthetic-{size}", synthetic_page(int(size))))
+
+    print(f"{'page':<32} {'KB':>7} {'legacy ms':>10} {'items':>6} {'single-pass ms':>15} {'items':>6} {'speedup':>8}")
+    totals = [0.0, 0.0]
+    for name, html in pages:
+        legacy_time, legacy_items = time_extractor(parse_menu_items_from_html, html, args.repeat)
+        fast_time, fast_items = time_extractor(extract_menu_items, html, args.repeat)
+        totals[0] += legacy_time
+        totals[1] += fast_time
+        print(f"{name:<32} {len(html) / 1024:>7.1f} {legacy_time * 1000:>10.1f} {legacy_items:>6} "
+              f"{fast_time * 1000:>15.1f} {fast_items:>6} {legacy_time / max(fast_time, 1e-9):>7.1f}x")
+    print(f"{'total':<32} {'':>7} {totals[0] * 1000:>10.1f} {'':>6} {totals[1] * 1000:>15.1f} {'':>6} "
+          f"{totals[0] / max(totals[1], 1e-9):>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Latency, errors and LLM cost of the app's LLM tasks with the models each
+task was hard-wired to (MODEL_ROUTING=fixed) against latency-aware routing
+(model_router), run against the stub chat completions endpoint in
+stub_services.py with a latency and failure rate per model.
+
+Each task class makes --calls calls in both modes; the router's learned
+latencies and the circuit breakers are reset between modes. Cost is the
+metered cost from llm_meter at the stub's token counts and the list
+prices in MODEL_PRICES.
+
+Usage:
+    python benchmarks/bench_model_routing.py [--calls 20] [--concurrency 2]
+        [--model-latency gpt-4=2.5,gpt-4o=1.2,gpt-4.1=1.5,gpt-4.1-mini=0.8,gpt-4o-mini=0.5,gpt-3.5-turbo=0.4]
+        [--model-failure-rate gpt-4o-mini=0.1] [--json]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from stub_services import StubServices, parse_model_values
+from bench_travel_pipeline import summarize, GLUCOSE_SUMMARY
+
+# Latencies loosely shaped like the hosted models: the larger, the slower
+DEFAULT_MODEL_LATENCY = "gpt-4=2.5,gpt-4o=1.2,gpt-4.1=1.5,gpt-4.1-mini=0.8,gpt-4o-mini=0.5,gpt-3.5-turbo=0.4"
+MENU_TEXT = "Butter chicken, Garlic naan, Chicken biryani, Tandoori salmon, Dal tadka, Mango lassi"
+CGM_TEXT = (
+    "CGM report, 14 days. Average glucose 118 mg/dL. Time in range 86%.\n"
+    "Breakfast pancakes with syrup: peak 192 mg/dL after 45 minutes.\n"
+    "Lunch grilled chicken salad: peak 121 mg/dL.\n"
+    "Dinner white rice and curry: peak 178 mg/dL, back to baseline after 2 hours."
+)
+
+def task_calls():
+    """task class -> function making one call of it with the i-th input"""
+    from glucose_cgm_agents import run_cgm_analysis, analyze_menu
+    from google_menu_search_agent import simulate_menu
+    from pages.glucose_chat_agent import get_glucose_advice
+
+    return {
+        "chat_advice": lambda i: get_glucose_advice(f"What should I eat before a walk, option {i}?"),
+        "menu_simulation": lambda i: simulate_menu(f"Stub Bistro {i}", "Indian"),
+        "menu_analysis": lambda i: analyze_menu(f"{MENU_TEXT}, Special {i}", GLUCOSE_SUMMARY),
+        "extraction": lambda i: run_cgm_analysis(f"{CGM_TEXT}\nDay {i}.")
+    }
+
+def run_mode(mode, calls, concurrency, tasks):
+    import resilience
+    from model_router import router
+    from llm_meter import set_llm_user, usage_report
+
+    router.mode = mode
+    router.reset()
+    with resilience._breakers_lock:
+        resilience._breakers.clear()
+    user = f"bench-{mode}-{int(time.time())}"
+
+    results = {}
+    for task_class, call in tasks.items():
+        timings, errors = [], 0
+
+        def one(i):
+            nonlocal errors
+            set_llm_user(user)
+            start = time.perf_counter()
+            try:
+                call(i)
+            except Exception:
+                errors += 1
+            timings.append(time.perf_counter() - start)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(one, range(calls)))
+        results[task_class] = {"latency": summarize(timings), "errors": errors}
+
+    usage = usage_report(user).get(user, {})
+    for task_class, feature in (("chat_advice", "glucose_advice"), ("menu_simulation", "simulate_menu"),
+                                ("menu_analysis", "menu_analysis"), ("extraction", "cgm_analysis")):
+        results[task_class]["cost_usd"] = usage.get(feature, {}).get("cost_usd", 0.0)
+        results[task_class]["models"] = {model: stats["calls"] for model, stats in router.report().get(task_class, {}).items()}
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20, help="calls per task class and mode")
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--model-latency", default=DEFAULT_MODEL_LATENCY, help="seconds added per model")
+    parser.add_argument("--model-failure-rate", default="", help="share of requests per model answered with 503")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    stubs = StubServices(0, seed=args.seed, model_latency=parse_model_values(args.model_latency),
+                         model_failure_rate=parse_model_values(args.model_failure_rate)).start()
+    # Fresh caches and meter, and no budget, so every call reaches the stub
+    os.environ.update(stubs.env(), CACHE_DIR=tempfile.mkdtemp(prefix="routing-bench-"), OPENAI_API_KEY="stub-key",
+                      LLM_USER_MONTHLY_BUDGET_USD="0", LLM_USER_MONTHLY_TOKEN_BUDGET="0")
+    logging.disable(logging.WARNING)
+
+    try:
+        tasks = task_calls()
+    except ImportError as e:
+        stubs.stop()
+        print(f"Skipped: the LLM tasks need the app's dependencies ({e})")
+        return
+
+    try:
+        results = {mode: run_mode(mode, args.calls, args.concurrency, tasks) for mode in ("fixed", "routed")}
+    finally:
+        stubs.stop()
+    results["stub_model_requests"] = stubs.model_counts
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{args.calls} calls per task, concurrency {args.concurrency}")
+    print(f"{'task':<16} {'mode':<7} {'p50 ms':>9} {'p95 ms':>9} {'errors':>7} {'cost $':>10}  models")
+    for task_class in tasks:
+        for mode in ("fixed", "routed"):
+            row = results[mode][task_class]
+            stats = row["latency"]
+            models = ", ".join(f"{model} {count}" for model, count in row["models"].items())
+            print(f"{task_class:<16} {mode:<7} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} "
+                  f"{row['errors']:>7} {row['cost_usd']:>10.4f}  {models}")
+
+if __name__ == "__main__":
+    main()
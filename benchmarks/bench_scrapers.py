@@ -0,0 +1,208 @@
+"""
+Offline benchmark of every menu scraper against saved pages: the website
+extractors in real_menu_fetcher, Yelp page parsing, menu_scraper's dish
+filter and GoogleMapsScraper.get_restaurant_menu driven by a fake browser
+over a saved Maps DOM snapshot. No network access is needed.
+
+For each extractor it reports pages/second, p50/p95 parse time, peak traced
+memory per page and item-extraction recall/precision against
+fixtures/expected_items.json.
+
+Usage:
+    python benchmarks/bench_scrapers.py [--fixtures DIR] [--repeat N] [--extractor NAME ...]
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import NoSuchElementException
+from real_menu_fetcher import parse_menu_page, parse_menu_items_from_html, parse_yelp_menu_items
+from menu_scraper import extract_dishes
+from google_maps_scraper import GoogleMapsScraper
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+XPATH_CONTAINS = re.compile(r"^//(\w+)\[contains\(\., '(.+)'\)\]$")
+
+class SnapshotElement:
+    """The parts of a selenium WebElement that GoogleMapsScraper uses"""
+    def __init__(self, driver, node):
+        self.driver = driver
+        self.node = node
+
+    @property
+    def text(self):
+        return self.node.get_text(" ", strip=True)
+
+    def click(self):
+        self.driver.click(self.node)
+
+class SnapshotDriver:
+    """
+    Stand-in for a Chrome webdriver over a saved Maps page. Elements under
+    data-state="menu" become visible once the Menu tab is clicked, and the
+    items of a data-panel only while its category tab is selected.
+    """
+    def __init__(self, html, url="https://www.google.com/maps/place/snapshot"):
+        self.soup = BeautifulSoup(html, "html.parser")
+        self.current_url = url
+        self.menu_open = False
+        self.active_panel = None
+        self._elements = {}
+
+    def _visible(self, node):
+        for parent in [node, *node.parents]:
+            if getattr(parent, "get", None) is None:
+                continue
+            if parent.get("data-state") == "menu" and not self.menu_open:
+                return False
+            is_tab = "Gpq6kf" in (parent.get("class") or [])
+            if parent.get("data-panel") and not is_tab and parent.get("data-panel") != self.active_panel:
+                return False
+        return True
+
+    def _wrap(self, nodes):
+        elements = []
+        for node in nodes:
+            if self._visible(node):
+                elements.append(self._elements.setdefault(id(node), SnapshotElement(self, node)))
+        return elements
+
+    def find_elements(self, by, value):
+        if by == By.CSS_SELECTOR:
+            return self._wrap(self.soup.select(value))
+        if by == By.XPATH:
+            match = XPATH_CONTAINS.match(value)
+            if match:
+                tag, text = match.groups()
+                return self._wrap(node for node in self.soup.find_all(tag) if text in node.get_text())
+            return []
+        raise ValueError(f"Unsupported locator: {by}")
+
+    def find_element(self, by, value):
+        elements = self.find_elements(by, value)
+        if not elements:
+            raise NoSuchElementException(value)
+        return elements[0]
+
+    def click(self, node):
+        if node.get("data-panel"):
+            self.active_panel = node["data-panel"]
+        elif "menu" in node.get_text().lower():
+            self.menu_open = True
+
+    def quit(self):
+        pass
+
+class SnapshotMapsScraper(GoogleMapsScraper):
+    """GoogleMapsScraper on a SnapshotDriver, without page-load pauses"""
+    def __init__(self, html):
+        super().__init__(headless=True)
+        self.driver = SnapshotDriver(html)
+
+    def _pause(self, seconds):
+        pass
+
+def _website_items(html):
+    return parse_menu_page(html)["items"] or []
+
+def _legacy_items(html):
+    result = parse_menu_items_from_html(html)
+    return result[0] or [] if result else []
+
+def _maps_items(html):
+    menu_items, _ = SnapshotMapsScraper(html).get_restaurant_menu()
+    return menu_items or []
+
+# name -> (fixture kinds it applies to, html -> list of item strings)
+EXTRACTORS = {
+    "website": ({"website"}, _website_items),
+    "website-legacy": ({"website"}, _legacy_items),
+    "yelp": ({"yelp"}, parse_yelp_menu_items),
+    "menu_scraper": ({"website", "yelp"}, extract_dishes),
+    "google_maps": ({"maps"}, _maps_items)
+}
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def accuracy(items, expected):
+    """(recall, precision) matching expected names case-insensitively inside extracted lines"""
+    lowered = [item.lower() for item in items]
+    names = [name.lower() for name in expected]
+    found = sum(1 for name in names if any(name in item for item in lowered))
+    relevant = sum(1 for item in lowered if any(name in item for name in names))
+    return found / len(names) if names else 1.0, relevant / len(lowered) if lowered else 0.0
+
+def run_extractor(extract, pages, repeat):
+    timings = []
+    peaks = []
+    recalls = []
+    precisions = []
+    for name, html, expected in pages:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            items = extract(html)
+            timings.append(time.perf_counter() - start)
+        recall, precision = accuracy(items, expected)
+        recalls.append(recall)
+        precisions.append(precision)
+
+        # Memory is measured in a separate run so tracing does not skew the timings
+        tracemalloc.start()
+        extract(html)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return {
+        "pages": len(pages),
+        "pages_per_second": len(timings) / sum(timings) if sum(timings) else float("inf"),
+        "p50_ms": percentile(timings, 0.5) * 1000,
+        "p95_ms": percentile(timings, 0.95) * 1000,
+        "peak_kb": max(peaks) / 1024,
+        "recall": sum(recalls) / len(recalls),
+        "precision": sum(precisions) / len(precisions)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="directory with saved pages and expected_items.json")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per page")
+    parser.add_argument("--extractor", action="append", choices=sorted(EXTRACTORS), help="only run these extractors")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    with open(os.path.join(args.fixtures, "expected_items.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    corpus = []
+    for filename, spec in sorted(manifest.items()):
+        with open(os.path.join(args.fixtures, filename), encoding="utf-8", errors="replace") as f:
+            corpus.append((filename, spec["kind"], f.read(), spec["items"]))
+
+    results = {}
+    for name in args.extractor or EXTRACTORS:
+        kinds, extract = EXTRACTORS[name]
+        pages = [(filename, html, expected) for filename, kind, html, expected in corpus if kind in kinds]
+        if pages:
+            results[name] = run_extractor(extract, pages, args.repeat)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'extractor':<16} {'pages':>5} {'pages/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'peak KB':>9} {'recall':>7} {'precision':>9}")
+    for name, result in results.items():
+        print(f"{name:<16} {result['pages']:>5} {result['pages_per_second']:>9.1f} {result['p50_ms']:>8.2f} "
+              f"{result['p95_ms']:>8.2f} {result['peak_kb']:>9.0f} {result['recall']:>7.0%} {result['precision']:>9.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Time until the user sees the first text of chat advice and menu analysis:
+the blocking calls (get_glucose_advice, analyze_menu), where nothing shows
+until the whole answer is back, against their streaming variants
+(stream_glucose_advice, stream_menu_analysis), run against the stub chat
+completions endpoint in stub_services.py.
+
+Usage:
+    python benchmarks/bench_streaming.py [--calls 5] [--model-latency gpt-4o-mini=2,gpt-4.1-mini=4] [--json]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from stub_services import StubServices, parse_model_values
+from bench_travel_pipeline import summarize, GLUCOSE_SUMMARY
+from bench_model_routing import DEFAULT_MODEL_LATENCY, MENU_TEXT
+
+def time_blocking(call):
+    start = time.perf_counter()
+    call()
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+def time_streaming(call):
+    start = time.perf_counter()
+    first = None
+    for chunk in call():
+        if first is None and chunk:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=5, help="calls per function")
+    parser.add_argument("--model-latency", default=DEFAULT_MODEL_LATENCY, help="seconds per response, per model")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    stubs = StubServices(0, model_latency=parse_model_values(args.model_latency)).start()
+    os.environ.update(stubs.env(), CACHE_DIR=tempfile.mkdtemp(prefix="streaming-bench-"), OPENAI_API_KEY="stub-key",
+                      LLM_USER_MONTHLY_BUDGET_USD="0", LLM_USER_MONTHLY_TOKEN_BUDGET="0")
+    logging.disable(logging.WARNING)
+
+    try:
+        from glucose_cgm_agents import analyze_menu, stream_menu_analysis
+        from pages.glucose_chat_agent import get_glucose_advice, stream_glucose_advice
+    except ImportError as e:
+        stubs.stop()
+        print(f"Skipped: the LLM tasks need the app's dependencies ({e})")
+        return
+
+    cases = {
+        "get_glucose_advice": (time_blocking, lambda i: lambda: get_glucose_advice(f"Snack before a walk, option {i}?")),
+        "stream_glucose_advice": (time_streaming, lambda i: lambda: stream_glucose_advice(f"Snack before a walk, option {i}?")),
+        "analyze_menu": (time_blocking, lambda i: lambda: analyze_menu(f"{MENU_TEXT}, Special {i}", GLUCOSE_SUMMARY)),
+        "stream_menu_analysis": (time_streaming, lambda i: lambda: stream_menu_analysis(f"{MENU_TEXT}, Special {i}", GLUCOSE_SUMMARY))
+    }
+    results = {}
+    try:
+        for name, (measure, make_call) in cases.items():
+            first_text, total = zip(*(measure(make_call(i)) for i in range(args.calls)))
+            results[name] = {"first_text": summarize(first_text), "total": summarize(total)}
+    finally:
+        stubs.stop()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'function':<24} {'first text p50 ms':>18} {'p95 ms':>9} {'total p50 ms':>13}")
+    for name, row in results.items():
+        print(f"{name:<24} {row['first_text']['p50_ms']:>18.1f} {row['first_text']['p95_ms']:>9.1f} "
+              f"{row['total']['p50_ms']:>13.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Multi-session load test for the Streamlit app. Each simulated session logs
+in and uploads a CGM PDF on Home.py, runs a restaurant search on
+pages/Travel.py and asks one question on pages/Chat.py, driven through
+streamlit.testing's AppTest against the stub backends in stub_services.py.
+
+Sessions run in this process, as they would in one Streamlit server, so
+st.cache_data, the persistent caches and the API scheduler are shared
+between them. For each concurrency level it reports session throughput,
+per-step latency percentiles and errors, the peak RSS of the AppTest process
+running the sessions (Chrome's memory is not included) and the peak number
+of Chrome processes (started by the Google Maps scraper, which is pointed at
+the stub Maps page).
+
+Usage:
+    python benchmarks/bench_streamlit_load.py [--concurrency 1,2,4,8] [--sessions N]
+        [--latency sites=0.2,llm=1.0] [--failure-rate serpapi=0.1] [--timeout 120] [--json]
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from streamlit.testing.v1 import AppTest
+from stub_services import StubServices, parse_service_values
+
+HOME_PAGE = os.path.join(REPO_DIR, "Home.py")
+TRAVEL_PAGE = os.path.join(REPO_DIR, "pages", "Travel.py")
+CHAT_PAGE = os.path.join(REPO_DIR, "pages", "Chat.py")
+STEPS = ("login", "upload", "travel_search", "chat")
+CHROME_PROCESS_NAMES = ("chrome", "chromium", "chromedriver", "headless_shell")
+SAMPLE_INTERVAL = 0.25  # seconds
+
+CGM_REPORT_LINES = [
+    "Dexcom Clarity Overview",
+    "Average glucose 128 mg/dL, time in range 81%",
+    "Breakfast: oatmeal with banana - peak 182 mg/dL after 45 min",
+    "Lunch: grilled chicken salad - peak 121 mg/dL",
+    "Dinner: white rice and curry - peak 196 mg/dL, back in range after 2 h",
+]
+CHAT_QUESTION = "What should I order at an Italian restaurant to avoid a spike?"
+
+def cgm_report_pdf(lines=CGM_REPORT_LINES):
+    """A one-page PDF with lines of text, built without a PDF library"""
+    text = "BT /F1 11 Tf 50 780 Td 14 TL " + " ".join(
+        "(" + line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ") '" for line in lines) + " ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R "
+        "/Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(text)} >>\nstream\n{text}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    pdf = "%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += f"{number} 0 obj\n{body}\nendobj\n"
+    xref = len(pdf)
+    pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    pdf += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    pdf += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    return pdf.encode("latin-1")
+
+def rss_mb():
+    """Current resident set size of this (AppTest) process"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Peak RSS where /proc is unavailable (kilobytes on Linux, bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def chrome_process_count():
+    count = 0
+    for pid in filter(str.isdigit, os.listdir("/proc") if os.path.isdir("/proc") else []):
+        try:
+            with open(f"/proc/{pid}/comm") as f:
+                name = f.read().strip().lower()
+        except OSError:
+            continue
+        if any(chrome in name for chrome in CHROME_PROCESS_NAMES):
+            count += 1
+    return count
+
+class ResourceSampler:
+    """Samples RSS and the Chrome process count in the background"""
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak_rss_mb = 0.0
+        self.peak_chrome = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self):
+        self.peak_rss_mb = max(self.peak_rss_mb, rss_mb())
+        self.peak_chrome = max(self.peak_chrome, chrome_process_count())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+class StepFailed(Exception):
+    pass
+
+def _check(app, step):
+    if app.exception:
+        raise StepFailed(f"{step}: {app.exception[0].message}")
+    errors = [element.value for element in app.error]
+    if errors:
+        raise StepFailed(f"{step}: {errors[0]}")
+
+def _button(app, label):
+    for button in app.button:
+        if button.label == label:
+            return button
+    raise StepFailed(f"No button labelled {label!r}")
+
+def run_session(index, timeout):
+    """One user's visit; returns ({step: seconds}, error or None)"""
+    timings = {}
+    state = {"user": f"loadtest-{index}"}
+
+    def step(name, action):
+        start = time.perf_counter()
+        app = action()
+        timings[name] = time.perf_counter() - start
+        _check(app, name)
+        return app
+
+    try:
+        home = AppTest.from_file(HOME_PAGE, default_timeout=timeout)
+
+        def login():
+            _check(home.run(), "login")
+            home.text_input[0].input(state["user"])
+            return home.button[0].click().run()
+
+        def upload():
+            home.file_uploader[0].upload("clarity_report.pdf", cgm_report_pdf(), "application/pdf").run()
+            return _button(home, "🔍 Analyze").click().run()
+
+        step("login", login)
+        step("upload", upload)
+        state["glucose_summary"] = home.session_state["glucose_summary"] if "glucose_summary" in home.session_state else ""
+
+        # Streamlit shares session state across pages; each AppTest starts empty
+        travel = AppTest.from_file(TRAVEL_PAGE, default_timeout=timeout)
+        chat = AppTest.from_file(CHAT_PAGE, default_timeout=timeout)
+        for app in (travel, chat):
+            for key, value in state.items():
+                app.session_state[key] = value
+
+        def travel_search():
+            _check(travel.run(), "travel_search")
+            return _button(travel, "🔍 Find & Analyze Restaurants").click().run()
+
+        def ask():
+            _check(chat.run(), "chat")
+            return chat.chat_input[0].set_value(CHAT_QUESTION).run()
+
+        step("travel_search", travel_search)
+        step("chat", ask)
+        return timings, None
+    except Exception as e:
+        return timings, str(e) or type(e).__name__
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def run_level(concurrency, sessions, timeout, first_index):
+    results = []
+    with ResourceSampler() as sampler:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [executor.submit(run_session, first_index + i, timeout) for i in range(sessions)]
+            results = [future.result() for future in futures]
+        wall = time.perf_counter() - started
+
+    errors = [error for _, error in results if error]
+    steps = {}
+    for name in STEPS:
+        timings = [session_timings[name] for session_timings, _ in results if name in session_timings]
+        if timings:
+            steps[name] = {"count": len(timings), "p50_ms": percentile(timings, 0.5) * 1000,
+                           "p95_ms": percentile(timings, 0.95) * 1000, "max_ms": max(timings) * 1000}
+    return {
+        "concurrency": concurrency,
+        "sessions": sessions,
+        "completed": sessions - len(errors),
+        "wall_seconds": wall,
+        "sessions_per_second": (sessions - len(errors)) / wall if wall else 0.0,
+        "peak_apptest_rss_mb": sampler.peak_rss_mb,
+        "peak_chrome_processes": sampler.peak_chrome,
+        "steps": steps,
+        "errors": errors[:5]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,2,4,8", help="comma-separated concurrent session counts")
+    parser.add_argument("--sessions", type=int, default=None, help="sessions per level (default: 2 x concurrency)")
+    parser.add_argument("--restaurants", type=int, default=12, help="restaurants returned by the stub Places search")
+    parser.add_argument("--latency", default="", help="seconds added per service (places, serper, serpapi, sites, llm)")
+    parser.add_argument("--failure-rate", default="", help="share of requests per service answered with 503")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds allowed for one script run")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    stubs = StubServices(args.restaurants, parse_service_values(args.latency),
+                         parse_service_values(args.failure_rate)).start()
+    workdir = tempfile.mkdtemp(prefix="streamlit-load-")
+    os.environ.update(stubs.env(), CACHE_DIR=os.path.join(workdir, "cache"))
+    # Home.py saves summaries under ./data
+    os.chdir(workdir)
+    logging.disable(logging.WARNING)
+
+    levels = [int(level) for level in args.concurrency.split(",") if level]
+    results = []
+    first_index = 0
+    try:
+        for concurrency in levels:
+            sessions = args.sessions or 2 * concurrency
+            results.append(run_level(concurrency, sessions, args.timeout, first_index))
+            first_index += sessions
+    finally:
+        stubs.stop()
+
+    if args.json:
+        print(json.dumps({"levels": results, "stub_requests": stubs.counts}, indent=2))
+        return
+    print(f"{'conc':>4} {'done':>9} {'sess/s':>7} {'AppTest RSS MB':>14} {'chrome':>6}  step p50/p95 ms")
+    for level in results:
+        steps = "  ".join(f"{name} {stats['p50_ms']:.0f}/{stats['p95_ms']:.0f}" for name, stats in level["steps"].items())
+        print(f"{level['concurrency']:>4} {level['completed']:>4}/{level['sessions']:<4} {level['sessions_per_second']:>7.2f} "
+              f"{level['peak_apptest_rss_mb']:>14.0f} {level['peak_chrome_processes']:>6}  {steps}")
+        for error in level["errors"]:
+            print(f"     error: {error}")
+    print("stub requests: " + ", ".join(f"{name} {c['requests']} ({c['failures']} failed)" for name, c in stubs.counts.items()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+End-to-end latency of the Travel pipeline (restaurant search -> menu ->
+CGM analysis) against the local stand-ins in stub_services.py, so no API
+quota is spent. Reports per-stage and end-to-end timings for N restaurants.
+
+The Google Maps (Chrome) step of the Travel page is not exercised; menus
+come from get_real_menu. The analysis stage needs the app's LLM
+dependencies (crewai) and talks to the stub chat completions endpoint.
+
+Usage:
+    python benchmarks/bench_travel_pipeline.py [--restaurants 12] [--concurrency 1]
+        [--latency places=0.05,sites=0.2,llm=1.0] [--failure-rate serpapi=0.2] [--no-analysis] [--json]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from stub_services import StubServices, STUB_LOCATION, parse_service_values
+
+GLUCOSE_SUMMARY = (
+    "Spikes after white rice, naan and sugary drinks (peaks ~190 mg/dL). "
+    "Stable after grilled proteins, salads and lentils. Recovery within 2 hours."
+)
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def summarize(timings):
+    if not timings:
+        return None
+    return {
+        "count": len(timings),
+        "mean_ms": sum(timings) / len(timings) * 1000,
+        "p50_ms": percentile(timings, 0.5) * 1000,
+        "p95_ms": percentile(timings, 0.95) * 1000,
+        "max_ms": max(timings) * 1000
+    }
+
+def run_pipeline(restaurant_count, concurrency, analyze):
+    # App modules read their configuration at import time, after the stub env is set
+    from restaurant_recommender import search_restaurants_by_cuisine
+    from real_menu_fetcher import get_real_menu
+
+    stages = {"search": [], "menu": [], "analysis": [], "restaurant": []}
+    outcomes = {"real_menus": 0, "no_menu": 0, "analysis_errors": 0}
+    started = time.perf_counter()
+
+    start = time.perf_counter()
+    location = f"{STUB_LOCATION[0]},{STUB_LOCATION[1]}"
+    found, error = search_restaurants_by_cuisine(location, radius_meters=2000, cuisines=["Restaurant"], top_n=restaurant_count)
+    stages["search"].append(time.perf_counter() - start)
+    if error:
+        raise RuntimeError(f"Restaurant search failed: {error}")
+    restaurants = [restaurant for results in found.values() for restaurant in results]
+
+    def process(restaurant):
+        restaurant_start = time.perf_counter()
+        start = time.perf_counter()
+        menu, is_real, _ = get_real_menu(restaurant["name"], restaurant["address"], restaurant["place_id"])
+        stages["menu"].append(time.perf_counter() - start)
+        outcomes["real_menus" if is_real else "no_menu"] += 1
+        if analyze and menu:
+            start = time.perf_counter()
+            try:
+                analyze(str(menu), GLUCOSE_SUMMARY)
+            except Exception:
+                outcomes["analysis_errors"] += 1
+            stages["analysis"].append(time.perf_counter() - start)
+        stages["restaurant"].append(time.perf_counter() - restaurant_start)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(process, restaurants))
+
+    return {
+        "restaurants": len(restaurants),
+        "total_seconds": time.perf_counter() - started,
+        "stages": {name: summarize(timings) for name, timings in stages.items()},
+        "outcomes": outcomes
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--restaurants", type=int, default=12)
+    parser.add_argument("--concurrency", type=int, default=1, help="restaurants processed in parallel")
+    parser.add_argument("--latency", default="", help="seconds added per service (places, serper, serpapi, sites, llm)")
+    parser.add_argument("--failure-rate", default="", help="share of requests per service answered with 503")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-analysis", action="store_true", help="stop after the menu stage")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    stubs = StubServices(args.restaurants, parse_service_values(args.latency),
+                         parse_service_values(args.failure_rate), seed=args.seed).start()
+    # Fresh caches so every request reaches the stubs
+    os.environ.update(stubs.env(), CACHE_DIR=tempfile.mkdtemp(prefix="travel-bench-"))
+    logging.disable(logging.WARNING)
+
+    analyze = None
+    skipped = None
+    if not args.no_analysis:
+        try:
+            from glucose_cgm_agents import analyze_menu as analyze
+        except ImportError as e:
+            skipped = f"analysis skipped: {e}"
+
+    try:
+        result = run_pipeline(args.restaurants, args.concurrency, analyze)
+    finally:
+        stubs.stop()
+    result["stub_requests"] = stubs.counts
+    if skipped:
+        result["note"] = skipped
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{result['restaurants']} restaurants in {result['total_seconds']:.2f}s "
+          f"(concurrency {args.concurrency}); outcomes: {result['outcomes']}")
+    print(f"{'stage':<12} {'count':>6} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    for stage, stats in result["stages"].items():
+        if stats:
+            print(f"{stage:<12} {stats['count']:>6} {stats['mean_ms']:>9.1f} {stats['p50_ms']:>9.1f} "
+                  f"{stats['p95_ms']:>9.1f} {stats['max_ms']:>9.1f}")
+    print("stub requests: " + ", ".join(f"{name} {c['requests']} ({c['failures']} failed)" for name, c in stubs.counts.items()))
+    if skipped:
+        print(skipped)
+
+if __name__ == "__main__":
+    main()
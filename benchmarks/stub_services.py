@@ -0,0 +1,346 @@
+"""
+Local stand-ins for every external service the Travel flow calls: Places
+Nearby Search and Details, Serper, SerpAPI, restaurant and Yelp pages, a
+Google Maps search page that finds nothing (so the Maps scraper's Chrome
+only ever talks to the stubs) and an OpenAI-compatible chat completions
+endpoint. Each service can be given
+an added latency and a failure rate (answered with HTTP 503); the LLM
+endpoint can also be given them per requested model. Streamed completions
+("stream": true) arrive as server-sent events, with a tenth of the model's
+latency before the first chunk and the rest spread over the chunks.
+
+Point the app at the stubs with StubServices.env(), which sets the
+PLACES_API_BASE, SERPER_BASE_URL, SERPAPI_BASE_URL, GOOGLE_MAPS_URL and
+OPENAI_BASE_URL variables read at import time.
+
+Run standalone with:
+    python benchmarks/stub_services.py [--port 8900] [--restaurants 12] [--latency sites=0.2] [--failure-rate serpapi=0.1]
+        [--model-latency gpt-4=2.5,gpt-4o-mini=0.4] [--model-failure-rate gpt-4o=0.2]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+SERVICES = ("places", "serper", "serpapi", "sites", "llm")
+STUB_LOCATION = (37.7749, -122.4194)
+
+# Restaurant i serves the website fixture BRANDS[i % len(BRANDS)]
+BRANDS = [
+    ("Saffron Table", "bistro_list_menu.html", "indian_restaurant"),
+    ("Trattoria Roma", "trattoria_table_menu.html", "italian_restaurant"),
+    ("Morning Glory Cafe", "cafe_product_cards.html", "cafe"),
+    ("Greenleaf Kitchen", "greenleaf_jsonld_menu.html", "american_restaurant")
+]
+YELP_FIXTURE = "yelp_business_page.html"
+# Has the Maps search box; a search shows no results, so the scraper gives up
+MAPS_PAGE = '<html><body><input id="searchboxinput" type="text"></body></html>'
+
+LLM_ANSWER = (
+    "Thought: I now can give a great answer\n"
+    "Final Answer: ✅ Safe Dishes:\n- Grilled fish – lean protein, low glycemic load\n\n"
+    "❌ Avoid:\n- Rice-heavy plates – large carb portion\n\n"
+    "🧠 Smart Combos:\n- Protein + greens – slows glucose absorption"
+)
+
+def parse_service_values(text):
+    """'places=0.1,llm=1' -> {'places': 0.1, 'llm': 1.0}"""
+    values = {}
+    for part in filter(None, (text or "").split(",")):
+        service, value = part.split("=")
+        if service not in SERVICES:
+            raise ValueError(f"Unknown service {service}; expected one of {', '.join(SERVICES)}")
+        values[service] = float(value)
+    return values
+
+def parse_model_values(text):
+    """'gpt-4=2.5,gpt-4o-mini=0.4' -> {'gpt-4': 2.5, 'gpt-4o-mini': 0.4}"""
+    return {model: float(value) for model, value in (part.split("=") for part in filter(None, (text or "").split(",")))}
+
+class StubServices:
+    def __init__(self, restaurants=12, latency=None, failure_rate=None, host="127.0.0.1", port=0, seed=0,
+                 model_latency=None, model_failure_rate=None):
+        self.restaurants = [self._restaurant(i) for i in range(restaurants)]
+        self.latency = latency or {}
+        self.failure_rate = failure_rate or {}
+        self.model_latency = model_latency or {}
+        self.model_failure_rate = model_failure_rate or {}
+        self.random = random.Random(seed)
+        self.counts = {service: {'requests': 0, 'failures': 0} for service in SERVICES}
+        self.model_counts = {}
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._pages = {}
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self.base_url = f"http://{host}:{self.server.server_address[1]}"
+        self._thread = None
+
+    def _restaurant(self, i):
+        name, fixture, cuisine = BRANDS[i % len(BRANDS)]
+        if i >= len(BRANDS):
+            name = f"{name} {i // len(BRANDS) + 1}"
+        # Spread restaurants within ~1 km of STUB_LOCATION
+        angle = i * 2.399963
+        distance = 0.002 + 0.006 * (i % 7) / 7
+        return {
+            'index': i,
+            'name': name,
+            'fixture': fixture,
+            'place_id': f"stub-place-{i}",
+            'vicinity': f"{100 + i} Market St, San Francisco",
+            'lat': STUB_LOCATION[0] + distance * (angle % 1.7 - 0.85),
+            'lng': STUB_LOCATION[1] + distance * ((angle * 1.3) % 1.7 - 0.85),
+            'types': [cuisine, 'restaurant', 'point_of_interest'],
+            'rating': 4.0 + (i % 10) / 10
+        }
+
+    def env(self):
+        """Environment variables that point the app at these stubs"""
+        return {
+            "PLACES_API_BASE": f"{self.base_url}/places",
+            "SERPER_BASE_URL": f"{self.base_url}/serper",
+            "SERPAPI_BASE_URL": f"{self.base_url}/serpapi",
+            "GOOGLE_MAPS_URL": f"{self.base_url}/maps",
+            "OPENAI_BASE_URL": f"{self.base_url}/v1",
+            "OPENAI_API_BASE": f"{self.base_url}/v1",
+            "GOOGLE_API_KEY": "stub",
+            "SERPER_API_KEY": "stub",
+            "SERPAPI_API_KEY": "stub",
+            "OPENAI_API_KEY": "stub"
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def page(self, fixture):
+        if fixture not in self._pages:
+            with open(os.path.join(FIXTURES_DIR, fixture), encoding="utf-8") as f:
+                self._pages[fixture] = f.read()
+        return self._pages[fixture]
+
+    def restaurant_for_query(self, query):
+        query = (query or "").lower()
+        matches = [r for r in self.restaurants if r['name'].lower() in query]
+        # Prefer the longest name so "Saffron Table 2" beats "Saffron Table"
+        return max(matches, key=lambda r: len(r['name'])) if matches else None
+
+    def _enter(self, service):
+        """Count a request, apply its latency and decide whether it fails"""
+        with self._lock:
+            self.counts[service]['requests'] += 1
+            fail = self.random.random() < self.failure_rate.get(service, 0)
+            if fail:
+                self.counts[service]['failures'] += 1
+        delay = self.latency.get(service, 0)
+        if delay:
+            time.sleep(delay)
+        return fail
+
+    def _enter_model(self, model):
+        """Count an LLM request; returns (whether it fails, the model's added latency)"""
+        # Requests name models with or without a provider prefix ("openai/gpt-4")
+        model = model.split("/")[-1]
+        with self._lock:
+            counts = self.model_counts.setdefault(model, {'requests': 0, 'failures': 0})
+            counts['requests'] += 1
+            fail = self.random.random() < self.model_failure_rate.get(model, 0)
+            if fail:
+                counts['failures'] += 1
+        return fail, self.model_latency.get(model, 0)
+
+    def _handler_class(self):
+        stubs = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                with stubs._lock:
+                    stubs.connections += 1
+
+            def _send(self, status, body, content_type="application/json"):
+                data = body.encode("utf-8") if isinstance(body, str) else json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _body(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return self.rfile.read(length) if length else b""
+
+            def do_GET(self):
+                self._route("GET")
+
+            def do_POST(self):
+                self._route("POST")
+
+            def _route(self, method):
+                url = urlparse(self.path)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                body = self._body() if method == "POST" else b""
+                service = ("places" if url.path.startswith("/places/") else
+                           "serper" if url.path.startswith("/serper/") else
+                           "serpapi" if url.path.startswith("/serpapi/") else
+                           "llm" if url.path.startswith("/v1/") else "sites")
+                if stubs._enter(service):
+                    self._send(503, {"error": f"injected {service} failure"})
+                    return
+                handler = getattr(self, f"_{service}")
+                handler(url.path, query, body)
+
+            def _places(self, path, query, body):
+                if path.endswith("/nearbysearch/json"):
+                    results = [{
+                        'name': r['name'], 'place_id': r['place_id'], 'vicinity': r['vicinity'],
+                        'rating': r['rating'], 'price_level': 2, 'types': r['types'],
+                        'geometry': {'location': {'lat': r['lat'], 'lng': r['lng']}}
+                    } for r in stubs.restaurants]
+                    self._send(200, {'status': 'OK', 'results': results})
+                elif path.endswith("/details/json"):
+                    match = re.match(r"stub-place-(\d+)$", query.get('place_id', ''))
+                    if not match or int(match.group(1)) >= len(stubs.restaurants):
+                        self._send(200, {'status': 'NOT_FOUND', 'error_message': 'Unknown place_id'})
+                        return
+                    r = stubs.restaurants[int(match.group(1))]
+                    self._send(200, {'status': 'OK', 'result': {
+                        'name': r['name'], 'website': f"{stubs.base_url}/sites/{r['index']}/",
+                        'formatted_address': r['vicinity'], 'rating': r['rating']
+                    }})
+                else:
+                    self._send(404, {'error': 'not found'})
+
+            def _serper(self, path, query, body):
+                q = json.loads(body or b"{}").get('q', '')
+                r = stubs.restaurant_for_query(q)
+                organic = [{
+                    'title': f"{r['name']} Menu", 'link': f"{stubs.base_url}/sites/{r['index']}/menu",
+                    'snippet': f"See the full menu for {r['name']}"
+                }] if r else []
+                self._send(200, {'organic': organic})
+
+            def _serpapi(self, path, query, body):
+                q = query.get('q', '')
+                r = stubs.restaurant_for_query(q)
+                if not r:
+                    self._send(200, {'organic_results': []})
+                elif 'site:yelp.com' in q:
+                    self._send(200, {'organic_results': [{
+                        'title': f"{r['name']} - Yelp", 'link': f"{stubs.base_url}/yelp.com/biz/{r['index']}"
+                    }]})
+                else:
+                    self._send(200, {'organic_results': [{
+                        'title': f"{r['name']} Menu", 'link': f"{stubs.base_url}/allmenus.com/{r['index']}",
+                        'snippet': 'menu, prices and photos'
+                    }]})
+
+            def _sites(self, path, query, body):
+                if path == "/maps":
+                    self._send(200, MAPS_PAGE, "text/html")
+                    return
+                match = re.match(r"^/(sites|allmenus\.com|yelp\.com/biz)/(\d+)", path)
+                if not match or int(match.group(2)) >= len(stubs.restaurants):
+                    self._send(404, "<html><body>Not found</body></html>", "text/html")
+                    return
+                r = stubs.restaurants[int(match.group(2))]
+                fixture = YELP_FIXTURE if match.group(1) == "yelp.com/biz" else r['fixture']
+                self._send(200, stubs.page(fixture), "text/html")
+
+            def _llm(self, path, query, body):
+                if not path.endswith("/chat/completions"):
+                    self._send(404, {'error': 'not found'})
+                    return
+                request = json.loads(body or b"{}")
+                fail, delay = stubs._enter_model(request.get('model', 'stub-model'))
+                if fail:
+                    time.sleep(delay / 10)
+                    self._send(503, {'error': f"injected {request.get('model')} failure"})
+                    return
+                prompt_tokens = sum(len(str(m.get('content', '')).split()) for m in request.get('messages', []))
+                if request.get('stream'):
+                    self._stream_completion(request, prompt_tokens, delay)
+                    return
+                if delay:
+                    time.sleep(delay)
+                self._send(200, {
+                    'id': f"chatcmpl-stub-{int(time.time() * 1000)}",
+                    'object': 'chat.completion',
+                    'created': int(time.time()),
+                    'model': request.get('model', 'stub-model'),
+                    'choices': [{'index': 0, 'finish_reason': 'stop',
+                                 'message': {'role': 'assistant', 'content': LLM_ANSWER}}],
+                    'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': len(LLM_ANSWER.split()),
+                              'total_tokens': prompt_tokens + len(LLM_ANSWER.split())}
+                })
+
+            def _stream_completion(self, request, prompt_tokens, delay):
+                # Outside a crew the answer comes without the agent's "Thought:" preamble
+                answer = LLM_ANSWER.split("Final Answer: ", 1)[-1]
+                words = re.findall(r"\S+\s*", answer)
+                chunk = {'id': f"chatcmpl-stub-{int(time.time() * 1000)}", 'object': 'chat.completion.chunk',
+                         'created': int(time.time()), 'model': request.get('model', 'stub-model')}
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                time.sleep(delay / 10)
+                for word in words:
+                    event = dict(chunk, choices=[{'index': 0, 'delta': {'content': word}, 'finish_reason': None}])
+                    self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    time.sleep(delay * 0.9 / len(words))
+                events = [dict(chunk, choices=[{'index': 0, 'delta': {}, 'finish_reason': 'stop'}])]
+                if (request.get('stream_options') or {}).get('include_usage'):
+                    events.append(dict(chunk, choices=[], usage={
+                        'prompt_tokens': prompt_tokens, 'completion_tokens': len(words),
+                        'total_tokens': prompt_tokens + len(words)}))
+                for event in events:
+                    self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--restaurants", type=int, default=12)
+    parser.add_argument("--latency", default="", help="seconds added per service, e.g. sites=0.2,llm=1.5")
+    parser.add_argument("--failure-rate", default="", help="share of requests answered with 503, e.g. serpapi=0.2")
+    parser.add_argument("--model-latency", default="", help="seconds added per LLM model, e.g. gpt-4=2.5")
+    parser.add_argument("--model-failure-rate", default="", help="share of LLM requests per model answered with 503")
+    args = parser.parse_args()
+
+    stubs = StubServices(args.restaurants, parse_service_values(args.latency),
+                         parse_service_values(args.failure_rate), port=args.port,
+                         model_latency=parse_model_values(args.model_latency),
+                         model_failure_rate=parse_model_values(args.model_failure_rate)).start()
+    for name, value in stubs.env().items():
+        print(f"export {name}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stubs.stop()
+
+if __name__ == "__main__":
+    main()
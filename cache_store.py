@@ -0,0 +1,220 @@
+import json
+import os
+import atexit
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('cache_store')
+
+# All persistent caches live under this directory (one JSON file per cache)
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join("data", "cache"))
+# Changes are written to disk in the background at most this often (and at
+# exit), so a set() never waits for the whole file to be rewritten
+CACHE_FLUSH_SECONDS = float(os.getenv("CACHE_FLUSH_SECONDS", 2))
+
+_caches = []
+_caches_lock = threading.Lock()
+
+class PersistentLRUCache:
+    """
+    Thread-safe LRU cache persisted to a JSON file in CACHE_DIR.
+    Keys are strings and values must be JSON serializable. Changes are
+    written back CACHE_FLUSH_SECONDS later in a background thread, batched
+    with any others made meanwhile; flush() writes them now. When ttl is set,
+    entries older than ttl seconds are treated as missing and dropped.
+    on_evict(key, value) is called for entries pushed out by the size limit.
+    """
+    def __init__(self, name, max_entries=1000, ttl=None, on_evict=None):
+        self.name = name
+        self.path = os.path.join(CACHE_DIR, f"{name}.json")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> [stored_at, value]
+        self._dirty = False
+        self._timer = None
+        self._load()
+        with _caches_lock:
+            _caches.append(self)
+
+    def _load(self):
+        """Load entries from disk, ignoring a missing or corrupt file"""
+        try:
+            with open(self.path, "r") as f:
+                saved = json.load(f)
+            for key, entry in saved.items():
+                self._entries[key] = entry
+            self._evict()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cache file {self.path}: {str(e)}")
+
+    def _save(self):
+        """Schedule a write of the entries; called with the lock held"""
+        self._dirty = True
+        if self._timer is None:
+            self._timer = threading.Timer(CACHE_FLUSH_SECONDS, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Write pending changes to disk atomically, outside the cache lock"""
+        with self._write_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if not self._dirty:
+                    return
+                self._dirty = False
+                # Entries are replaced, never changed in place, so a shallow copy is a snapshot
+                snapshot = dict(self._entries)
+            try:
+                os.makedirs(CACHE_DIR, exist_ok=True)
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(snapshot, f)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                logger.warning(f"Could not persist cache {self.name}: {str(e)}")
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            key, entry = self._entries.popitem(last=False)
+            if self.on_evict is not None:
+                self.on_evict(key, entry[1])
+
+    def _is_expired(self, entry):
+        return self.ttl is not None and time.time() - entry[0] > self.ttl
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if self._is_expired(entry):
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def peek(self, key, default=None):
+        """get() that leaves the entry's recency alone, for reports and lookups that are not uses"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._is_expired(entry):
+                return default
+            return entry[1]
+
+    def set(self, key, value):
+        """Store value under key and persist the cache"""
+        self.set_many({key: value})
+
+    def set_many(self, items):
+        """Store every key and value of the dict items and persist the cache once"""
+        with self._lock:
+            now = time.time()
+            for key, value in items.items():
+                self._entries[key] = [now, value]
+                self._entries.move_to_end(key)
+            self._evict()
+            self._save()
+
+    def delete(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._save()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._save()
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+def flush_all():
+    """Write the pending changes of every cache"""
+    with _caches_lock:
+        caches = list(_caches)
+    for cache in caches:
+        cache.flush()
+
+atexit.register(flush_all)
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+_flights = []
+_flights_lock = threading.Lock()
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key: the first caller runs the
+    function and every caller that arrives while it is in flight waits for
+    and receives the same result (or exception). Named instances report
+    how many calls were deduplicated through single_flight_stats().
+    """
+    def __init__(self, name=None):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.calls = 0
+        self.deduplicated = 0
+        if name:
+            with _flights_lock:
+                _flights.append(self)
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                self.deduplicated += 1
+
+        if not leader:
+            logger.info(f"Joined in-flight {self.name or 'call'} for {key}")
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def stats(self):
+        with self._lock:
+            return {'calls': self.calls, 'deduplicated': self.deduplicated, 'in_flight': len(self._calls)}
+
+def single_flight_stats():
+    """{name: {"calls", "deduplicated", "in_flight"}} for every named SingleFlight"""
+    with _flights_lock:
+        return {flight.name: flight.stats() for flight in _flights}
@@ -0,0 +1,126 @@
+import re
+import hashlib
+import threading
+import logging
+from cache_store import PersistentLRUCache, SingleFlight
+from source_stats import chain_key
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('chain_cache')
+
+# A name is treated as a chain only with brand evidence: two places with that
+# normalized name in the same region that share a website domain. Hosts of
+# many unrelated restaurants' pages are no evidence, and neither is the name
+# alone ("China Garden" is many independent restaurants).
+SHARED_HOST_DOMAINS = ("facebook.com", "instagram.com", "yelp.com", "google.com", "business.site", "linktr.ee",
+                       "square.site", "squareup.com", "toasttab.com", "wixsite.com", "godaddysites.com",
+                       "squarespace.com", "weebly.com", "wordpress.com", "doordash.com", "ubereats.com",
+                       "grubhub.com", "menufy.com", "clover.com", "chownow.com", "order.online", "beyondmenu.com")
+CHAIN_MENU_TTL = 7 * 24 * 60 * 60  # seconds
+CHAIN_MEMBERS_TTL = 30 * 24 * 60 * 60  # seconds
+CHAIN_CACHE_MAX_ENTRIES = 5000
+
+_members = PersistentLRUCache("chain_members", max_entries=CHAIN_CACHE_MAX_ENTRIES, ttl=CHAIN_MEMBERS_TTL)
+_menus = PersistentLRUCache("chain_menus", max_entries=CHAIN_CACHE_MAX_ENTRIES, ttl=CHAIN_MENU_TTL)
+_analyses = PersistentLRUCache("chain_analyses", max_entries=CHAIN_CACHE_MAX_ENTRIES, ttl=CHAIN_MENU_TTL)
+_lock = threading.Lock()
+_analysis_flight = SingleFlight("menu_analysis")
+
+# Trailing address parts below the locality: "CA 94103", "94103", "USA"
+_SUBLOCALITY_PART = re.compile(r"^([A-Z]{2}( \d{5}(-\d{4})?)?|\d{4,6}(-\d{4})?|USA|US|United States)$")
+
+def location_key(restaurant_name, address=None, place_id=None):
+    """Identifies one restaurant location: its place_id, else its normalized name and address"""
+    return place_id or f"{chain_key(restaurant_name)}|{(address or '').strip().lower()}"
+
+def region_key(address):
+    """The locality of an address ("123 Main St, San Francisco, CA 94103, USA" -> "san francisco")"""
+    parts = [part.strip() for part in (address or "").split(",") if part.strip()]
+    while len(parts) > 1 and _SUBLOCALITY_PART.match(parts[-1]):
+        parts.pop()
+    return parts[-1].lower() if len(parts) > 1 else ""
+
+def brand_domain(domain):
+    """domain if it can identify a brand, None for hosts shared by unrelated restaurants"""
+    if not domain or any(domain == host or domain.endswith("." + host) for host in SHARED_HOST_DOMAINS):
+        return None
+    return domain
+
+def observe_location(restaurant_name, place_id, domain=None, address=None):
+    """Record that place_id is a location called restaurant_name with the brand website domain"""
+    key = chain_key(restaurant_name)
+    domain = brand_domain(domain)
+    if not key or not place_id or not domain:
+        return
+    members_key = f"{key}|{region_key(address)}"
+    with _lock:
+        locations = dict(_members.get(members_key) or {})
+        if locations.get(place_id) == domain:
+            return
+        locations[place_id] = domain
+        _members.set(members_key, locations)
+
+def detect_chain(restaurant_name, place_id=None, domain=None, address=None):
+    """
+    Observe this location and return its chain key if another location with
+    the same name in its region shares its website domain, otherwise None
+    """
+    observe_location(restaurant_name, place_id, domain, address)
+    key = chain_key(restaurant_name)
+    domain = brand_domain(domain)
+    if not key or not domain:
+        return None
+    region = region_key(address)
+    locations = _members.get(f"{key}|{region}") or {}
+    if any(other != place_id and value == domain for other, value in locations.items()):
+        return f"{key}|{domain}|{region}"
+    return None
+
+def get_chain_menu(chain, source=None):
+    """Menu shared by every location of chain as {"menu", "source", "url"}, or None"""
+    if not chain:
+        return None
+    entry = _menus.get(chain)
+    if entry is None or (source is not None and entry['source'] != source):
+        return None
+    return entry
+
+def set_chain_menu(chain, menu, source, url=None):
+    """Keep a chain location's menu for the chain's other locations; independents are not stored"""
+    if chain and menu:
+        _menus.set(chain, {'menu': menu, 'source': source, 'url': url})
+
+def _analysis_key(chain, menu_text, glucose_summary):
+    digest = hashlib.sha1(f"{menu_text}\0{glucose_summary}".encode('utf-8')).hexdigest()
+    return f"{chain}|{digest}"
+
+def get_chain_analysis(chain, menu_text, glucose_summary):
+    """Analysis of a shared chain menu for this glucose summary, or None"""
+    if not chain:
+        return None
+    return _analyses.get(_analysis_key(chain, menu_text, glucose_summary))
+
+def set_chain_analysis(chain, menu_text, glucose_summary, analysis):
+    if chain and analysis:
+        _analyses.set(_analysis_key(chain, menu_text, glucose_summary), analysis)
+
+def shared_menu_analysis(menu_text, glucose_summary, analyze, chain=None):
+    """
+    analyze(menu_text, glucose_summary), computed once for concurrent callers
+    with the same inputs and reused across a chain's locations
+    """
+    cached = get_chain_analysis(chain, menu_text, glucose_summary)
+    if cached is not None:
+        return cached
+
+    def run():
+        analysis = str(analyze(menu_text, glucose_summary))
+        set_chain_analysis(chain, menu_text, glucose_summary, analysis)
+        return analysis
+
+    return _analysis_flight.do(_analysis_key(chain or "", menu_text, glucose_summary), run)
+
+def clear_chain_cache():
+    _menus.clear()
+    _analyses.clear()
@@ -0,0 +1,92 @@
+import re
+import logging
+from cache_store import PersistentLRUCache, SingleFlight
+from api_scheduler import api_call
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('geocoder')
+
+NOMINATIM_USER_AGENT = "glucose-buddy-app"
+NOMINATIM_TIMEOUT = 10
+GEOCODE_CACHE_MAX_ENTRIES = 5000
+# Places are kept until evicted; a miss may be a typo fixed upstream or a
+# new address, so it is only remembered for a while
+GEOCODE_MISS_TTL = 24 * 60 * 60  # seconds
+
+_MISSING = object()
+
+_cache = PersistentLRUCache("geocode", max_entries=GEOCODE_CACHE_MAX_ENTRIES)
+_misses = PersistentLRUCache("geocode_misses", max_entries=GEOCODE_CACHE_MAX_ENTRIES, ttl=GEOCODE_MISS_TTL)
+_flight = SingleFlight("geocode")
+_geolocator = None
+
+def normalize_query(query):
+    """
+    Normalize a free-text location so trivially different spellings share a
+    cache entry: case, surrounding whitespace, repeated spaces and spacing
+    around commas are ignored.
+    """
+    if not query:
+        return ""
+    normalized = re.sub(r'\s+', ' ', query.strip().lower())
+    normalized = re.sub(r'\s*,\s*', ', ', normalized)
+    return normalized.strip(' ,.')
+
+def _geocode_remote(query):
+    global _geolocator
+    if _geolocator is None:
+        from geopy.geocoders import Nominatim
+        _geolocator = Nominatim(user_agent=NOMINATIM_USER_AGENT, timeout=NOMINATIM_TIMEOUT)
+
+    logger.info(f"Geocoding with Nominatim: {query}")
+    location = api_call("nominatim", _geolocator.geocode, query)
+    if not location:
+        return None
+    return {
+        "lat": location.latitude,
+        "lng": location.longitude,
+        "address": location.address
+    }
+
+def geocode(query):
+    """
+    Resolve a free-text location to {"lat", "lng", "address"}, or None if
+    Nominatim does not know it. Results are cached on disk (misses for
+    GEOCODE_MISS_TTL), concurrent lookups for the same query share one request, and
+    outbound requests are spaced to respect Nominatim's rate limit.
+    Errors from the geocoding service are raised and not cached.
+    """
+    key = normalize_query(query)
+    if not key:
+        return None
+
+    cached = _cached(key)
+    if cached is not _MISSING:
+        return cached
+
+    def lookup():
+        # Another caller may have filled the cache while we waited
+        cached = _cached(key)
+        if cached is not _MISSING:
+            return cached
+        result = _geocode_remote(query.strip())
+        if result is None:
+            _misses.set(key, True)
+        else:
+            _cache.set(key, result)
+        return result
+
+    return _flight.do(key, lookup)
+
+def _cached(key):
+    """Cached place for key, None for a recent miss, or _MISSING"""
+    if _misses.get(key) is not None:
+        return None
+    cached = _cache.get(key)
+    return cached if cached is not None else _MISSING
+
+def clear_geocode_cache():
+    """Forget every geocoded place and miss"""
+    _cache.clear()
+    _misses.clear()
@@ -1,8 +1,8 @@
 
-from crewai import Agent, Task, Crew
-import fitz  # PyMuPDF
 from dotenv import load_dotenv
 import os
+import re
+from model_router import routed_kickoff, routed_stream, routed_agent, agent_messages, AgentProfile, AGENT_VERBOSE
 
 # === Load API Key ===
 load_dotenv()
@@ -10,6 +10,7 @@ os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
 
 # === Step 1: Read the PDF ===
 def extract_pdf_text(file_path):
+    import fitz  # PyMuPDF
     doc = fitz.open(file_path)
     text = ""
     for page in doc:
@@ -17,115 +18,166 @@ def extract_pdf_text(file_path):
     return text
 
 # === Step 2: Setup Your Agents ===
-llm_config = {"model": "gpt-3.5-turbo", "api_key": os.getenv("OPENAI_API_KEY")}
-
-extractor = Agent(
+extractor = AgentProfile(
     role="Extractor Agent",
     goal="Extract food items and glucose readings from CGM text, identifying the impact of each meal.",
-    backstory="You are a skilled medical assistant that processes CGM data and identifies glucose responses to specific foods.",
-    verbose=True,
-    llm_config=llm_config
+    backstory="You are a skilled medical assistant that processes CGM data and identifies glucose responses to specific foods."
 )
 
-analyzer = Agent(
+analyzer = AgentProfile(
     role="Analyzer Agent",
     goal="Identify which specific food items and combinations caused glucose spikes or were glucose-friendly.",
-    backstory="You are a nutrition-aware analyst who can interpret blood sugar effects caused by real meals.",
-    verbose=True,
-    llm_config=llm_config
+    backstory="You are a nutrition-aware analyst who can interpret blood sugar effects caused by real meals."
 )
 
-reporter = Agent(
+reporter = AgentProfile(
     role="Reporter Agent",
     goal="Create a personalized glucose report using specific meal names, glucose readings, and helpful insights.",
-    backstory="You explain food-glucose patterns in a friendly, clear way to help users eat better.",
-    verbose=True,
-    llm_config=llm_config
+    backstory="You explain food-glucose patterns in a friendly, clear way to help users eat better."
 )
 
-menu_analyzer = Agent(
+menu_analyzer = AgentProfile(
     role="Menu Advisor",
     goal="Review restaurant menus and recommend or avoid items based on user's personal glucose history.",
-    backstory="You understand how specific ingredients affect glucose for this unique person and suggest smart, stable choices.",
-    verbose=True,
-    llm_config=llm_config
+    backstory="You understand how specific ingredients affect glucose for this unique person and suggest smart, stable choices."
 )
 
 # === Step 3: Define CGM Report Agent Workflow ===
 def run_cgm_analysis(pdf_text):
-    task1 = Task(
-        description=(
-            "From the Dexcom Clarity CGM report text, extract a structured list of meals and their glucose readings.\n"
-            "- Include meal type (breakfast, lunch, dinner, snack)\n"
-            "- Food items eaten\n"
-            "- Glucose level recorded after each meal\n"
-            "- Label each entry as either 'spike' (>140 mg/dL) or 'friendly' (70–130 mg/dL)\n"
-            "**Only extract meals from the text. Do NOT create or assume foods. Do not add examples that are not present in the text.**\n\n"
-            "Return something like:\n"
-            "Lunch: Chickpeas salad + roti paneer → 150 mg/dL (spike)"
-        ),
-        expected_output="Detailed meal list with glucose values and classification",
-        agent=extractor
-    )
-
-    task2 = Task(
-        description=(
-            "Based on the extracted meals and glucose readings, analyze:\n"
-            "- Identify which specific foods caused spikes or were friendly\n"
-            "- Look for patterns or combos that help\n"
-            "- Only use meals present in the original Dexcom report — do not generate or assume extra foods."
-        ),
-        expected_output="List of spike-triggering foods and stable-food combos",
-        agent=analyzer,
-        context=[task1]
-    )
-
-    task3 = Task(
-        description=(
-            "Write a glucose report for the user.\n"
-            "- Use ONLY the meals extracted from the CGM report\n"
-            "- Do NOT mention meals like pasta, spaghetti, etc., unless they are explicitly mentioned in the data.\n"
-            "- Your job is to help the user understand how their real food impacted their glucose."
-        ),
-        expected_output="Full user-friendly glucose summary with personalized advice",
-        agent=reporter,
-        context=[task2]
-    )
-
-    crew = Crew(
-        agents=[extractor, analyzer, reporter],
-        tasks=[task1, task2, task3],
-        verbose=True
-    )
-
-    result = crew.kickoff()
+    def make_crew(llm):
+        from crewai import Task, Crew
+        extractor_agent = routed_agent(extractor, llm)
+        analyzer_agent = routed_agent(analyzer, llm)
+        reporter_agent = routed_agent(reporter, llm)
+
+        task1 = Task(
+            description=(
+                "From the Dexcom Clarity CGM report text, extract a structured list of meals and their glucose readings.\n"
+                "- Include meal type (breakfast, lunch, dinner, snack)\n"
+                "- Food items eaten\n"
+                "- Glucose level recorded after each meal\n"
+                "- Label each entry as either 'spike' (>140 mg/dL) or 'friendly' (70–130 mg/dL)\n"
+                "**Only extract meals from the text. Do NOT create or assume foods. Do not add examples that are not present in the text.**\n\n"
+                "Return something like:\n"
+                "Lunch: Chickpeas salad + roti paneer → 150 mg/dL (spike)"
+            ),
+            expected_output="Detailed meal list with glucose values and classification",
+            agent=extractor_agent
+        )
+
+        task2 = Task(
+            description=(
+                "Based on the extracted meals and glucose readings, analyze:\n"
+                "- Identify which specific foods caused spikes or were friendly\n"
+                "- Look for patterns or combos that help\n"
+                "- Only use meals present in the original Dexcom report — do not generate or assume extra foods."
+            ),
+            expected_output="List of spike-triggering foods and stable-food combos",
+            agent=analyzer_agent,
+            context=[task1]
+        )
+
+        task3 = Task(
+            description=(
+                "Write a glucose report for the user.\n"
+                "- Use ONLY the meals extracted from the CGM report\n"
+                "- Do NOT mention meals like pasta, spaghetti, etc., unless they are explicitly mentioned in the data.\n"
+                "- Your job is to help the user understand how their real food impacted their glucose."
+            ),
+            expected_output="Full user-friendly glucose summary with personalized advice",
+            agent=reporter_agent,
+            context=[task2]
+        )
+
+        return Crew(
+            agents=[extractor_agent, analyzer_agent, reporter_agent],
+            tasks=[task1, task2, task3],
+            verbose=AGENT_VERBOSE
+        )
+
+    result = routed_kickoff("extraction", "cgm_analysis", make_crew, cache_key=pdf_text,
+                            fallback=lambda: summarize_cgm_locally(pdf_text))
     return result
 
 # === Step 4: Menu Analyzer Based on Personal CGM Pattern ===
-def analyze_menu(menu_text, user_glucose_summary):
-    task = Task(
-        description=(
-            "You are given the following:\n\n"
-            f"🧠 User's glucose history summary:\n{user_glucose_summary}\n\n"
-            f"📋 Restaurant Menu:\n{menu_text}\n\n"
-            "Your job:\n"
-            "- Match menu items with foods that previously caused glucose spikes (flag these ❌)\n"
-            "- Match menu items with foods that were friendly (mark these ✅)\n"
-            "- Suggest safer alternatives or combinations (e.g., 'grilled chicken + greens' instead of 'paneer wrap')\n"
-            "- Use knowledge of carbs, sugar, fiber, and ingredients to make intelligent suggestions.\n\n"
-            "Return result in this format:\n\n"
-            "✅ Safe Dishes:\n- Dish – why it’s safe\n\n"
-            "❌ Avoid:\n- Dish – matches your spike foods or contains risky ingredients\n\n"
-            "🧠 Smart Combos:\n- Combo – why it helps with glucose stability"
-        ),
-        expected_output="Safe, avoid, and smart combos based on personal glucose history",
-        agent=menu_analyzer
+MENU_ANALYSIS_OUTPUT = "Safe, avoid, and smart combos based on personal glucose history"
+
+def menu_analysis_description(menu_text, user_glucose_summary):
+    return (
+        "You are given the following:\n\n"
+        f"🧠 User's glucose history summary:\n{user_glucose_summary}\n\n"
+        f"📋 Restaurant Menu:\n{menu_text}\n\n"
+        "Your job:\n"
+        "- Match menu items with foods that previously caused glucose spikes (flag these ❌)\n"
+        "- Match menu items with foods that were friendly (mark these ✅)\n"
+        "- Suggest safer alternatives or combinations (e.g., 'grilled chicken + greens' instead of 'paneer wrap')\n"
+        "- Use knowledge of carbs, sugar, fiber, and ingredients to make intelligent suggestions.\n\n"
+        "Return result in this format:\n\n"
+        "✅ Safe Dishes:\n- Dish – why it’s safe\n\n"
+        "❌ Avoid:\n- Dish – matches your spike foods or contains risky ingredients\n\n"
+        "🧠 Smart Combos:\n- Combo – why it helps with glucose stability"
     )
 
-    crew = Crew(
-        agents=[menu_analyzer],
-        tasks=[task],
-        verbose=True
-    )
-
-    return crew.kickoff()
+def analyze_menu(menu_text, user_glucose_summary):
+    def make_crew(llm):
+        from crewai import Task, Crew
+        agent = routed_agent(menu_analyzer, llm)
+        task = Task(
+            description=menu_analysis_description(menu_text, user_glucose_summary),
+            expected_output=MENU_ANALYSIS_OUTPUT,
+            agent=agent
+        )
+        return Crew(agents=[agent], tasks=[task], verbose=AGENT_VERBOSE)
+
+    return routed_kickoff("menu_analysis", "menu_analysis", make_crew, cache_key=f"{menu_text}\0{user_glucose_summary}",
+                          fallback=lambda: score_menu_locally(menu_text, user_glucose_summary))
+
+def stream_menu_analysis(menu_text, user_glucose_summary):
+    """analyze_menu, yielding the suggestions in chunks as they are generated"""
+    messages = agent_messages(menu_analyzer, menu_analysis_description(menu_text, user_glucose_summary), MENU_ANALYSIS_OUTPUT)
+    return routed_stream("menu_analysis", "menu_analysis", messages, cache_key=f"{menu_text}\0{user_glucose_summary}",
+                         fallback=lambda: score_menu_locally(menu_text, user_glucose_summary))
+
+# === Local fallbacks, used once a user's LLM budget is spent ===
+GLUCOSE_READING = re.compile(r"(\d{2,3})\s*mg/dL", re.IGNORECASE)
+SPIKE_THRESHOLD = 140  # mg/dL
+HIGH_CARB_WORDS = ["rice", "naan", "bread", "roti", "pasta", "noodle", "pizza", "potato", "fries", "sugar", "sweet",
+                   "dessert", "cake", "juice", "soda", "tortilla", "dumpling", "pancake", "biryani", "rolls"]
+STEADY_WORDS = ["grilled", "salad", "greens", "vegetable", "fish", "chicken", "egg", "lentil", "dal", "tofu",
+                "paneer", "beans", "soup", "steak", "shrimp", "kebab", "tandoori", "sashimi"]
+BUDGET_NOTE = "(AI budget for this month reached — quick local estimate)"
+
+def summarize_cgm_locally(pdf_text):
+    """Spike and steady meals read straight from the report lines that carry a glucose value"""
+    spikes, steady = [], []
+    for line in pdf_text.splitlines():
+        readings = [int(value) for value in GLUCOSE_READING.findall(line)]
+        if readings and len(line.strip()) > len(GLUCOSE_READING.search(line).group(0)) + 3:
+            (spikes if max(readings) > SPIKE_THRESHOLD else steady).append(line.strip())
+    summary = f"{BUDGET_NOTE}\n"
+    summary += "Meals followed by a spike:\n" + ("".join(f"- {line}\n" for line in spikes[:10]) or "- none found\n")
+    summary += "Meals that stayed in range:\n" + ("".join(f"- {line}\n" for line in steady[:10]) or "- none found\n")
+    return summary
+
+def score_menu_locally(menu_text, user_glucose_summary):
+    """
+    Sort menu lines into safe and avoid lists by keyword: foods the summary
+    links to spikes and high-carb words count against a dish, steady
+    proteins and vegetables count for it
+    """
+    summary = user_glucose_summary.lower()
+    spike_words = [word for word in HIGH_CARB_WORDS if word in summary] + HIGH_CARB_WORDS
+    safe, avoid = [], []
+    for line in menu_text.splitlines():
+        dish = line.strip(" •-*\t")
+        if len(dish) < 3 or dish.endswith(":"):
+            continue
+        lowered = dish.lower()
+        risk = sum(word in lowered for word in spike_words) - sum(word in lowered for word in STEADY_WORDS)
+        if risk > 0:
+            avoid.append(dish)
+        elif risk < 0:
+            safe.append(dish)
+    return (f"{BUDGET_NOTE}\n\n✅ Safe Dishes:\n" + "".join(f"- {dish} – protein or vegetables first\n" for dish in safe[:6]) +
+            "\n❌ Avoid:\n" + "".join(f"- {dish} – high-carb or linked to your spikes\n" for dish in avoid[:6]) +
+            "\n🧠 Smart Combos:\n- Pair any starch with a protein and greens, and eat the vegetables first\n")
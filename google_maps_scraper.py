@@ -1,3 +1,4 @@
+import os
 import time
 import logging
 from selenium import webdriver
@@ -8,11 +9,16 @@ from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, ElementClickInterceptedException
+from cache_store import SingleFlight
+from chain_cache import detect_chain, get_chain_menu, set_chain_menu, location_key
+from tracing import span, traced
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('google_maps_scraper')
 
+GOOGLE_MAPS_URL = os.getenv("GOOGLE_MAPS_URL", "https://www.google.com/maps")
+
 class GoogleMapsScraper:
     def __init__(self, headless=True):
         """Initialize the Google Maps scraper with Chrome webdriver"""
@@ -29,6 +35,7 @@ class GoogleMapsScraper:
         
         self.driver = None
     
+    @traced("browser_start")
     def start_browser(self):
         """Start the Chrome browser"""
         try:
@@ -39,12 +46,17 @@ class GoogleMapsScraper:
             logger.error(f"Failed to start Chrome browser: {str(e)}")
             return False
     
+    def _pause(self, seconds):
+        """Give the page time to load after a navigation or click"""
+        time.sleep(seconds)
+    
     def close_browser(self):
         """Close the browser"""
         if self.driver:
             self.driver.quit()
             logger.info("Browser closed")
     
+    @traced("browser_navigate")
     def search_restaurant(self, restaurant_name, location=None):
         """Search for a specific restaurant on Google Maps"""
         if not self.driver:
@@ -53,7 +65,7 @@ class GoogleMapsScraper:
         
         try:
             # Navigate to Google Maps
-            self.driver.get("https://www.google.com/maps")
+            self.driver.get(GOOGLE_MAPS_URL)
             logger.info("Navigated to Google Maps")
             
             # Wait for search box to load
@@ -72,7 +84,7 @@ class GoogleMapsScraper:
             logger.info(f"Searching for: {search_query}")
             
             # Wait for results to load
-            time.sleep(3)
+            self._pause(3)
             
             # Check if we have results
             results = self.driver.find_elements(By.CSS_SELECTOR, "a.hfpxzc")
@@ -85,7 +97,7 @@ class GoogleMapsScraper:
             logger.info("Clicked on first restaurant result")
             
             # Wait for restaurant details to load
-            time.sleep(3)
+            self._pause(3)
             
             return True
         
@@ -93,6 +105,7 @@ class GoogleMapsScraper:
             logger.error(f"Error searching for restaurant: {str(e)}")
             return None
     
+    @traced("browser_extract_menu")
     def get_restaurant_menu(self):
         """Extract menu items from the restaurant page"""
         if not self.driver:
@@ -125,7 +138,7 @@ class GoogleMapsScraper:
                         view_menu_buttons[0].click()
                         menu_clicked = True
                         logger.info("Clicked 'View menu' button")
-                        time.sleep(3)
+                        self._pause(3)
                 except Exception as e:
                     logger.error(f"Error clicking 'View menu' button: {str(e)}")
             
@@ -147,7 +160,7 @@ class GoogleMapsScraper:
                     return None, None
             
             # Wait for category tabs to load
-            time.sleep(3)
+            self._pause(3)
             
             # Find category tabs
             all_tabs_after = self.driver.find_elements(By.CSS_SELECTOR, "div.Gpq6kf.NlVald")
@@ -176,7 +189,7 @@ class GoogleMapsScraper:
                     tab_text = tab.text.strip().lower()
                     logger.info(f"Clicking category tab {i+1}: {tab_text}")
                     tab.click()
-                    time.sleep(2)
+                    self._pause(2)
                     
                     # Determine category
                     category = "main"  # Default category
@@ -209,6 +222,7 @@ class GoogleMapsScraper:
             logger.error(f"Error extracting menu: {str(e)}")
             return None, None
     
+    @traced("browser_extract_info")
     def get_restaurant_info(self):
         """Get basic information about the restaurant"""
         if not self.driver:
@@ -278,8 +292,29 @@ class GoogleMapsScraper:
                 "url": self.driver.current_url if self.driver else ""
             }
 
-def get_real_menu_from_google_maps(restaurant_name, location=None):
-    """Main function to get a real menu from Google Maps"""
+_maps_flight = SingleFlight("google_maps_menu")
+
+def get_real_menu_from_google_maps(restaurant_name, location=None, place_id=None, domain=None):
+    """
+    Main function to get a real menu from Google Maps
+    Locations of a known chain (see chain_cache.detect_chain; domain is the
+    place's website domain) reuse the chain's Google Maps menu instead of
+    launching a browser, and concurrent calls for the same place share one
+    browser session.
+    """
+    key = location_key(restaurant_name, location, place_id)
+    with span("google_maps_menu", restaurant=restaurant_name) as maps_span:
+        menu, success, url = _maps_flight.do(key, _scrape_menu_from_google_maps, restaurant_name, location, place_id, domain)
+        maps_span.set(found=bool(success))
+        return menu, success, url
+
+def _scrape_menu_from_google_maps(restaurant_name, location=None, place_id=None, domain=None):
+    chain = detect_chain(restaurant_name, place_id, domain, location)
+    shared = get_chain_menu(chain, source="Google Maps")
+    if shared:
+        logger.info(f"Using shared chain menu for {restaurant_name}")
+        return shared['menu'] + f"\nShared menu for all {restaurant_name} locations\n", True, shared['url']
+    
     scraper = GoogleMapsScraper(headless=True)
     
     try:
@@ -326,6 +361,8 @@ def get_real_menu_from_google_maps(restaurant_name, location=None):
                         formatted_menu += f"• {item}\n"
                     formatted_menu += "\n"
                 
+                set_chain_menu(chain, formatted_menu, "Google Maps", restaurant_info['url'] if restaurant_info else None)
+                
                 # Add restaurant info
                 if restaurant_info:
                     formatted_menu += f"\nRestaurant: {restaurant_info['name']}\n"
@@ -1,20 +1,18 @@
-from crewai import Agent, Task, Crew
 import os
 import re
 from dotenv import load_dotenv
+from model_router import routed_kickoff, routed_agent, AgentProfile
 
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY
 
-menu_agent = Agent(
+menu_agent = AgentProfile(
     role="Menu Generator",
     goal="Generate accurate restaurant menus based on cuisine type and restaurant name",
     backstory="""You are an expert in international cuisines and restaurant menus. 
     You understand the authentic dishes of each cuisine and create realistic menu items.
-    You can detect the likely cuisine of a restaurant from its name and ensure menu items match that cuisine.""",
-    verbose=True,
-    llm_config={"model": "gpt-4", "api_key": OPENAI_API_KEY}
+    You can detect the likely cuisine of a restaurant from its name and ensure menu items match that cuisine."""
 )
 
 def detect_cuisine_from_name(restaurant_name):
@@ -60,31 +58,41 @@ def simulate_menu(restaurant_name, cuisine_type=None):
 
     cuisine_prompt = cuisine_prompts.get(cuisine_type, cuisine_prompts["International"])
     
-    task = Task(
-        description=f"""Generate a realistic menu for '{restaurant_name}'.
-        This is specifically a {cuisine_type} restaurant.
-        {cuisine_prompt}.
-        Include appetizers, main courses, and desserts.
-        List 8-10 popular dishes that would be found in this type of restaurant.
-        Make sure all dishes are authentic to {cuisine_type} cuisine.
-        Format as a clean bullet list with emoji icons for each category.
+    def make_crew(llm):
+        from crewai import Task, Crew
+        agent = routed_agent(menu_agent, llm)
+        task = Task(
+            description=f"""Generate a realistic menu for '{restaurant_name}'.
+            This is specifically a {cuisine_type} restaurant.
+            {cuisine_prompt}.
+            Include appetizers, main courses, and desserts.
+            List 8-10 popular dishes that would be found in this type of restaurant.
+            Make sure all dishes are authentic to {cuisine_type} cuisine.
+            Format as a clean bullet list with emoji icons for each category.
         
-        For example:
-        🥗 Appetizers:
-        • [Appetizer 1]
-        • [Appetizer 2]
+            For example:
+            🥗 Appetizers:
+            • [Appetizer 1]
+            • [Appetizer 2]
         
-        🍲 Main Courses:
-        • [Main Course 1]
-        • [Main Course 2]
+            🍲 Main Courses:
+            • [Main Course 1]
+            • [Main Course 2]
         
-        🍰 Desserts:
-        • [Dessert 1]
-        • [Dessert 2]
-        """,
-        expected_output=f"Authentic {cuisine_type} restaurant menu with categorized dishes",
-        agent=menu_agent
-    )
+            🍰 Desserts:
+            • [Dessert 1]
+            • [Dessert 2]
+            """,
+            expected_output=f"Authentic {cuisine_type} restaurant menu with categorized dishes",
+            agent=agent
+        )
+        return Crew(agents=[agent], tasks=[task])
 
-    crew = Crew(agents=[menu_agent], tasks=[task])
-    return crew.kickoff()
+    return routed_kickoff("menu_simulation", "simulate_menu", make_crew, cache_key=f"{restaurant_name}|{cuisine_type}",
+                          fallback=lambda: template_menu(cuisine_type, cuisine_prompt))
+
+def template_menu(cuisine_type, cuisine_prompt):
+    """A menu listing the typical dishes named in the cuisine prompt, without an LLM call"""
+    dishes = [dish.strip().capitalize() for dish in cuisine_prompt.split("like", 1)[-1].split(",") if dish.strip()]
+    menu = f"🍽️ Typical {cuisine_type} dishes (AI budget for this month reached):\n\n"
+    return menu + "".join(f"• {dish}\n" for dish in dishes)
@@ -0,0 +1,204 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import logging
+from contextvars import ContextVar
+from cache_store import PersistentLRUCache
+from tracing import traced_kickoff, crew_model, usage_counts
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('llm_meter')
+
+# USD per million (prompt, completion) tokens. Models are matched by the
+# longest prefix after any provider prefix ("openai/gpt-4o-mini").
+MODEL_PRICES = {
+    "gpt-4": (30.0, 60.0),
+    "gpt-4-turbo": (10.0, 30.0),
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-4.1": (2.0, 8.0),
+    "gpt-4.1-mini": (0.4, 1.6),
+    "gpt-4.1-nano": (0.1, 0.4),
+    "gpt-3.5-turbo": (0.5, 1.5)
+}
+
+# Monthly per-user budgets; a user over either one gets the cheaper path of
+# each feature (a cached response, else local scoring) instead of an LLM call.
+# LLM_USER_BUDGETS overrides the USD budget per user: {"alice": 5, "bob": 0.5}
+LLM_USER_MONTHLY_BUDGET_USD = float(os.getenv("LLM_USER_MONTHLY_BUDGET_USD", 0)) or None
+LLM_USER_MONTHLY_TOKEN_BUDGET = int(os.getenv("LLM_USER_MONTHLY_TOKEN_BUDGET", 0)) or None
+LLM_USER_BUDGETS = json.loads(os.getenv("LLM_USER_BUDGETS", "{}"))
+LLM_RESPONSE_TTL = 30 * 24 * 60 * 60  # seconds
+# Rough size of a token, for streams abandoned before their usage arrived
+CHARS_PER_TOKEN = 4
+ANONYMOUS_USER = "anonymous"
+
+_user = ContextVar("llm_user", default=ANONYMOUS_USER)
+_usage = PersistentLRUCache("llm_usage", max_entries=20000)
+_responses = PersistentLRUCache("llm_responses", max_entries=5000, ttl=LLM_RESPONSE_TTL)
+_lock = threading.Lock()
+
+class BudgetExceeded(Exception):
+    pass
+
+def set_llm_user(user):
+    """Attribute LLM calls made from here on (in this context) to user"""
+    _user.set(user or ANONYMOUS_USER)
+
+def current_llm_user():
+    return _user.get()
+
+def model_price(model):
+    name = (model or "").split("/")[-1]
+    matches = [prefix for prefix in MODEL_PRICES if name.startswith(prefix)]
+    return MODEL_PRICES[max(matches, key=len)] if matches else None
+
+def call_cost(model, prompt_tokens, completion_tokens):
+    """USD cost of one call, or 0.0 for a model without a known price"""
+    # A crew may list several models; price the call at the first known one
+    for candidate in (model or "").split(","):
+        price = model_price(candidate)
+        if price:
+            return (prompt_tokens * price[0] + completion_tokens * price[1]) / 1e6
+    return 0.0
+
+def _month():
+    return time.strftime('%Y-%m')
+
+def _empty_usage():
+    return {'calls': 0, 'llm_requests': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0,
+            'cost_usd': 0.0, 'latency_seconds': 0.0, 'errors': 0, 'degraded': 0, 'models': []}
+
+def record_call(feature, model, counts, latency, user=None, error=False, degraded=False):
+    """Add one metered call to the monthly totals of its user and feature"""
+    user = user or current_llm_user()
+    key = f"{_month()}|{user}|{feature}"
+    prompt_tokens = counts.get('prompt_tokens', 0) or 0
+    completion_tokens = counts.get('completion_tokens', 0) or 0
+    with _lock:
+        usage = dict(_usage.get(key) or _empty_usage())
+        usage['calls'] += 1
+        usage['llm_requests'] += counts.get('successful_requests', 0 if degraded else 1) or 0
+        usage['prompt_tokens'] += prompt_tokens
+        usage['completion_tokens'] += completion_tokens
+        usage['total_tokens'] += counts.get('total_tokens', prompt_tokens + completion_tokens) or 0
+        usage['cost_usd'] = round(usage['cost_usd'] + call_cost(model, prompt_tokens, completion_tokens), 6)
+        usage['latency_seconds'] = round(usage['latency_seconds'] + latency, 3)
+        usage['errors'] += int(error)
+        usage['degraded'] += int(degraded)
+        if model and model not in usage['models']:
+            usage['models'] = usage['models'] + [model]
+        _usage.set(key, usage)
+
+def usage_report(user=None, month=None):
+    """This month's metered usage as {user: {feature: totals}}, optionally for one user"""
+    month = month or _month()
+    report = {}
+    for key in _usage.keys():
+        key_month, key_user, feature = key.split("|", 2)
+        if key_month == month and (user is None or key_user == user):
+            usage = _usage.peek(key)
+            if usage:
+                report.setdefault(key_user, {})[feature] = usage
+    return report
+
+def user_totals(user=None, month=None):
+    """(cost_usd, total_tokens) of a user this month across all features"""
+    features = usage_report(user or current_llm_user(), month).get(user or current_llm_user(), {})
+    return (round(sum(usage['cost_usd'] for usage in features.values()), 6),
+            sum(usage['total_tokens'] for usage in features.values()))
+
+def user_budget(user=None):
+    """(usd_budget, token_budget) for a user; None means unlimited"""
+    user = user or current_llm_user()
+    return LLM_USER_BUDGETS.get(user, LLM_USER_MONTHLY_BUDGET_USD), LLM_USER_MONTHLY_TOKEN_BUDGET
+
+def over_budget(user=None):
+    cost, tokens = user_totals(user)
+    usd_budget, token_budget = user_budget(user)
+    return (usd_budget is not None and cost >= usd_budget) or (token_budget is not None and tokens >= token_budget)
+
+def _response_key(feature, user, cache_key):
+    return f"{user}|{feature}|{hashlib.sha1(cache_key.encode('utf-8')).hexdigest()}"
+
+def _keep_response(feature, user, cache_key, text):
+    """
+    Keep a response for the user's own degraded path. A user without a
+    budget never takes that path, so nothing is kept for them.
+    """
+    if cache_key and user_budget(user) != (None, None):
+        _responses.set(_response_key(feature, user, cache_key), text)
+
+def _degraded(feature, user, cache_key, fallback):
+    """The cached response or fallback() in place of a call by an over-budget user"""
+    cached = _responses.get(_response_key(feature, user, cache_key)) if cache_key else None
+    if cached is not None or fallback is not None:
+        logger.info(f"{user} is over the LLM budget; using the {'cached' if cached is not None else 'local'} {feature} result")
+        record_call(feature, None, {}, 0.0, user, degraded=True)
+        return cached if cached is not None else fallback()
+    raise BudgetExceeded(f"Monthly LLM budget used for {user}")
+
+def metered_call(feature, call, model=None, cache_key=None, fallback=None):
+    """
+    Run one LLM invocation, call(), metering its tokens, latency and cost
+    against the current user and feature. When cache_key is given and the
+    user has a budget, the response is also kept for that user's reuse.
+    Once the user is over budget the call is not made: the cached response
+    for cache_key is returned if there is one, else fallback(); without
+    either BudgetExceeded is raised.
+    """
+    user = current_llm_user()
+    if over_budget(user):
+        return _degraded(feature, user, cache_key, fallback)
+
+    started = time.monotonic()
+    try:
+        result = call()
+    except Exception:
+        record_call(feature, model, {}, time.monotonic() - started, user, error=True)
+        raise
+    record_call(feature, model, usage_counts(result), time.monotonic() - started, user)
+    _keep_response(feature, user, cache_key, str(result))
+    return result
+
+def metered_kickoff(feature, crew, cache_key=None, fallback=None):
+    """crew.kickoff(), traced and metered under feature (see metered_call)"""
+    return metered_call(feature, lambda: traced_kickoff(feature, crew), crew_model(crew), cache_key, fallback)
+
+def metered_stream(feature, stream, model=None, cache_key=None, fallback=None):
+    """
+    metered_call for a streamed response: stream(usage) yields text chunks
+    and fills the usage dict with the token counts once they are known.
+    Chunks are passed on as they arrive; the call is metered, and the full
+    text kept as in metered_call, when the stream ends. A stream the caller abandons is still
+    metered, its completion tokens estimated from the text received when
+    the final usage never arrived. Over budget, the cached response or
+    fallback() is yielded as a single chunk.
+    """
+    user = current_llm_user()
+    if over_budget(user):
+        yield str(_degraded(feature, user, cache_key, fallback))
+        return
+
+    started = time.monotonic()
+    usage, parts = {}, []
+    chunks = stream(usage)
+    outcome = "abandoned"
+    try:
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        outcome = "complete"
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        # Ends the request too when the caller stopped reading
+        chunks.close()
+        if outcome == "abandoned" and 'completion_tokens' not in usage:
+            usage['completion_tokens'] = len("".join(parts)) // CHARS_PER_TOKEN
+        record_call(feature, model, usage, time.monotonic() - started, user, error=outcome == "error")
+    _keep_response(feature, user, cache_key, "".join(parts))
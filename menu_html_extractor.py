@@ -0,0 +1,264 @@
+import re
+import logging
+from html.parser import HTMLParser
+from menu_schema import parse_menu_ld_json, format_menu_item
+
+# lxml's C parser is used when installed; the standard library parser otherwise
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('menu_html_extractor')
+
+# Elements whose text is one candidate menu line
+UNIT_TAGS = {'li', 'p', 'dt', 'dd', 'td', 'th', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'article', 'div', 'tr'}
+HEADING_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+SKIP_TAGS = {'script', 'style', 'noscript', 'template', 'svg', 'iframe'}
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+# Start tags that implicitly close an open element of the given tag
+IMPLICIT_CLOSE = {
+    'li': {'li'},
+    'p': {'p'},
+    'dt': {'dt', 'dd'},
+    'dd': {'dt', 'dd'},
+    'tr': {'tr', 'td', 'th'},
+    'td': {'td', 'th'},
+    'th': {'td', 'th'}
+}
+
+MENU_HINT = re.compile(r'menu|food|appetizer|entree|main|dessert|dinner|lunch|breakfast|dish')
+ITEM_HINT = re.compile(r'item|dish|food|product')
+# Class/id words that mark a list of items rather than a single item
+CONTAINER_HINT = re.compile(r'items|dishes|products|list|section|categor|group|wrap|container|grid|menu(?![-_ ]?item)')
+# Rows that collect the text of their cells into one item
+ROW_TAGS = {'li', 'tr'}
+PRICE_PATTERN = re.compile(r'\$\d+(?:\.\d{2})?')
+WHITESPACE = re.compile(r'\s+')
+CATEGORY_KEYWORDS = [
+    ('appetizer', ('appetizer', 'starter', 'small plate')),
+    ('main', ('main', 'entree', 'dinner')),
+    ('dessert', ('dessert', 'sweet', 'pastry'))
+]
+
+MIN_ITEM_LENGTH = 10
+MAX_ITEM_LENGTH = 200
+
+def category_for(text):
+    text = text.lower()
+    for category, keywords in CATEGORY_KEYWORDS:
+        if any(keyword in text for keyword in keywords):
+            return category
+    return None
+
+class _Frame:
+    __slots__ = ('tag', 'is_unit', 'is_item', 'section', 'pieces')
+
+    def __init__(self, tag, is_unit, is_item, section):
+        self.tag = tag
+        self.is_unit = is_unit
+        self.is_item = is_item
+        self.section = section
+        self.pieces = [] if is_unit or is_item else None
+
+class _Section:
+    __slots__ = ('hinted', 'category')
+
+    def __init__(self, hinted, category):
+        self.hinted = hinted
+        self.category = category
+
+class _MenuScanner:
+    """
+    Parser target that collects candidate menu lines while the document is
+    parsed. Text is appended only to the innermost open unit element, and a
+    closed unit hands its text once to the enclosing row or menu item, so
+    the scan is linear in the size of the document.
+    """
+    def __init__(self):
+        self.root = _Section(hinted=False, category=None)
+        self.stack = []
+        self.skip_depth = 0
+        # (text, category, in_menu_section, looks_like_item) in document order
+        self.units = []
+
+    def _nearest(self, predicate):
+        for frame in reversed(self.stack):
+            if predicate(frame):
+                return frame
+        return None
+
+    def start(self, tag, attrs):
+        tag = tag.lower() if isinstance(tag, str) else ''
+        if self.skip_depth:
+            if tag in SKIP_TAGS:
+                self.skip_depth += 1
+            return
+        if tag in SKIP_TAGS:
+            self.skip_depth = 1
+            return
+        if tag in VOID_TAGS:
+            return
+
+        closes = IMPLICIT_CLOSE.get(tag)
+        if closes and self.stack and self.stack[-1].tag in closes:
+            self.end(self.stack[-1].tag)
+
+        hint_text = f"{attrs.get('class') or ''} {attrs.get('id') or ''}".lower()
+        parent_section = self.stack[-1].section if self.stack else self.root
+        section = parent_section
+        if (hint_text.strip() and MENU_HINT.search(hint_text)) or tag == 'section':
+            section = _Section(hinted=parent_section.hinted or bool(MENU_HINT.search(hint_text)),
+                               category=category_for(hint_text) or parent_section.category)
+
+        is_item = bool(ITEM_HINT.search(hint_text)) and not CONTAINER_HINT.search(hint_text)
+        self.stack.append(_Frame(tag, tag in UNIT_TAGS, is_item, section))
+
+    def end(self, tag):
+        tag = tag.lower() if isinstance(tag, str) else ''
+        if self.skip_depth:
+            if tag in SKIP_TAGS:
+                self.skip_depth -= 1
+            return
+        if not any(frame.tag == tag for frame in self.stack):
+            return
+        while self.stack:
+            frame = self.stack.pop()
+            self._close(frame)
+            if frame.tag == tag:
+                break
+
+    def data(self, text):
+        if self.skip_depth or not self.stack:
+            return
+        frame = self.stack[-1]
+        if frame.pieces is None:
+            frame = self._nearest(lambda f: f.pieces is not None)
+            if frame is None:
+                return
+        frame.pieces.append(text)
+
+    def close(self):
+        while self.stack:
+            self._close(self.stack.pop())
+
+    def _close(self, frame):
+        if frame.pieces is None:
+            return
+        text = WHITESPACE.sub(' ', ''.join(frame.pieces)).strip()
+        frame.pieces = None
+        if not text:
+            return
+
+        # Cells, names and prices inside a row or menu item become part of its text
+        target = self._nearest(lambda f: (f.is_item or f.tag in ROW_TAGS) and f.pieces is not None)
+        if target is not None:
+            target.pieces.append(' ' + text + ' ')
+            return
+
+        section = frame.section
+        if frame.tag in HEADING_TAGS:
+            # Headings switch the category for the units that follow in this section
+            category = category_for(text)
+            if category:
+                section.category = category
+            if category or 'menu' in text.lower():
+                return
+
+        if MIN_ITEM_LENGTH < len(text) < MAX_ITEM_LENGTH:
+            looks_like_item = frame.is_item or bool(PRICE_PATTERN.search(text))
+            self.units.append((text, section.category, section.hinted, looks_like_item))
+
+class _StdlibParser(HTMLParser):
+    def __init__(self, scanner):
+        super().__init__(convert_charrefs=True)
+        self.scanner = scanner
+
+    def handle_starttag(self, tag, attrs):
+        self.scanner.start(tag, {name: value for name, value in attrs})
+
+    def handle_startendtag(self, tag, attrs):
+        pass
+
+    def handle_endtag(self, tag):
+        self.scanner.end(tag)
+
+    def handle_data(self, data):
+        self.scanner.data(data)
+
+def _scan(html):
+    if etree is not None:
+        scanner = _MenuScanner()
+        try:
+            etree.fromstring(html, etree.HTMLParser(target=scanner, recover=True))
+            return scanner
+        except (ValueError, etree.LxmlError):
+            pass
+
+    scanner = _MenuScanner()
+    parser = _StdlibParser(scanner)
+    parser.feed(html)
+    parser.close()
+    scanner.close()
+    return scanner
+
+def menu_items_from_schema(menu):
+    """Convert parse_menu_ld_json output to (menu_items, categories)"""
+    menu_items = []
+    categories = {}
+    for item in menu['items']:
+        text = format_menu_item(item)
+        menu_items.append(text)
+        category = category_for(item['section'] or '')
+        if category:
+            categories.setdefault(category, []).append(text)
+    return menu_items, categories
+
+def extract_menu_items(html, structured=True):
+    """
+    Single-pass alternative to the BeautifulSoup heuristics in
+    real_menu_fetcher. Walks the document once, tagging each candidate line
+    with its menu section, category heading and whether it looks like an
+    item, and returns (menu_items, categories) or (None, None) when fewer
+    than 3 plausible items are found. Unless structured is False, schema.org
+    menu data in JSON-LD is used instead whenever the page has it.
+    """
+    if not html:
+        return None, None
+    if structured:
+        menu = parse_menu_ld_json(html)
+        if menu and len(menu['items']) >= 3:
+            logger.info(f"Extracted {len(menu['items'])} menu items from structured data")
+            return menu_items_from_schema(menu)
+    try:
+        scanner = _scan(html)
+    except Exception as e:
+        logger.error(f"Error scanning HTML: {str(e)}")
+        return None, None
+
+    # Prefer text inside sections marked as menus, and within that, text that
+    # looks like a menu item (item markup or a price)
+    units = [unit for unit in scanner.units if unit[2]]
+    if len(units) < 3:
+        units = scanner.units
+    strong = [unit for unit in units if unit[3]]
+    if len(strong) >= 3:
+        units = strong
+
+    menu_items = []
+    categories = {}
+    seen = set()
+    for text, category, _, _ in units:
+        if text in seen:
+            continue
+        seen.add(text)
+        menu_items.append(text)
+        if category:
+            categories.setdefault(category, []).append(text)
+
+    if len(menu_items) >= 3:
+        logger.info(f"Extracted {len(menu_items)} menu items in a single pass")
+        return menu_items, categories
+    return None, None
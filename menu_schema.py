@@ -0,0 +1,214 @@
+import json
+import re
+import logging
+from urllib.parse import urljoin
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('menu_schema')
+
+# JSON-LD blocks are found with a regex so structured menus are read before
+# (and usually instead of) any HTML parsing
+LD_JSON_PATTERN = re.compile(
+    r'<script[^>]*type\s*=\s*["\']?application/ld\+json["\']?[^>]*>(.*?)</script\s*>',
+    re.IGNORECASE | re.DOTALL
+)
+
+NUTRITION_FIELDS = {
+    'calories': 'calories',
+    'carbohydrateContent': 'carbs',
+    'sugarContent': 'sugar',
+    'fiberContent': 'fiber',
+    'proteinContent': 'protein',
+    'fatContent': 'fat'
+}
+MENU_PROPERTIES = ('hasMenu', 'menu')
+SECTION_PROPERTIES = ('hasMenuSection',)
+ITEM_PROPERTIES = ('hasMenuItem',)
+
+def _types(node):
+    node_type = node.get('@type', [])
+    if isinstance(node_type, str):
+        node_type = [node_type]
+    return {t.split('/')[-1].split(':')[-1] for t in node_type if isinstance(t, str)}
+
+def _as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+def _text(value):
+    if isinstance(value, dict):
+        value = value.get('@value') or value.get('name')
+    if isinstance(value, list):
+        value = value[0] if value else None
+    return re.sub(r'\s+', ' ', str(value)).strip() if value not in (None, '') else None
+
+def _price(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f"{value:.2f}"
+    return _text(value)
+
+class _MenuCollector:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.ids = {}
+        self.items = []
+        self.menu_urls = []
+        self.visited = set()
+        self.seen_items = set()
+
+    def index(self, node):
+        """Record every node with an @id so references can be resolved"""
+        if isinstance(node, dict):
+            if '@id' in node and len(node) > 1:
+                self.ids.setdefault(node['@id'], node)
+            for value in node.values():
+                self.index(value)
+        elif isinstance(node, list):
+            for value in node:
+                self.index(value)
+
+    def resolve(self, node):
+        if isinstance(node, dict) and set(node) == {'@id'}:
+            return self.ids.get(node['@id'], node)
+        return node
+
+    def walk(self, node, section_path=()):
+        node = self.resolve(node)
+        if isinstance(node, list):
+            for value in node:
+                self.walk(value, section_path)
+            return
+        if not isinstance(node, dict) or id(node) in self.visited:
+            return
+        self.visited.add(id(node))
+
+        types = _types(node)
+        if 'MenuItem' in types:
+            self.add_item(node, section_path)
+            return
+
+        if types & {'Menu', 'MenuSection'}:
+            name = _text(node.get('name'))
+            if 'MenuSection' in types and name:
+                section_path = section_path + (name,)
+
+        for key in MENU_PROPERTIES:
+            for menu in _as_list(node.get(key)):
+                menu = self.resolve(menu)
+                if isinstance(menu, str):
+                    self.menu_urls.append(urljoin(self.base_url, menu))
+                elif isinstance(menu, dict) and 'items' in menu and not _types(menu):
+                    # Non-standard {"menu": {"items": [...]}} layout
+                    for item in _as_list(menu['items']):
+                        self.add_item(self.resolve(item), section_path)
+                else:
+                    self.walk(menu, section_path)
+
+        if 'Menu' in types and isinstance(node.get('url'), str) and not any(key in node for key in SECTION_PROPERTIES + ITEM_PROPERTIES):
+            # A Menu that only points at the page holding its sections
+            self.menu_urls.append(urljoin(self.base_url, node['url']))
+
+        for key in SECTION_PROPERTIES + ITEM_PROPERTIES:
+            self.walk(node.get(key), section_path)
+
+        for key in ('@graph', 'mainEntity', 'itemListElement', 'item'):
+            if key in node:
+                self.walk(node[key], section_path)
+
+    def add_item(self, node, section_path):
+        if not isinstance(node, dict):
+            return
+        name = _text(node.get('name'))
+        if not name:
+            return
+        section = ' > '.join(section_path) if section_path else None
+        if (section, name) in self.seen_items:
+            return
+        self.seen_items.add((section, name))
+
+        price = None
+        currency = None
+        for offer in _as_list(self.resolve(node.get('offers'))):
+            offer = self.resolve(offer)
+            if isinstance(offer, dict):
+                price = _price(offer.get('price') or offer.get('lowPrice'))
+                currency = _text(offer.get('priceCurrency'))
+                if price:
+                    break
+        if price is None:
+            price = _price(node.get('price'))
+
+        nutrition = {}
+        info = self.resolve(node.get('nutrition'))
+        if isinstance(info, dict):
+            for field, label in NUTRITION_FIELDS.items():
+                value = _text(info.get(field))
+                if value:
+                    nutrition[label] = value
+
+        self.items.append({
+            'name': name,
+            'description': _text(node.get('description')),
+            'price': price,
+            'currency': currency,
+            'nutrition': nutrition,
+            'section': section
+        })
+
+def find_ld_json_blocks(html):
+    """Decoded JSON-LD documents embedded in the page (unparseable blocks are skipped)"""
+    blocks = []
+    for match in LD_JSON_PATTERN.finditer(html or ''):
+        raw = match.group(1).strip()
+        if raw.startswith('<!--'):
+            raw = raw[4:].rsplit('-->', 1)[0]
+        try:
+            blocks.append(json.loads(raw))
+        except Exception:
+            continue
+    return blocks
+
+def parse_menu_ld_json(html, base_url=""):
+    """
+    Parse schema.org Menu / MenuSection / MenuItem data from a page's JSON-LD,
+    including @graph containers, nested subsections and @id references.
+    Returns {"items": [...], "menu_urls": [...]} where each item has name,
+    description, price, currency, nutrition and section, or None if the page
+    has no structured menu data. menu_urls holds hasMenu links to follow.
+    """
+    blocks = find_ld_json_blocks(html)
+    if not blocks:
+        return None
+
+    collector = _MenuCollector(base_url)
+    collector.index(blocks)
+    collector.walk(blocks)
+    if not collector.items and not collector.menu_urls:
+        return None
+
+    logger.info(f"Found {len(collector.items)} structured menu items and {len(collector.menu_urls)} menu links")
+    return {
+        'items': collector.items,
+        'menu_urls': list(dict.fromkeys(collector.menu_urls))
+    }
+
+def format_menu_item(item):
+    """One-line menu entry such as "Salmon Grain Bowl – Farro, cucumber ($19.00, 610 calories)" """
+    text = item['name']
+    if item.get('description'):
+        text += f" – {item['description']}"
+    details = []
+    if item.get('price'):
+        price = item['price']
+        currency = item.get('currency') or 'USD'
+        if currency == 'USD':
+            details.append(price if price.startswith('$') else f"${price}")
+        else:
+            details.append(f"{price} {currency}")
+    for label, value in item.get('nutrition', {}).items():
+        details.append(value if value.lower().endswith(label) else f"{value} {label}")
+    if details:
+        text += f" ({', '.join(details)})"
+    return text[:199]
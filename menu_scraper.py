@@ -3,6 +3,10 @@ from bs4 import BeautifulSoup
 from serpapi import GoogleSearch
 import openai
 import os
+from api_scheduler import api_call
+from page_fetcher import host_limiter
+from tracing import span, record_llm_usage
+from llm_meter import metered_call
 
 # Load API Keys
 SERP_API_KEY = os.getenv("SERPAPI_API_KEY")
@@ -24,7 +28,7 @@ def search_menu_link(restaurant_name, location):
     }
     try:
         search = GoogleSearch(params)
-        results = search.get_dict()
+        results = api_call("serpapi", search.get_dict)
         links = [r.get("link") for r in results.get("organic_results", [])]
 
         print("🔍 SerpAPI Search Results:")
@@ -43,28 +47,38 @@ def search_menu_link(restaurant_name, location):
 
 
 # 🧼 Step 2: Scrape the menu text from the found link
+DISH_KEYWORDS = [
+    "chicken", "paneer", "rice", "tikka", "noodle", "wrap",
+    "soup", "biryani", "tofu", "salad", "vada", "idly", "roll", "pizza", "pasta"
+]
+
+
+def extract_dishes(html):
+    """Short lines of a page that mention a known dish keyword, de-duplicated in page order"""
+    soup = BeautifulSoup(html, "html.parser")
+    dishes = []
+
+    for tag in soup.find_all(["li", "p", "span", "div"]):
+        text = tag.get_text(strip=True)
+        if (
+            text
+            and 4 < len(text) < 60
+            and any(word in text.lower() for word in DISH_KEYWORDS)
+        ):
+            dishes.append(text)
+
+    return list(dict.fromkeys(dishes))  # remove duplicates
+
+
 def scrape_menu_from_link(menu_url):
     try:
-        response = requests.get(menu_url, headers=HEADERS, timeout=10)
+        with host_limiter.slot(menu_url):
+            response = requests.get(menu_url, headers=HEADERS, timeout=10)
+        host_limiter.record_status(menu_url, response.status_code)
         print(f"📄 Scraping: {menu_url}")
         print("🧾 HTML Preview:", response.text[:500])
 
-        soup = BeautifulSoup(response.text, "html.parser")
-        dishes = []
-
-        for tag in soup.find_all(["li", "p", "span", "div"]):
-            text = tag.get_text(strip=True)
-            if (
-                text
-                and 4 < len(text) < 60
-                and any(word in text.lower() for word in [
-                    "chicken", "paneer", "rice", "tikka", "noodle", "wrap",
-                    "soup", "biryani", "tofu", "salad", "vada", "idly", "roll", "pizza", "pasta"
-                ])
-            ):
-                dishes.append(text)
-
-        dishes = list(dict.fromkeys(dishes))  # remove duplicates
+        dishes = extract_dishes(response.text)
         return "\n".join(dishes[:15]) if dishes else "⚠️ No menu items found."
 
     except Exception as e:
@@ -78,11 +92,13 @@ def simulate_menu_with_gpt(restaurant_name, cuisine):
     Return a bullet list of 10 dishes only. No explanations.
     """
     try:
-        res = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=250
-        )
+        with span("llm_call", task="simulate_menu") as llm_span:
+            res = metered_call("simulate_menu_gpt", lambda: openai.ChatCompletion.create(
+                model="gpt-3.5-turbo",
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=250
+            ), model="gpt-3.5-turbo")
+            record_llm_usage(llm_span, res, model="gpt-3.5-turbo")
         return res["choices"][0]["message"]["content"]
     except Exception as e:
         return f"⚠️ GPT fallback failed: {e}"
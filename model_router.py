@@ -0,0 +1,351 @@
+import os
+import json
+import time
+import threading
+import logging
+from collections import namedtuple
+from contextlib import contextmanager
+from resilience import get_breaker
+from llm_meter import metered_call, metered_stream, model_price, over_budget, BudgetExceeded
+from tracing import traced_kickoff, Span, current_span, record_llm_usage
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('model_router')
+
+# Quality tier of each model the router may pick (higher is better)
+MODEL_QUALITY = {
+    "gpt-3.5-turbo": 1,
+    "gpt-4o-mini": 2,
+    "gpt-4.1-mini": 3,
+    "gpt-4o": 4,
+    "gpt-4.1": 4,
+    "gpt-4": 4
+}
+ROUTER_MODELS = [model.strip() for model in os.getenv("ROUTER_MODELS", ",".join(MODEL_QUALITY)).split(",") if model.strip()]
+
+# Per task class: the latency the answer should arrive within, the lowest
+# acceptable quality tier, and the request timeout after which the next
+# model is tried. MODEL_ROUTES (JSON) overrides any of these per task.
+TASK_ROUTES = {
+    "chat_advice": {"latency_target": 3.0, "min_quality": 2, "timeout": 15},
+    "menu_simulation": {"latency_target": 8.0, "min_quality": 2, "timeout": 30},
+    "menu_analysis": {"latency_target": 10.0, "min_quality": 3, "timeout": 45},
+    "extraction": {"latency_target": 20.0, "min_quality": 3, "timeout": 90}
+}
+for _task, _overrides in json.loads(os.getenv("MODEL_ROUTES", "{}")).items():
+    TASK_ROUTES.setdefault(_task, {}).update(_overrides)
+
+# The models each task was hard-wired to before routing, used when
+# MODEL_ROUTING=fixed
+FIXED_MODELS = {
+    "chat_advice": "gpt-4",
+    "menu_simulation": "gpt-4",
+    "menu_analysis": "gpt-3.5-turbo",
+    "extraction": "gpt-3.5-turbo"
+}
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", "routed")  # "routed" or "fixed"
+ROUTER_MAX_ATTEMPTS = 3
+LATENCY_EWMA_ALPHA = 0.3
+# A model's latency is forgotten after this long without calls, so a model
+# ranked as too slow gets tried again
+LATENCY_STALE_SECONDS = 10 * 60
+# Idle LLM clients kept per model and task class for reuse; 0 builds one per call
+LLM_POOL_MAX_IDLE = int(os.getenv("LLM_POOL_MAX_IDLE", 8))
+# crewai's step-by-step agent output; off unless debugging (AGENT_VERBOSE=1)
+AGENT_VERBOSE = os.getenv("AGENT_VERBOSE", "").lower() in ("1", "true")
+
+class NoModelAvailable(Exception):
+    pass
+
+# The persona of an agent; crewai Agents are only built from it at call time,
+# so importing the agent modules does not import crewai
+AgentProfile = namedtuple("AgentProfile", ["role", "goal", "backstory"])
+
+def routed_agent(profile, llm):
+    """A crewai Agent with an AgentProfile's persona that runs on llm"""
+    from crewai import Agent
+    return Agent(role=profile.role, goal=profile.goal, backstory=profile.backstory, verbose=AGENT_VERBOSE, llm=llm)
+
+_preload_lock = threading.Lock()
+_preloaded = False
+
+def preload_llm_libraries():
+    """
+    Import crewai and openai on a background thread, once per process. The
+    agent modules import them on first use so pages render without waiting
+    for them; preloading keeps that first use from paying for the import.
+    """
+    global _preloaded
+    with _preload_lock:
+        if _preloaded:
+            return
+        _preloaded = True
+
+    def load():
+        try:
+            import crewai, openai  # noqa: F401
+        except ImportError as e:
+            logger.warning(f"Could not preload LLM libraries: {str(e)}")
+
+    threading.Thread(target=load, name="llm-preload", daemon=True).start()
+
+class LLMPool:
+    """
+    Idle crewai LLMs per (model, task class), each checked out by one call
+    at a time. Building an LLM builds its OpenAI clients, which takes tens
+    of milliseconds and starts without open connections; a reused one keeps
+    its connections to the endpoint alive between calls.
+    """
+    def __init__(self, build, max_idle=LLM_POOL_MAX_IDLE):
+        self.build = build
+        self.max_idle = max_idle
+        self.created = 0
+        self._lock = threading.Lock()
+        self._idle = {}  # (model, task_class) -> [LLM]
+
+    @contextmanager
+    def checkout(self, model, task_class):
+        key = (model, task_class)
+        with self._lock:
+            idle = self._idle.get(key)
+            llm = idle.pop() if idle else None
+        if llm is None:
+            llm = self.build(model, task_class)
+            with self._lock:
+                self.created += 1
+        try:
+            yield llm
+        finally:
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                if len(idle) < self.max_idle:
+                    idle.append(llm)
+
+    def clear(self):
+        with self._lock:
+            self._idle.clear()
+
+def pooled_kickoff(crew, llm):
+    """
+    crew.kickoff() with token_usage counting this call only. A crewai LLM
+    counts tokens over its lifetime and a crew adds up its agents' LLMs, so
+    the crew's own figure is off for a reused LLM or one shared by agents.
+    """
+    before = llm.get_token_usage_summary()
+    result = crew.kickoff()
+    after = llm.get_token_usage_summary()
+    result.token_usage = type(after)(**{field: getattr(after, field) - getattr(before, field)
+                                        for field in type(after).model_fields})
+    return result
+
+def agent_messages(agent, description, expected_output):
+    """Chat messages putting a task to an agent's persona, for calls made without a crew"""
+    return [
+        {"role": "system", "content": f"You are {agent.role}. {agent.backstory}\nYour personal goal is: {agent.goal}"},
+        {"role": "user", "content": f"{description}\n\nThis is the expected criteria for your final answer: {expected_output}"}
+    ]
+
+def _base_url():
+    return os.getenv("OPENAI_BASE_URL") or os.getenv("OPENAI_API_BASE")
+
+class ModelRouter:
+    """
+    Picks the model for each LLM task. Models below the task's quality tier
+    or with an open circuit breaker are left out; of the rest, those whose
+    observed latency meets the task's target come first, cheapest first,
+    then the others fastest first. A model without recent observations is
+    assumed to meet the target so it gets tried. Errors and timeouts fall
+    through to the next model and count towards the model's breaker.
+    """
+    def __init__(self, mode=MODEL_ROUTING):
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._latency = {}  # (task_class, model) -> (EWMA seconds, monotonic time of last call)
+        self._stats = {}    # (task_class, model) -> {'calls', 'errors'}
+        self._client = None
+        self.pool = LLMPool(self.llm)
+
+    def candidates(self, task_class):
+        """Models to try for task_class, in order"""
+        if self.mode == "fixed":
+            return [FIXED_MODELS[task_class]]
+        route = TASK_ROUTES[task_class]
+        eligible = [model for model in ROUTER_MODELS
+                    if MODEL_QUALITY.get(model, 0) >= route["min_quality"] and get_breaker(f"llm:{model}").state != "open"]
+        now = time.monotonic()
+        with self._lock:
+            observed = {model: self._latency.get((task_class, model)) for model in eligible}
+        latency = {model: value[0] if value and now - value[1] < LATENCY_STALE_SECONDS else None
+                   for model, value in observed.items()}
+
+        def cost(model):
+            price = model_price(model)
+            return sum(price) if price else float("inf")
+
+        on_target = [model for model in eligible if latency[model] is None or latency[model] <= route["latency_target"]]
+        too_slow = [model for model in eligible if model not in on_target]
+        ranked = sorted(on_target, key=cost) + sorted(too_slow, key=lambda model: latency[model])
+        return ranked[:ROUTER_MAX_ATTEMPTS]
+
+    def llm(self, model, task_class):
+        from crewai import LLM
+        timeout = TASK_ROUTES.get(task_class, {}).get("timeout")
+        base_url = _base_url()
+        return LLM(model=model, timeout=timeout, **({"base_url": base_url} if base_url else {}))
+
+    def record(self, task_class, model, duration, ok):
+        with self._lock:
+            key = (task_class, model)
+            stats = self._stats.setdefault(key, {'calls': 0, 'errors': 0})
+            stats['calls'] += 1
+            if not ok:
+                stats['errors'] += 1
+            previous = self._latency.get(key)
+            ewma = duration if previous is None else LATENCY_EWMA_ALPHA * duration + (1 - LATENCY_EWMA_ALPHA) * previous[0]
+            self._latency[key] = (ewma, time.monotonic())
+
+    def report(self):
+        """{task_class: {model: {'calls', 'errors', 'latency'}}}"""
+        with self._lock:
+            report = {}
+            for (task_class, model), stats in self._stats.items():
+                report.setdefault(task_class, {})[model] = dict(stats, latency=round(self._latency[(task_class, model)][0], 3))
+            return report
+
+    def reset(self):
+        with self._lock:
+            self._latency.clear()
+            self._stats.clear()
+
+    def kickoff(self, task_class, feature, make_crew, cache_key=None, fallback=None):
+        """
+        Run make_crew(llm).kickoff() on the routed model, metered under
+        feature (see llm_meter.metered_call), falling back to the next
+        candidate when a model errors or times out
+        """
+        if over_budget():
+            # Served from the response cache or the fallback without a call
+            return metered_call(feature, None, None, cache_key, fallback)
+        last_error = None
+        for model in self.candidates(task_class):
+            breaker = get_breaker(f"llm:{model}")
+            if not breaker.allow():
+                continue
+
+            def attempt():
+                with self.pool.checkout(model, task_class) as llm:
+                    crew = make_crew(llm)
+                    return traced_kickoff(feature, crew, lambda: pooled_kickoff(crew, llm))
+
+            started = time.monotonic()
+            try:
+                result = metered_call(feature, attempt, model, cache_key, fallback)
+            except BudgetExceeded:
+                # Says nothing about the model: free a half-open trial for the next call
+                breaker.release()
+                raise
+            except Exception as e:
+                breaker.record_failure()
+                self.record(task_class, model, time.monotonic() - started, ok=False)
+                logger.warning(f"{model} failed for {task_class}: {str(e)}; trying the next model")
+                last_error = e
+                continue
+            # Slow models are ranked down by the router rather than tripping the breaker
+            breaker.record_success()
+            self.record(task_class, model, time.monotonic() - started, ok=True)
+            return result
+        raise last_error or NoModelAvailable(f"No model available for {task_class}")
+
+    def _openai(self):
+        if self._client is None:
+            from openai import OpenAI
+            base_url = _base_url()
+            self._client = OpenAI(**({"base_url": base_url} if base_url else {}))
+        return self._client
+
+    def _completion_chunks(self, model, task_class, feature, messages, usage):
+        """Text deltas of one streamed chat completion, traced as an llm_stream span"""
+        llm_span = Span("llm_stream", current_span(), {"task": feature, "model": model})
+        started = time.monotonic()
+        response = None
+        try:
+            response = self._openai().chat.completions.create(
+                model=model, messages=messages, stream=True, stream_options={"include_usage": True},
+                timeout=TASK_ROUTES.get(task_class, {}).get("timeout"))
+            for chunk in response:
+                if chunk.usage:
+                    usage.update(prompt_tokens=chunk.usage.prompt_tokens, completion_tokens=chunk.usage.completion_tokens,
+                                 total_tokens=chunk.usage.total_tokens)
+                for choice in chunk.choices:
+                    if choice.delta.content:
+                        if "ttft_ms" not in llm_span.attributes:
+                            llm_span.set(ttft_ms=round((time.monotonic() - started) * 1000, 1))
+                        yield choice.delta.content
+        except Exception as e:
+            llm_span.set_error(e)
+            raise
+        finally:
+            if response is not None:
+                response.close()
+            record_llm_usage(llm_span, {"usage": usage})
+            llm_span.end()
+
+    def stream(self, task_class, feature, messages, cache_key=None, fallback=None):
+        """
+        Stream the answer to messages from the routed model as text chunks,
+        metered under feature (see llm_meter.metered_stream). A model that
+        fails before its first chunk is skipped for the next candidate;
+        once text has been shown a failure is raised. A stream the caller
+        stops reading counts as a success for the model's breaker and
+        latency.
+        """
+        if over_budget():
+            yield from metered_stream(feature, None, None, cache_key, fallback)
+            return
+        last_error = None
+        for model in self.candidates(task_class):
+            breaker = get_breaker(f"llm:{model}")
+            if not breaker.allow():
+                continue
+            started = time.monotonic()
+            chunks = metered_stream(feature, lambda usage, model=model: self._completion_chunks(
+                model, task_class, feature, messages, usage), model, cache_key, fallback)
+            try:
+                first = next(chunks, None)
+            except BudgetExceeded:
+                # Says nothing about the model: free a half-open trial for the next call
+                breaker.release()
+                raise
+            except Exception as e:
+                breaker.record_failure()
+                self.record(task_class, model, time.monotonic() - started, ok=False)
+                logger.warning(f"{model} failed for {task_class}: {str(e)}; trying the next model")
+                last_error = e
+                continue
+            ok = True
+            try:
+                if first is not None:
+                    yield first
+                yield from chunks
+            except Exception:
+                ok = False
+                raise
+            finally:
+                # Also reached through GeneratorExit when the caller stops reading
+                chunks.close()
+                if ok:
+                    breaker.record_success()
+                else:
+                    breaker.record_failure()
+                self.record(task_class, model, time.monotonic() - started, ok=ok)
+            return
+        raise last_error or NoModelAvailable(f"No model available for {task_class}")
+
+router = ModelRouter()
+
+def routed_kickoff(task_class, feature, make_crew, cache_key=None, fallback=None):
+    return router.kickoff(task_class, feature, make_crew, cache_key, fallback)
+
+def routed_stream(task_class, feature, messages, cache_key=None, fallback=None):
+    return router.stream(task_class, feature, messages, cache_key, fallback)
@@ -0,0 +1,427 @@
+import os
+import re
+import copy
+import json
+import time
+import codecs
+import hashlib
+import logging
+import threading
+import requests
+from contextlib import contextmanager
+from cache_store import CACHE_DIR, PersistentLRUCache
+from menu_schema import LD_JSON_PATTERN, parse_menu_ld_json
+from resilience import DeadlineExceeded, timeout_for
+from source_stats import domain_key
+from tracing import span
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('page_fetcher')
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+# Pages are read in chunks and never beyond this many (decompressed) bytes
+MAX_PAGE_BYTES = int(os.getenv("MAX_PAGE_BYTES", 2 * 1024 * 1024))
+CHUNK_SIZE = 16 * 1024
+
+CHARSET_PATTERN = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?([\w-]+)', re.IGNORECASE)
+PRICE_PATTERN = re.compile(r'\$\d+(?:\.\d{2})?')
+
+# Opening tags of a section that holds a restaurant's whole menu. On websites
+# only a class/id token ending in "menu" counts (so "menu-section" siblings do
+# not stop a fetch halfway) and the section must contain prices, so navigation
+# menus do not either.
+WEBSITE_MENU_SECTION = re.compile(
+    r'<(section|div|ul|ol|table|dl)\b[^>]*?\b(?:class|id)\s*=\s*["\'](?:[^"\']*\s)?[\w-]*menu["\'\s]',
+    re.IGNORECASE
+)
+YELP_MENU_SECTION = re.compile(
+    r'<(section)\b[^>]*?\b(?:aria-label\s*=\s*["\']Menu["\']|data-testid\s*=\s*["\']menu-section["\'])',
+    re.IGNORECASE
+)
+# Pages with an ETag or Last-Modified validator (or a Cache-Control max-age)
+# are kept on disk and revalidated with conditional requests
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE", "1") != "0"
+HTTP_CACHE_MAX_ENTRIES = 2000
+HTTP_BODY_DIR = os.path.join(CACHE_DIR, "http_bodies")
+MAX_AGE_PATTERN = re.compile(r'max-age\s*=\s*(\d+)')
+
+# Politeness per host: at most this many requests in flight and this many
+# seconds between request starts. Menu aggregators get a longer interval,
+# and a host that answers 429/503 has its interval doubled (up to the max).
+HOST_MAX_CONCURRENCY = int(os.getenv("HOST_MAX_CONCURRENCY", 2))
+HOST_MIN_INTERVAL = float(os.getenv("HOST_MIN_INTERVAL", 0.5))
+HOST_MAX_INTERVAL = 30.0
+AGGREGATOR_MIN_INTERVAL = 2.0
+AGGREGATOR_HOSTS = {
+    'yelp.com', 'allmenus.com', 'menupages.com', 'grubhub.com', 'doordash.com',
+    'ubereats.com', 'seamless.com', 'zomato.com', 'tripadvisor.com', 'singleplatform.com'
+}
+
+# Longest opening tag that is rescanned when it straddles two chunks
+MAX_TAG_LENGTH = 1024
+
+class PageResponse:
+    """The (possibly partial) body of a fetched page"""
+    def __init__(self, url, status_code, headers, text, bytes_read, truncated, stopped_early, from_cache=False):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.text = text
+        self.bytes_read = bytes_read
+        # Body was cut at max_bytes
+        self.truncated = truncated
+        # stop_when saw everything it needed before the end of the body
+        self.stopped_early = stopped_early
+        # Body came from the HTTP cache (fresh, or revalidated with a 304)
+        self.from_cache = from_cache
+
+class MenuStopCondition:
+    """
+    Incremental check, called with the text decoded so far, that is true once
+    a JSON-LD block with a complete menu or a closed menu section has been
+    read. Each call only scans text that arrived since the previous call.
+    """
+    def __init__(self, section_pattern=WEBSITE_MENU_SECTION, min_prices=3, min_ld_items=3):
+        self.section_pattern = section_pattern
+        self.min_prices = min_prices
+        self.min_ld_items = min_ld_items
+        self.ld_pos = 0
+        self.section_pos = 0
+        # Open menu section: (start offset, tag pattern, depth, token scan offset)
+        self.open_section = None
+
+    def __call__(self, text):
+        return self._ld_json_complete(text) or self._section_complete(text)
+
+    def _ld_json_complete(self, text):
+        for match in LD_JSON_PATTERN.finditer(text, self.ld_pos):
+            self.ld_pos = match.end()
+            block = match.group(1)
+            if 'MenuItem' in block:
+                menu = parse_menu_ld_json(match.group(0))
+                if menu and len(menu['items']) >= self.min_ld_items:
+                    return True
+        # Resume at an ld+json block that has not been closed yet
+        pending = text.rfind('<script', self.ld_pos)
+        self.ld_pos = pending if pending >= 0 else max(self.ld_pos, len(text) - MAX_TAG_LENGTH)
+        return False
+
+    def _section_complete(self, text):
+        if self.section_pattern is None:
+            return False
+        while True:
+            if self.open_section is None:
+                match = self.section_pattern.search(text, self.section_pos)
+                if not match:
+                    self.section_pos = max(self.section_pos, len(text) - MAX_TAG_LENGTH)
+                    return False
+                tag = match.group(1)
+                tokens = re.compile(rf'<(/?){tag}\b[^>]*>', re.IGNORECASE)
+                self.open_section = [match.start(), tokens, 1, match.end()]
+
+            start, tokens, depth, pos = self.open_section
+            for token in tokens.finditer(text, pos):
+                pos = token.end()
+                depth += -1 if token.group(1) else 1
+                if depth == 0:
+                    break
+            if depth > 0:
+                self.open_section[2:] = [depth, pos]
+                return False
+
+            self.open_section = None
+            self.section_pos = pos
+            if self.min_prices <= 0 or len(PRICE_PATTERN.findall(text, start, pos)) >= self.min_prices:
+                return True
+
+class _HostState:
+    def __init__(self, interval):
+        self.slots = threading.Semaphore(HOST_MAX_CONCURRENCY)
+        self.interval = interval
+        self.base_interval = interval
+        self.next_start = 0.0
+
+class HostLimiter:
+    """
+    Per-host concurrency limit and minimum spacing between requests. Hosts
+    are independent, so different sites are still fetched in parallel.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _state(self, host):
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                aggregator = any(host == name or host.endswith('.' + name) for name in AGGREGATOR_HOSTS)
+                state = self._hosts[host] = _HostState(AGGREGATOR_MIN_INTERVAL if aggregator else HOST_MIN_INTERVAL)
+            return state
+
+    @contextmanager
+    def slot(self, url, deadline=None):
+        """
+        Hold one of the host's request slots, starting no sooner than its
+        interval allows. Yields a function that gives the slot back early,
+        once the response headers are in. With a Deadline, DeadlineExceeded
+        is raised instead of waiting beyond it for a slot or the interval.
+        """
+        state = self._state(domain_key(url))
+        if not state.slots.acquire(timeout=deadline.remaining() if deadline is not None else None):
+            raise DeadlineExceeded(f"Deadline exceeded waiting for a request slot for {url}")
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                state.slots.release()
+
+        try:
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, state.next_start)
+                if deadline is not None and start - now >= deadline.remaining():
+                    raise DeadlineExceeded(f"Deadline exceeded waiting to space requests to {url}")
+                state.next_start = start + state.interval
+            wait = start - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            yield release
+        finally:
+            release()
+
+    def record_status(self, url, status_code):
+        """Back off a host that throttles us; relax again once it answers normally"""
+        state = self._state(domain_key(url))
+        with self._lock:
+            if status_code in (429, 503):
+                state.interval = min(HOST_MAX_INTERVAL, state.interval * 2)
+                logger.warning(f"{domain_key(url)} is throttling; spacing requests {state.interval:.1f}s apart")
+            elif state.interval > state.base_interval:
+                state.interval = max(state.base_interval, state.interval / 2)
+
+host_limiter = HostLimiter()
+
+def _body_path(url):
+    return os.path.join(HTTP_BODY_DIR, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.html')
+
+def _parsed_path(url):
+    return _body_path(url)[:-len('.html')] + '.parsed.json'
+
+def _remove_body(url, entry=None):
+    for path in (_body_path(url), _parsed_path(url)):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+_http_cache = PersistentLRUCache("http_pages", max_entries=HTTP_CACHE_MAX_ENTRIES, on_evict=_remove_body)
+
+def _cached_page(url):
+    """Cache entry for url together with its body, or (None, None)"""
+    entry = _http_cache.get(url)
+    if entry is None:
+        return None, None
+    try:
+        with open(_body_path(url), 'r', encoding='utf-8') as f:
+            return entry, f.read()
+    except OSError:
+        _http_cache.delete(url)
+        return None, None
+
+def _cached_flags(entry, text, max_bytes, stop_when):
+    """
+    (truncated, stopped_early) of a cached partial body served to this
+    request, or None when the body is too partial for it: it was cut
+    shorter than max_bytes, or it ended early and this request's stop_when
+    does not find what it needs in it. stop_when may keep state between
+    calls (MenuStopCondition does), so a copy checks the cached text and the
+    caller's instance still starts at the beginning of a new body.
+    """
+    truncated = entry.get('truncated', False)
+    stopped_early = entry.get('stopped_early', False)
+    if truncated and max_bytes > entry['bytes_read']:
+        return None
+    if stopped_early and (stop_when is None or not copy.deepcopy(stop_when)(text)):
+        return None
+    return truncated, stopped_early
+
+def _store_page(url, response, text, bytes_read, truncated, stopped_early):
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    cache_control = response.headers.get('Cache-Control', '').lower()
+    max_age = MAX_AGE_PATTERN.search(cache_control)
+    max_age = int(max_age.group(1)) if max_age and 'no-cache' not in cache_control else 0
+    if 'no-store' in cache_control or not (etag or last_modified or max_age):
+        return
+    try:
+        os.makedirs(HTTP_BODY_DIR, exist_ok=True)
+        path = _body_path(url)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(f"{path}.tmp", path)
+        # Parse results of an older body no longer apply
+        if os.path.exists(_parsed_path(url)):
+            os.remove(_parsed_path(url))
+    except OSError as e:
+        logger.warning(f"Could not cache body of {url}: {str(e)}")
+        return
+    _http_cache.set(url, {
+        'etag': etag,
+        'last_modified': last_modified,
+        'fresh_until': time.time() + max_age,
+        'final_url': response.url,
+        'bytes_read': bytes_read,
+        'truncated': truncated,
+        'stopped_early': stopped_early
+    })
+
+def _revalidated(url, entry, response):
+    """Refresh a cached entry after a 304, keeping its parsed results"""
+    entry = dict(entry)
+    entry['etag'] = response.headers.get('ETag') or entry['etag']
+    entry['last_modified'] = response.headers.get('Last-Modified') or entry['last_modified']
+    max_age = MAX_AGE_PATTERN.search(response.headers.get('Cache-Control', '').lower())
+    entry['fresh_until'] = time.time() + (int(max_age.group(1)) if max_age else 0)
+    _http_cache.set(url, entry)
+
+def _read_parsed(url):
+    try:
+        with open(_parsed_path(url), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def get_parsed(page, parser):
+    """
+    Result previously stored with set_parsed for this page, as long as the
+    page has not changed since (i.e. it was served from the HTTP cache)
+    """
+    if not page.from_cache:
+        return None
+    return _read_parsed(page.url).get(parser)
+
+def set_parsed(page, parser, result):
+    """
+    Store a JSON-serializable parse result in a file next to the cached page
+    body, so parsing does not rewrite the whole page index
+    """
+    if _http_cache.get(page.url) is None:
+        return
+    parsed = dict(_read_parsed(page.url), **{parser: result})
+    path = _parsed_path(page.url)
+    try:
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(parsed, f)
+        os.replace(f"{path}.tmp", path)
+    except OSError as e:
+        logger.warning(f"Could not cache parse result for {page.url}: {str(e)}")
+
+def clear_http_cache():
+    """Drop every cached page body and parse result"""
+    for url in _http_cache.keys():
+        _remove_body(url)
+    _http_cache.clear()
+
+def _encoding_for(response, first_chunk):
+    content_type = response.headers.get('Content-Type', '')
+    if 'charset=' in content_type.lower():
+        return content_type.lower().split('charset=')[-1].split(';')[0].strip(' "\'')
+    match = CHARSET_PATTERN.search(first_chunk[:2048])
+    if match:
+        return match.group(1).decode('ascii', 'ignore')
+    return 'utf-8'
+
+def _incremental_decoder(encoding):
+    try:
+        return codecs.getincrementaldecoder(encoding)(errors='replace')
+    except LookupError:
+        return codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+def fetch_page(url, headers=None, timeout=15, max_bytes=MAX_PAGE_BYTES, stop_when=None, use_cache=HTTP_CACHE_ENABLED,
+               deadline=None, **kwargs):
+    """
+    Stream a page instead of buffering the whole body: chunks are decoded as
+    they arrive, reading stops after max_bytes, and stop_when (called with
+    the text so far after every chunk) can end the download as soon as the
+    caller has what it needs. The body of a non-200 response is not read.
+    Requests are spaced and limited per host by host_limiter.
+    With use_cache, cached pages are revalidated with If-None-Match /
+    If-Modified-Since so an unchanged page costs a 304 instead of a download.
+    PageResponse.url is always the requested url, which keys the cache.
+    A Deadline shortens the timeout and raises DeadlineExceeded if it runs
+    out while waiting for the host's request slot or while the body is
+    still arriving.
+    """
+    with span("http_fetch", url=url) as fetch_span:
+        page = _fetch_page(url, headers, timeout, max_bytes, stop_when, use_cache, deadline, **kwargs)
+        fetch_span.set(status=page.status_code, bytes=page.bytes_read, from_cache=page.from_cache,
+                       truncated=page.truncated, stopped_early=page.stopped_early)
+        return page
+
+def _fetch_page(url, headers, timeout, max_bytes, stop_when, use_cache, deadline, **kwargs):
+    entry, cached_text = _cached_page(url) if use_cache else (None, None)
+    flags = _cached_flags(entry, cached_text, max_bytes, stop_when) if entry is not None else None
+    if flags is None:
+        # Not cached, or only a part of the body this request cannot use
+        entry = None
+    elif time.time() < entry['fresh_until']:
+        logger.info(f"Using cached copy of {url}")
+        return PageResponse(url, 200, {}, cached_text, entry['bytes_read'], *flags, from_cache=True)
+
+    request_headers = dict(headers or DEFAULT_HEADERS)
+    if entry is not None:
+        if entry['etag']:
+            request_headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            request_headers['If-Modified-Since'] = entry['last_modified']
+
+    with host_limiter.slot(url, deadline) as release_slot, \
+            requests.get(url, headers=request_headers, timeout=timeout_for(deadline, timeout), stream=True, **kwargs) as response:
+        # The host has answered; reading the body need not hold up its other requests
+        release_slot()
+        host_limiter.record_status(url, response.status_code)
+        if response.status_code == 304 and entry is not None:
+            logger.info(f"{url} not modified, using cached copy")
+            _revalidated(url, entry, response)
+            return PageResponse(url, 200, response.headers, cached_text, entry['bytes_read'], *flags, from_cache=True)
+        if response.status_code != 200:
+            return PageResponse(url, response.status_code, response.headers, "", 0, False, False)
+
+        decoder = None
+        text = ""
+        bytes_read = 0
+        truncated = False
+        stopped_early = False
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            if not chunk:
+                continue
+            if deadline is not None and deadline.expired():
+                raise DeadlineExceeded(f"Deadline exceeded while reading {url}")
+            if bytes_read + len(chunk) > max_bytes:
+                chunk = chunk[:max_bytes - bytes_read]
+                truncated = True
+            if decoder is None:
+                decoder = _incremental_decoder(_encoding_for(response, chunk))
+            bytes_read += len(chunk)
+            text += decoder.decode(chunk)
+            if truncated:
+                break
+            if stop_when is not None and stop_when(text):
+                stopped_early = True
+                break
+
+        if decoder is not None:
+            text += decoder.decode(b'', final=True)
+
+    if truncated:
+        logger.info(f"Stopped reading {url} at the {max_bytes} byte limit")
+    elif stopped_early:
+        logger.info(f"Stopped reading {url} after {bytes_read} bytes: menu found")
+    if use_cache:
+        _store_page(url, response, text, bytes_read, truncated, stopped_early)
+    return PageResponse(url, response.status_code, response.headers, text, bytes_read, truncated, stopped_early)
@@ -1,7 +1,11 @@
 import streamlit as st
-from pages.glucose_chat_agent import get_glucose_advice  # Changed from relative to absolute import
+from pages.glucose_chat_agent import stream_glucose_advice  # Changed from relative to absolute import
+from llm_meter import set_llm_user
+from model_router import preload_llm_libraries
 
 st.set_page_config(page_title="💬 Glucose Chat", layout="wide")
+set_llm_user(st.session_state.get("user"))
+preload_llm_libraries()
 
 st.title("💬 Glucose Buddy Chat")
 
@@ -31,10 +35,7 @@ if prompt := st.chat_input("Ask about managing your glucose levels..."):
     st.chat_message("user").markdown(prompt)
     st.session_state.messages.append({"role": "user", "content": prompt})
     
-    # Get AI response
-    with st.spinner("Thinking..."):
-        response = str(get_glucose_advice(prompt))
-        
-        # Display assistant response
-        st.chat_message("assistant").markdown(response)
-        st.session_state.messages.append({"role": "assistant", "content": response})
\ No newline at end of file
+    # Show the AI response as it is generated
+    with st.chat_message("assistant"):
+        response = st.write_stream(stream_glucose_advice(prompt))
+    st.session_state.messages.append({"role": "assistant", "content": response})
\ No newline at end of file
@@ -1,12 +1,15 @@
 
 import streamlit as st
-from glucose_cgm_agents import analyze_menu
-import pytesseract
-from PIL import Image
-import fitz
+from glucose_cgm_agents import stream_menu_analysis
 import tempfile
 import os
+from profiling import profile_page_start, profile_page_end
+from llm_meter import set_llm_user
+from model_router import preload_llm_libraries
 
+profile_page_start("Menu_Analyzer")
+set_llm_user(st.session_state.get("user"))
+preload_llm_libraries()
 st.set_page_config(page_title="📸 Menu Analyzer", layout="wide")
 st.title("📸 Menu Analyzer")
 
@@ -22,10 +25,14 @@ if uploaded_menu:
 
     try:
         with st.spinner("Extracting menu text..."):
+            # OCR and PDF libraries load only for the kind of file uploaded
             if ext.lower() in ["png", "jpg", "jpeg"]:
+                import pytesseract
+                from PIL import Image
                 image = Image.open(path)
                 menu_text = pytesseract.image_to_string(image)
             elif ext.lower() == "pdf":
+                import fitz
                 doc = fitz.open(path)
                 menu_text = "\n".join([p.get_text() for p in doc])
         st.text_area("📝 Menu Text", menu_text, height=200)
@@ -36,11 +43,14 @@ if st.button("🍽️ Suggest Dishes"):
     if not st.session_state.get("glucose_summary"):
         st.warning("Please analyze your CGM report first.")
     elif menu_text:
-        with st.spinner("Analyzing menu..."):
-            result = analyze_menu(menu_text, st.session_state["glucose_summary"])
-            st.markdown("### 🍴 Suggestions")
-            # Convert CrewOutput to string before splitting
-            result_str = str(result)
+        st.markdown("### 🍴 Suggestions")
+        suggestions = st.empty()
+        # Show the suggestions as they are generated, then lay them out as cards
+        with suggestions.container():
+            result_str = st.write_stream(stream_menu_analysis(menu_text, st.session_state["glucose_summary"]))
+        with suggestions.container():
             for line in result_str.split('\n'):
                 if line.strip():
                     st.markdown(f"<div style='border:1px solid #eee;padding:10px;border-radius:10px;margin-bottom:10px;'>{line}</div>", unsafe_allow_html=True)
+
+profile_page_end()
@@ -1,20 +1,135 @@
 import streamlit as st
-from restaurant_recommender import get_nearby_restaurants, validate_coordinates
+from restaurant_recommender import search_restaurants_by_cuisine, clear_tile_cache
 from glucose_cgm_agents import analyze_menu
 from google_menu_search_agent import simulate_menu
-from real_menu_fetcher import get_real_menu
-from google_maps_scraper import get_real_menu_from_google_maps
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-import openai
-import os
-import threading
-import time
+from real_menu_fetcher import get_real_menu, restaurant_domain, prefetch_place_details, clear_place_details_cache
+from chain_cache import detect_chain, get_chain_menu, shared_menu_analysis, clear_chain_cache
+from cache_store import single_flight_stats
+from api_scheduler import api_usage
+from source_stats import get_source_stats, clear_source_stats
+from tracing import span, start_trace
+from llm_meter import set_llm_user
+from model_router import preload_llm_libraries
+import logging
 from dotenv import load_dotenv
-from geopy.geocoders import Nominatim
+from geocoder import geocode, clear_geocode_cache
+from page_fetcher import clear_http_cache
+from profiling import profile_page_start, profile_page_end
 
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('travel')
+
+profile_page_start("Travel")
+set_llm_user(st.session_state.get("user"))
+preload_llm_libraries()
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
+
+# Memoized lookups shared by every rerun and session of this page. Widget
+# changes rerun the whole script, so anything that hits the network goes
+# through these bounded caches and only runs again when its inputs change.
+SEARCH_CACHE_TTL = 60 * 60  # seconds
+SEARCH_CACHE_MAX_ENTRIES = 128
+
+class SearchError(Exception):
+    """Raised from cached lookups so that failures are never memoized"""
+
+class MenuNotFound(Exception):
+    """Raised from cached_restaurant_menu so that the AI-simulated fallback is never memoized"""
+    def __init__(self, chain):
+        super().__init__("No real menu found")
+        self.chain = chain
+
+@st.cache_data(ttl=SEARCH_CACHE_TTL, max_entries=SEARCH_CACHE_MAX_ENTRIES, show_spinner=False)
+def cached_restaurants_by_cuisine(location, radius, cuisines):
+    """
+    Places search memoized per (location, radius, cuisines); cuisines must be a tuple.
+    A search that is not memoized also prefetches the website field of the
+    restaurants it found, which their menu lookups need, in one concurrent
+    batch instead of one request per menu.
+    """
+    restaurants_by_cuisine, error = search_restaurants_by_cuisine(location, radius_meters=radius, cuisines=cuisines, top_n=3)
+    if error:
+        raise SearchError(error)
+    prefetch_place_details(restaurant.get('place_id') for found in restaurants_by_cuisine.values() for restaurant in found)
+    return restaurants_by_cuisine
+
+@st.cache_data(ttl=SEARCH_CACHE_TTL, max_entries=SEARCH_CACHE_MAX_ENTRIES, show_spinner=False)
+def cached_restaurant_menu(name, address, place_id):
+    """
+    Find a real menu for one restaurant: a menu shared by its chain, then
+    Google Maps, then web search. Raises MenuNotFound when there is none.
+    Returns (menu_text, menu_source, chain), chain being None for independents.
+    The place's website domain, which chain detection needs, is looked up
+    here, so only restaurants whose menu is not memoized yet cost a Place
+    Details request; the web search reuses it.
+    """
+    domain = restaurant_domain(place_id, fetch=True)
+    chain = detect_chain(name, place_id, domain, address)
+    shared = get_chain_menu(chain)
+    if shared:
+        return str(shared['menu']), f"Real Menu ({shared['source']}, shared by {name} locations)", chain
+
+    try:
+        # Selenium is only loaded once a restaurant needs the browser
+        from google_maps_scraper import get_real_menu_from_google_maps
+        maps_menu, maps_success, maps_url = get_real_menu_from_google_maps(
+            restaurant_name=name,
+            location=address,
+            place_id=place_id,
+            domain=domain
+        )
+        if maps_success:
+            return str(maps_menu), "Real Menu (Google Maps)", chain
+
+        real_menu, is_real, menu_url = get_real_menu(
+            restaurant_name=name,
+            address=address,
+            place_id=place_id if place_id else ""
+        )
+        if is_real:
+            return str(real_menu), "Real Menu (Web)", chain
+    except Exception as e:
+        logger.error(f"Error searching for menu: {str(e)}")
+    raise MenuNotFound(chain)
+
+def restaurant_menu(name, address, place_id, cuisine):
+    """
+    The memoized real menu of a restaurant, or an AI simulation when none
+    was found. The simulation is not memoized, so a lookup that failed for
+    a transient reason is tried again on the next search.
+    """
+    try:
+        return cached_restaurant_menu(name, address, place_id)
+    except MenuNotFound as e:
+        # Pass restaurant name without forcing cuisine in the name
+        menu = simulate_menu(restaurant_name=name, cuisine_type=cuisine)
+        return str(menu), "AI-Simulated", e.chain
+
+@st.cache_data(ttl=SEARCH_CACHE_TTL, max_entries=SEARCH_CACHE_MAX_ENTRIES, show_spinner=False)
+def cached_menu_analysis(menu_text, glucose_summary, chain=None):
+    """
+    CGM analysis of a menu, memoized per (menu, glucose summary). Concurrent
+    requests share one analysis, and analyses of a chain's shared menu are
+    also kept on disk for its other locations.
+    """
+    return shared_menu_analysis(menu_text, glucose_summary, analyze_menu, chain)
+
+def clear_search_caches():
+    """
+    Drop every memoized geocode, search, menu and analysis result, the
+    persistent caches behind them (Places tiles and details, chain menus
+    and analyses, fetched pages) and the menu source stats
+    """
+    clear_geocode_cache()
+    clear_tile_cache()
+    clear_place_details_cache()
+    clear_chain_cache()
+    clear_http_cache()
+    clear_source_stats()
+    cached_restaurants_by_cuisine.clear()
+    cached_restaurant_menu.clear()
+    cached_menu_analysis.clear()
 
 # Set up page configuration with custom theme
 st.set_page_config(page_title="🌍 CGM-Aware Travel Assistant", layout="wide")
@@ -104,17 +219,17 @@ elif location_search in predefined_coordinates:
 # For custom locations, try geocoding
 elif location_search and location_option == "Enter custom location":
     try:
-        # Use a more reliable geocoding service with longer timeout
-        geolocator = Nominatim(user_agent="glucose-buddy-app", timeout=10)
-        location = geolocator.geocode(location_search)
+        # Resolved from the persistent geocode cache when this location was seen before
+        location = geocode(location_search)
         if location:
-            st.success(f"Found location: {location.address}")
-            map_data = {"latitude": [location.latitude], "longitude": [location.longitude]}
+            found_lat, found_lng, found_address = location["lat"], location["lng"], location["address"]
+            st.success(f"Found location: {found_address}")
+            map_data = {"latitude": [found_lat], "longitude": [found_lng]}
             st.map(map_data)
             # Store coordinates in session state
-            st.session_state['search_lat'] = location.latitude
-            st.session_state['search_lng'] = location.longitude
-            st.session_state['search_address'] = location.address
+            st.session_state['search_lat'] = found_lat
+            st.session_state['search_lng'] = found_lng
+            st.session_state['search_address'] = found_address
         else:
             st.warning("Location not found. Please try a different search term or use one of the predefined locations.")
     except Exception as e:
@@ -138,223 +253,182 @@ st.markdown('<p class="menu-title">🔍 Set search radius</p>', unsafe_allow_htm
 radius = st.slider("Search radius (meters)", min_value=1000, max_value=20000, value=5000, step=1000)
 st.markdown('</div>', unsafe_allow_html=True)
 
+# Explicit invalidation of memoized search results
+if st.sidebar.button("🔄 Refresh cached results"):
+    clear_search_caches()
+    st.sidebar.success("Cached locations, restaurants, menus, pages and menu source stats cleared.")
+
+# How each menu source has performed, which decides the order they are tried in
+with st.sidebar.expander("📊 Menu source stats"):
+    global_stats = get_source_stats().get("global")
+    if global_stats:
+        st.table([
+            {"Source": source, "Attempts": stats["attempts"], "Success rate": f"{stats['success_rate']:.0%}",
+             "Avg latency (s)": stats["mean_latency"], "Score": stats["score"]}
+            for source, stats in sorted(global_stats.items(), key=lambda item: -item[1]["score"])
+        ])
+    else:
+        st.caption("No menu lookups recorded yet.")
+    deduplicated = {name: stats["deduplicated"] for name, stats in single_flight_stats().items() if stats["deduplicated"]}
+    if deduplicated:
+        st.caption("Duplicate in-flight requests shared: " + ", ".join(f"{name} {count}" for name, count in deduplicated.items()))
+    st.caption("API calls this month: " + ", ".join(
+        f"{provider} {usage['calls']}" + (f"/{int(usage['monthly_quota'])}" if usage['monthly_quota'] else "")
+        for provider, usage in api_usage().items()))
+
 # Main search button
 if st.button("🔍 Find & Analyze Restaurants", use_container_width=True):
-    if "glucose_summary" not in st.session_state or not st.session_state["glucose_summary"]:
-        st.warning("Please upload and analyze your CGM report in the Home tab first.")
-    else:
-        # Get location for search
-        if use_current_location:
-            # For "Current Location", use a default location (San Francisco)
-            # This is a workaround since browser geolocation isn't reliable in Streamlit
-            st.info("📍 Using San Francisco as your current location for demo purposes...")
-            
-            # Use San Francisco coordinates
-            lat = 37.7749
-            lng = -122.4194
-            location = f"{lat},{lng}"
-            
-            with st.spinner("🔍 Searching for restaurants in San Francisco..."):
-                # For each cuisine, search for restaurants
-                all_restaurants = []
-                
-                for cuisine in cuisines:
-                    with st.spinner(f"🔍 Searching for {cuisine} restaurants..."):
-                        # Search for restaurants of this cuisine type
-                        restaurants_for_cuisine, error_msg = get_nearby_restaurants(
-                            location, 
-                            radius_meters=radius, 
-                            cuisine_types=[cuisine]
-                        )
-                        
-                        if not error_msg and restaurants_for_cuisine:
-                            # Take up to 3 restaurants for this cuisine
-                            all_restaurants.extend(restaurants_for_cuisine[:3])
-                
-                # Set the results
-                restaurants = all_restaurants
-                error = None if restaurants else "No restaurants found for the selected cuisines."
+    # One trace per search; every span below (and in worker threads) joins it
+    search_trace = start_trace("travel_search", user=st.session_state.get("user", ""), cuisines=",".join(cuisines), radius=radius)
+    # Ended however the run stops: an exception, a rerun or a stop
+    try:
+        if "glucose_summary" not in st.session_state or not st.session_state["glucose_summary"]:
+            st.warning("Please upload and analyze your CGM report in the Home tab first.")
         else:
-            # Use coordinates from the location search
-            if 'search_lat' in st.session_state and 'search_lng' in st.session_state:
-                lat = st.session_state['search_lat']
-                lng = st.session_state['search_lng']
+            # Get location for search
+            if use_current_location:
+                # For "Current Location", use a default location (San Francisco)
+                # This is a workaround since browser geolocation isn't reliable in Streamlit
+                st.info("📍 Using San Francisco as your current location for demo purposes...")
+            
+                # Use San Francisco coordinates
+                lat = 37.7749
+                lng = -122.4194
                 location = f"{lat},{lng}"
-                
-                with st.spinner("🔍 Searching for restaurants near {location_search}..."):
-                    # Pass all selected cuisines to the restaurant finder
-                    restaurants, error = get_nearby_restaurants(location, radius_meters=radius, cuisine_types=cuisines)
+            
+                with st.spinner("🔍 Searching for restaurants in San Francisco..."):
+                    # All selected cuisines are searched concurrently, up to 3 restaurants each
+                    try:
+                        restaurants_by_cuisine = cached_restaurants_by_cuisine(location, radius, tuple(cuisines))
+                        error = None
+                    except SearchError as e:
+                        restaurants_by_cuisine = {}
+                        error = str(e)
             else:
-                st.error("Please enter a valid location or use 'Current Location'.")
-                restaurants = []
-                error = "No location specified."
+                # Use coordinates from the location search
+                if 'search_lat' in st.session_state and 'search_lng' in st.session_state:
+                    lat = st.session_state['search_lat']
+                    lng = st.session_state['search_lng']
+                    location = f"{lat},{lng}"
+                
+                    with st.spinner(f"🔍 Searching for restaurants near {location_search}..."):
+                        # All selected cuisines are searched concurrently, up to 3 restaurants each
+                        try:
+                            restaurants_by_cuisine = cached_restaurants_by_cuisine(location, radius, tuple(cuisines))
+                            error = None
+                        except SearchError as e:
+                            restaurants_by_cuisine = {}
+                            error = str(e)
+                else:
+                    st.error("Please enter a valid location or use 'Current Location'.")
+                    restaurants_by_cuisine = {}
+                    error = "No location specified."
         
-        # Process and display restaurant results
-        if error:
-            st.error(error)
-        elif not restaurants:
-            st.warning("No restaurants found in this area. Try increasing the search radius or changing location.")
-        else:
-            # Display a map with the location
-            st.markdown('<div class="highlight">', unsafe_allow_html=True)
-            st.markdown(f"### 📍 Showing restaurants near {location_search if 'location_search' in locals() and location_search else f'{lat}, {lng}'}")
-            map_data = {"latitude": [float(lat)], "longitude": [float(lng)]}
-            st.map(map_data)
-            st.markdown('</div>', unsafe_allow_html=True)
-            
-            # Show restaurant results
-            st.markdown(f"### 🍴️ Found {len(restaurants)} restaurants")
-            
-            # Limit to 3 restaurants per cuisine
-            filtered_restaurants = []
-            cuisine_count = {cuisine: 0 for cuisine in cuisines}
+            restaurants = [restaurant for found in restaurants_by_cuisine.values() for restaurant in found]
+        
+            # Process and display restaurant results
+            if error:
+                st.error(error)
+            elif not restaurants:
+                st.warning("No restaurants found in this area. Try increasing the search radius or changing location.")
+            else:
+                # Display a map with the location
+                st.markdown('<div class="highlight">', unsafe_allow_html=True)
+                st.markdown(f"### 📍 Showing restaurants near {location_search if 'location_search' in locals() and location_search else f'{lat}, {lng}'}")
+                map_data = {"latitude": [float(lat)], "longitude": [float(lng)]}
+                st.map(map_data)
+                st.markdown('</div>', unsafe_allow_html=True)
             
-            # Filter to max 3 restaurants per cuisine
-            for restaurant in restaurants:
-                cuisine = restaurant.get("cuisine", "")
-                # Check if this restaurant's cuisine matches any of our selected cuisines
-                for selected_cuisine in cuisines:
-                    if selected_cuisine.lower() in cuisine.lower() or selected_cuisine.lower() in restaurant.get("name", "").lower():
-                        # Only add if we haven't reached the limit for this cuisine
-                        if cuisine_count[selected_cuisine] < 3:
-                            filtered_restaurants.append(restaurant)
-                            cuisine_count[selected_cuisine] += 1
+                # Results are already limited to 3 restaurants per cuisine
+                filtered_restaurants = restaurants
             
-            # Show the limited number of restaurants
-            st.markdown(f"Showing top {len(filtered_restaurants)} restaurants (max 3 per cuisine)")
+                # Show the limited number of restaurants
+                st.markdown(f"Showing top {len(filtered_restaurants)} restaurants (max 3 per cuisine)")
             
-            # Create columns for restaurant cards
-            cols = st.columns(3)
+                # Create columns for restaurant cards
+                cols = st.columns(3)
             
-            # Display each restaurant in a card
-            for i, restaurant in enumerate(filtered_restaurants):
-                with cols[i % 3]:
-                    name = restaurant.get("name", "Unknown Restaurant")
-                    rating = restaurant.get("rating", "N/A")
-                    address = restaurant.get("address", "Address not found")
-                    price = restaurant.get("price", "$")
-                    place_id = restaurant.get("place_id", "")
-                    detected_cuisine = restaurant.get("cuisine", "")
+                # Display each restaurant in a card
+                for i, restaurant in enumerate(filtered_restaurants):
+                    with cols[i % 3]:
+                        name = restaurant.get("name", "Unknown Restaurant")
+                        rating = restaurant.get("rating", "N/A")
+                        address = restaurant.get("address", "Address not found")
+                        price = restaurant.get("price", "$")
+                        place_id = restaurant.get("place_id", "")
+                        detected_cuisine = restaurant.get("cuisine", "")
                     
-                    # Create a card for the restaurant
-                    st.markdown(f'''
-                    <div class="restaurant-card">
-                        <div class="restaurant-name">{name}</div>
-                        <div class="restaurant-info">⭐ Rating: {rating} | 💰 Price: {price}</div>
-                        <div class="restaurant-info">🍽️ Cuisine: {detected_cuisine}</div>
-                        <div class="restaurant-info">📍 {address}</div>
-                    ''', unsafe_allow_html=True)
+                        # Create a card for the restaurant
+                        st.markdown(f'''
+                        <div class="restaurant-card">
+                            <div class="restaurant-name">{name}</div>
+                            <div class="restaurant-info">⭐ Rating: {rating} | 💰 Price: {price}</div>
+                            <div class="restaurant-info">🍽️ Cuisine: {detected_cuisine}</div>
+                            <div class="restaurant-info">📍 {address}</div>
+                        ''', unsafe_allow_html=True)
                     
-                    # Create an expander for the menu and analysis
-                    with st.expander("View Menu & CGM Analysis"):
-                        # Determine which cuisine to use for this restaurant
-                        # If the restaurant's cuisine is detected and in our list, use it
-                        # Otherwise use the first selected cuisine
-                        detected_cuisine = detected_cuisine if detected_cuisine in cuisines else (cuisines[0] if cuisines else "International")
-                        
-                        # Create a placeholder for menu loading message
-                        menu_placeholder = st.empty()
-                        menu_placeholder.info("⏳ Searching for real menu...")
+                        # Create an expander for the menu and analysis
+                        with st.expander("View Menu & CGM Analysis"):
+                            # Determine which cuisine to use for this restaurant
+                            # Prefer the cuisine it was found for, then the detected cuisine if it is in our list
+                            # Otherwise use the first selected cuisine
+                            detected_cuisine = restaurant.get("search_cuisine") or (detected_cuisine if detected_cuisine in cuisines else (cuisines[0] if cuisines else "International"))
                         
-                        # Try to get a real menu
-                        menu = None
-                        menu_source = ""
-                        is_real = False
+                            # Create a placeholder for menu loading message
+                            menu_placeholder = st.empty()
+                            menu_placeholder.info("⏳ Searching for real menu...")
                         
-                        # Try to get a real menu using multiple methods
-                        try:
-                            # First try Google Maps
-                            with st.spinner(f"🔍 Searching for real menu on Google Maps for {name}..."):
-                                maps_menu, maps_success, maps_url = get_real_menu_from_google_maps(
-                                    restaurant_name=name,
-                                    location=address
-                                )
-                                
-                                if maps_success:
-                                    menu = maps_menu
-                                    menu_source = "Real Menu (Google Maps)"
-                                    is_real = True
-                                    menu_placeholder.success("✅ Found real menu on Google Maps!")
-                                else:
-                                    # If Google Maps fails, try the web scraper
-                                    menu_placeholder.info("⏳ Trying web search for menu...")
-                                    with st.spinner(f"🔍 Searching web for menu of {name}..."):
-                                        real_menu, is_real, menu_url = get_real_menu(
-                                            restaurant_name=name,
-                                            address=address,
-                                            place_id=place_id if place_id else ""
-                                        )
-                                        
-                                        if is_real:
-                                            menu = real_menu
-                                            menu_source = "Real Menu (Web)"
-                                            menu_placeholder.success("✅ Found real menu from web search!")
-                                        else:
-                                            # If no real menu found, fall back to AI simulation
-                                            menu_placeholder.info("⏳ Generating AI menu simulation...")
-                                            with st.spinner(f"🤖 Generating menu for {name}..."):
-                                                # Pass restaurant name without forcing cuisine in the name
-                                                menu = simulate_menu(
-                                                    restaurant_name=name,
-                                                    cuisine_type=detected_cuisine
-                                                )
-                                                menu_source = "AI-Simulated"
-                        except Exception as e:
-                            st.error(f"Error searching for menu: {str(e)}")
-                            # Fall back to AI simulation
-                            menu_placeholder.info("⏳ Generating AI menu simulation...")
-                            with st.spinner(f"🤖 Generating menu for {name}..."):
-                                menu = simulate_menu(
-                                    restaurant_name=name,
-                                    cuisine_type=detected_cuisine
-                                )
-                                menu_source = "AI-Simulated"
+                            # Try Google Maps, then web search (memoized per restaurant), then AI simulation
+                            with st.spinner(f"🔍 Finding menu for {name}..."), span("restaurant_menu", restaurant=name) as menu_span:
+                                menu, menu_source, chain = restaurant_menu(name, address, place_id, detected_cuisine)
+                                menu_span.set(source=menu_source, chain=chain or "")
                         
-                        # Clear the placeholder
-                        menu_placeholder.empty()
-
-                        # Make sure we have a menu before analyzing
-                        if menu:
-
-                            with st.spinner("🤝 Analyzing menu with your CGM data..."):
-                                # Make sure we have glucose data before analyzing
-                                if "glucose_summary" in st.session_state and st.session_state["glucose_summary"]:
-                                    summary = analyze_menu(str(menu), st.session_state["glucose_summary"])
-                                    # Convert CrewOutput to string
-                                    summary_str = str(summary)
+                            # Clear the placeholder
+                            menu_placeholder.empty()
+
+                            # Make sure we have a menu before analyzing
+                            if menu:
+
+                                with st.spinner("🤝 Analyzing menu with your CGM data..."):
+                                    # Make sure we have glucose data before analyzing
+                                    if "glucose_summary" in st.session_state and st.session_state["glucose_summary"]:
+                                        with span("restaurant_analysis", restaurant=name):
+                                            summary_str = cached_menu_analysis(str(menu), st.session_state["glucose_summary"], chain)
                                     
-                                    # Display the menu with better formatting
-                                    st.markdown(f'''
-                                    <div class="menu-section">
-                                        <div class="menu-title">📋 {menu_source} ({detected_cuisine} Cuisine)</div>
-                                        {str(menu).replace("\n", "<br>")}
-                                    </div>
-                                    ''', unsafe_allow_html=True)
+                                        # Display the menu with better formatting
+                                        st.markdown(f'''
+                                        <div class="menu-section">
+                                            <div class="menu-title">📋 {menu_source} ({detected_cuisine} Cuisine)</div>
+                                            {str(menu).replace("\n", "<br>")}
+                                        </div>
+                                        ''', unsafe_allow_html=True)
                                     
-                                    # Display CGM analysis with better formatting
-                                    st.markdown(f'''
-                                    <div class="menu-section">
-                                        <div class="menu-title">🤝 CGM-Based Recommendations</div>
-                                        {summary_str.replace("\n", "<br>").replace("✅", "<span class='cgm-safe'>✅</span>").replace("❌", "<span class='cgm-avoid'>❌</span>").replace("🤝", "<span class='cgm-combo'>🤝</span>")}
-                                    </div>
-                                    ''', unsafe_allow_html=True)
-                                else:
-                                    # Display just the menu without analysis if no CGM data
-                                    st.markdown(f'''
-                                    <div class="menu-section">
-                                        <div class="menu-title">📋 {menu_source} ({detected_cuisine} Cuisine)</div>
-                                        {str(menu).replace("\n", "<br>")}
-                                    </div>
-                                    ''', unsafe_allow_html=True)
+                                        # Display CGM analysis with better formatting
+                                        st.markdown(f'''
+                                        <div class="menu-section">
+                                            <div class="menu-title">🤝 CGM-Based Recommendations</div>
+                                            {summary_str.replace("\n", "<br>").replace("✅", "<span class='cgm-safe'>✅</span>").replace("❌", "<span class='cgm-avoid'>❌</span>").replace("🤝", "<span class='cgm-combo'>🤝</span>")}
+                                        </div>
+                                        ''', unsafe_allow_html=True)
+                                    else:
+                                        # Display just the menu without analysis if no CGM data
+                                        st.markdown(f'''
+                                        <div class="menu-section">
+                                            <div class="menu-title">📋 {menu_source} ({detected_cuisine} Cuisine)</div>
+                                            {str(menu).replace("\n", "<br>")}
+                                        </div>
+                                        ''', unsafe_allow_html=True)
                                     
-                                    st.warning("Please upload and analyze your CGM report in the Home tab to get personalized recommendations.")
+                                        st.warning("Please upload and analyze your CGM report in the Home tab to get personalized recommendations.")
                         
-                        # Add Google Maps link
-                        map_url = f"https://www.google.com/maps/search/?api=1&query={name.replace(' ', '+')}+{address.replace(' ', '+')}"
-                        st.markdown(f'''
-                            <a href="{map_url}" target="_blank" class="map-link">📍 Open in Google Maps</a>
-                        </div>
-                        ''', unsafe_allow_html=True)
+                            # Add Google Maps link
+                            map_url = f"https://www.google.com/maps/search/?api=1&query={name.replace(' ', '+')}+{address.replace(' ', '+')}"
+                            st.markdown(f'''
+                                <a href="{map_url}" target="_blank" class="map-link">📍 Open in Google Maps</a>
+                            </div>
+                            ''', unsafe_allow_html=True)
+    finally:
+        search_trace.end()
 
 # Add helpful tips at the bottom
 with st.expander("💡 Tips for using this tool"):
@@ -370,3 +444,4 @@ with st.expander("💡 Tips for using this tool"):
     Remember, the AI-generated menus are simulations based on typical dishes for each cuisine and restaurant. Actual menus may vary.
     ''')
 
+profile_page_end()
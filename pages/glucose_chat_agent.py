@@ -1,27 +1,56 @@
-from crewai import Agent, Task, Crew
 import os
 from dotenv import load_dotenv
+from model_router import routed_kickoff, routed_stream, routed_agent, agent_messages, AgentProfile
 
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY
 
-glucose_advisor = Agent(
+glucose_advisor = AgentProfile(
     role="Glucose Management Advisor",
     goal="Provide concise, practical advice for managing glucose levels in different situations",
     backstory="""You are an expert in glucose management, specializing in providing 
     practical, evidence-based advice for everyday situations. You always keep answers 
-    brief and actionable, focusing on 1-2 key strategies.""",
-    verbose=True,
-    llm_config={"model": "gpt-4", "api_key": OPENAI_API_KEY}
+    brief and actionable, focusing on 1-2 key strategies."""
 )
 
+ADVICE_OUTPUT = "1-2 sentence practical advice"
+
+def advice_description(question):
+    return f"Provide a brief, practical 1-2 sentence response to: {question}\n\nFocus on actionable advice for managing glucose levels."
+
 def get_glucose_advice(question):
-    task = Task(
-        description=f"Provide a brief, practical 1-2 sentence response to: {question}\n\nFocus on actionable advice for managing glucose levels.",
-        expected_output="1-2 sentence practical advice",
-        agent=glucose_advisor
-    )
-    
-    crew = Crew(agents=[glucose_advisor], tasks=[task])
-    return crew.kickoff()
\ No newline at end of file
+    def make_crew(llm):
+        from crewai import Task, Crew
+        agent = routed_agent(glucose_advisor, llm)
+        task = Task(
+            description=advice_description(question),
+            expected_output=ADVICE_OUTPUT,
+            agent=agent
+        )
+        return Crew(agents=[agent], tasks=[task])
+
+    return routed_kickoff("chat_advice", "glucose_advice", make_crew, cache_key=question.strip().lower(),
+                          fallback=lambda: quick_glucose_tip(question))
+
+def stream_glucose_advice(question):
+    """get_glucose_advice, yielding the answer in chunks as it is generated"""
+    messages = agent_messages(glucose_advisor, advice_description(question), ADVICE_OUTPUT)
+    return routed_stream("chat_advice", "glucose_advice", messages, cache_key=question.strip().lower(),
+                         fallback=lambda: quick_glucose_tip(question))
+
+# Canned advice by topic for users whose LLM budget is spent
+GLUCOSE_TIPS = {
+    ("breakfast", "morning"): "Start the day savoury: protein, fat and fiber instead of cereal or pastries.",
+    ("dessert", "sweet", "sugar", "cake"): "Have sweets right after a meal rather than on their own, then take a short walk.",
+    ("restaurant", "order", "eat out", "menu"): "Order protein and vegetables first and share or skip the bread basket.",
+    ("snack",): "Pick a savoury snack like nuts, eggs or hummus over anything sweet.",
+    ("exercise", "walk", "workout"): "A 10 minute walk after eating blunts the glucose spike from that meal.",
+    ("carb", "rice", "pasta", "bread"): "Eat carbs last in the meal and pair them with protein, fat or fiber."
+}
+DEFAULT_TIP = "Eat vegetables first, protein and fat next, and starches last to flatten the glucose curve."
+
+def quick_glucose_tip(question):
+    lowered = question.lower()
+    tip = next((tip for words, tip in GLUCOSE_TIPS.items() if any(word in lowered for word in words)), DEFAULT_TIP)
+    return f"{tip} (AI budget for this month reached — quick tip)"
\ No newline at end of file
@@ -0,0 +1,162 @@
+import os
+import re
+import sys
+import time
+import itertools
+import threading
+import tracemalloc
+import logging
+from collections import Counter
+from cache_store import CACHE_DIR
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('profiling')
+
+# Opt-in page profiling: PROFILE_PAGES=cpu, memory, or cpu,memory (all / 1
+# enable both). Each page run then writes to PROFILE_DIR:
+#   <page>-<time>-<n>.folded     sampled stacks in collapsed format, ready for
+#                                flamegraph.pl, speedscope or inferno
+#   <page>-<time>-<n>.alloc.txt  top allocation sites (tracemalloc) of the run
+_modes = {mode.strip() for mode in os.getenv("PROFILE_PAGES", "").lower().split(",") if mode.strip()}
+PROFILE_MODES = {"cpu", "memory"} if _modes & {"1", "all", "true"} else _modes & {"cpu", "memory"}
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(CACHE_DIR, "profiles"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", 5)) / 1000  # seconds between stack samples
+PROFILE_TOP_ALLOCATIONS = 25
+
+_lock = threading.Lock()
+_active = {}  # script thread id -> PageProfile
+_tracemalloc_users = 0
+_run_numbers = itertools.count(1)
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class StackSampler(threading.Thread):
+    """
+    Samples the call stack of one thread every interval seconds. This is a
+    wall-clock profile: time spent waiting on the network shows up in the
+    frames that are waiting, which is what a slow page run needs.
+    """
+    def __init__(self, thread_id, interval, on_thread_exit):
+        super().__init__(name="page-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.on_thread_exit = on_thread_exit
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                # The script thread ended without reaching profile_page_end
+                self.on_thread_exit()
+                return
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        if threading.current_thread() is not self:
+            self.join()
+
+class PageProfile:
+    def __init__(self, page, thread_id, modes):
+        self.page = page
+        self.thread_id = thread_id
+        self.modes = modes
+        self.started = time.perf_counter()
+        self.sampler = None
+        self.snapshot = None
+        self._stopped = False
+
+    def start(self):
+        global _tracemalloc_users
+        if "memory" in self.modes:
+            with _lock:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                _tracemalloc_users += 1
+            tracemalloc.reset_peak()
+            self.snapshot = tracemalloc.take_snapshot()
+        if "cpu" in self.modes:
+            self.sampler = StackSampler(self.thread_id, PROFILE_INTERVAL, lambda: self.stop(complete=False))
+            self.sampler.start()
+
+    def stop(self, complete=True):
+        """Stop profiling and write this run's files; returns their paths"""
+        global _tracemalloc_users
+        with _lock:
+            if self._stopped:
+                return []
+            self._stopped = True
+            if _active.get(self.thread_id) is self:
+                del _active[self.thread_id]
+        duration = time.perf_counter() - self.started
+        safe_page = re.sub(r"[^A-Za-z0-9_-]+", "_", self.page)
+        base = os.path.join(PROFILE_DIR, f"{safe_page}-{time.strftime('%Y%m%d-%H%M%S')}-{next(_run_numbers)}")
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        paths = []
+        summary = f"{self.page} run took {duration:.2f}s" + ("" if complete else " (ended early)")
+
+        if self.sampler is not None:
+            self.sampler.stop()
+            with open(f"{base}.folded", "w") as f:
+                for stack, count in self.sampler.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            paths.append(f"{base}.folded")
+            leaves = Counter()
+            for stack, count in self.sampler.stacks.items():
+                leaves[stack.rsplit(";", 1)[-1]] += count
+            hottest = ", ".join(f"{frame} {count * 100 // max(1, self.sampler.samples)}%" for frame, count in leaves.most_common(3))
+            summary += f"; {self.sampler.samples} samples, hottest: {hottest or 'none'}"
+
+        if self.snapshot is not None:
+            end = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            stats = end.compare_to(self.snapshot, "lineno")[:PROFILE_TOP_ALLOCATIONS]
+            with open(f"{base}.alloc.txt", "w") as f:
+                f.write(f"# {self.page}: {duration:.2f}s, traced peak {peak / 1024:.0f} KiB "
+                        f"(process-wide; concurrent sessions are included)\n")
+                for stat in stats:
+                    f.write(f"{stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8d} blocks  {stat.traceback}\n")
+            paths.append(f"{base}.alloc.txt")
+            summary += f"; traced peak {peak / 1024:.0f} KiB"
+            with _lock:
+                _tracemalloc_users -= 1
+                if _tracemalloc_users == 0:
+                    tracemalloc.stop()
+
+        logger.info(f"Profile: {summary} -> {base}.*")
+        return paths
+
+def profile_page_start(page):
+    """
+    Start profiling this page run (on the calling script thread) when
+    PROFILE_PAGES is set. A run left unfinished by st.stop() or st.rerun()
+    is written out when the next run on the thread starts or the thread ends.
+    """
+    if not PROFILE_MODES:
+        return
+    thread_id = threading.get_ident()
+    with _lock:
+        stale = _active.get(thread_id)
+    if stale is not None:
+        stale.stop(complete=False)
+    profile = PageProfile(page, thread_id, PROFILE_MODES)
+    with _lock:
+        _active[thread_id] = profile
+    profile.start()
+
+def profile_page_end():
+    """Finish the profile started on this thread, if any"""
+    with _lock:
+        profile = _active.get(threading.get_ident())
+    if profile is not None:
+        profile.stop()
@@ -3,9 +3,18 @@ import os
 import json
 import re
 from dotenv import load_dotenv
-from bs4 import BeautifulSoup
 import time
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from cache_store import PersistentLRUCache, SingleFlight
+from menu_html_extractor import extract_menu_items, menu_items_from_schema
+from menu_schema import parse_menu_ld_json
+from resilience import Deadline, NotProviderFailure, CircuitOpenError, get_breaker, timeout_for
+from api_scheduler import api_call, prefetch_priority
+from source_stats import record_attempt, explain_source_order, domain_key
+from chain_cache import detect_chain, get_chain_menu, set_chain_menu, location_key
+from page_fetcher import fetch_page, get_parsed, set_parsed, MenuStopCondition, YELP_MENU_SECTION
+from tracing import span, in_current_context
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -16,20 +25,79 @@ GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 SERPER_API_KEY = os.getenv("SERPER_API_KEY")
 SERPAPI_API_KEY = os.getenv("SERPAPI_API_KEY")
 
-def get_place_details(place_id):
+# "single-pass" (menu_html_extractor) or "legacy" (BeautifulSoup heuristics)
+MENU_EXTRACTOR = os.getenv("MENU_EXTRACTOR", "single-pass")
+MAX_MENU_LINKS = 2  # hasMenu links followed per page
+
+# Base URLs can point at local stand-ins (see benchmarks/bench_travel_pipeline.py)
+PLACES_API_BASE = os.getenv("PLACES_API_BASE", "https://maps.googleapis.com/maps/api/place")
+SERPER_BASE_URL = os.getenv("SERPER_BASE_URL", "https://google.serper.dev")
+SERPAPI_BASE_URL = os.getenv("SERPAPI_BASE_URL", "https://serpapi.com")
+PLACE_DETAILS_URL = f"{PLACES_API_BASE}/details/json"
+
+# Field masks for Place Details requests. Fewer fields means smaller
+# responses and a cheaper billing tier, so request only what is needed.
+PLACE_DETAILS_PROFILES = {
+    "website-only": ["website"],
+    "card": ["name", "website", "url", "formatted_address", "formatted_phone_number", "price_level", "rating"],
+    "full": ["name", "website", "url", "formatted_address", "formatted_phone_number", "price_level", "rating", "reviews", "photos"]
+}
+PLACE_DETAILS_TTL = 7 * 24 * 60 * 60  # seconds
+PLACE_DETAILS_PREFETCH_WORKERS = 4
+
+# Every menu lookup gets an overall deadline that caps each request it makes
+MENU_DEADLINE_SECONDS = float(os.getenv("MENU_DEADLINE_SECONDS", 25))
+PLACES_TIMEOUT = 10
+SEARCH_TIMEOUT = 10
+# Sources are ordered by their recorded hit rate and latency (see
+# source_stats); with a parallelism above 1 the best N run concurrently
+MENU_SOURCE_PARALLELISM = int(os.getenv("MENU_SOURCE_PARALLELISM", 1))
+
+class SourceNotApplicable(Exception):
+    """Raised by a menu source that cannot be tried for a restaurant; no attempt is recorded"""
+
+_place_details_cache = PersistentLRUCache("place_details", max_entries=5000, ttl=PLACE_DETAILS_TTL)
+_details_flight = SingleFlight("place_details")
+
+def _cached_place_details(place_id, profile):
+    """Return cached details for place_id from this profile or any profile that includes its fields"""
+    fields = set(PLACE_DETAILS_PROFILES[profile])
+    for candidate, candidate_fields in PLACE_DETAILS_PROFILES.items():
+        if candidate == profile or fields.issubset(candidate_fields):
+            cached = _place_details_cache.get(f"{place_id}|{candidate}")
+            if cached is not None:
+                return cached
+    return None
+
+def clear_place_details_cache():
+    """Forget every cached Place Details response"""
+    _place_details_cache.clear()
+
+def get_place_details(place_id, profile="full", deadline=None):
     """
-    Get detailed information about a place using Google Places API
+    Get detailed information about a place using Google Places API.
+    Only the fields of the named profile in PLACE_DETAILS_PROFILES are
+    requested, and results are cached on disk per place_id and profile.
+    Concurrent requests for the same place and profile share one API call.
     """
+    cached = _cached_place_details(place_id, profile)
+    if cached is not None:
+        logger.info(f"Using cached place details ({profile}) for place_id: {place_id}")
+        return cached
+    return _details_flight.do(f"{place_id}|{profile}", _fetch_place_details, place_id, profile, deadline)
+
+def _fetch_place_details(place_id, profile, deadline):
     try:
-        url = f"https://maps.googleapis.com/maps/api/place/details/json"
         params = {
             'place_id': place_id,
-            'fields': 'name,website,url,formatted_address,formatted_phone_number,price_level,rating,reviews,photos',
+            'fields': ','.join(PLACE_DETAILS_PROFILES[profile]),
             'key': GOOGLE_API_KEY
         }
         
-        logger.info(f"Fetching place details for place_id: {place_id}")
-        response = requests.get(url, params=params)
+        logger.info(f"Fetching place details ({profile}) for place_id: {place_id}")
+        timeout = timeout_for(deadline, PLACES_TIMEOUT)
+        response = get_breaker("places").call_within(
+            deadline, api_call, "places", requests.get, PLACE_DETAILS_URL, params=params, timeout=timeout, max_wait=timeout)
         
         if response.status_code != 200:
             logger.error(f"API Error: Status {response.status_code}")
@@ -42,25 +110,55 @@ def get_place_details(place_id):
             return None
             
         result = data.get('result', {})
-        logger.info(f"Successfully retrieved place details for: {result.get('name', 'Unknown place')}")
+        _place_details_cache.set(f"{place_id}|{profile}", result)
+        logger.info(f"Successfully retrieved place details for: {result.get('name', place_id)}")
         return result
         
+    except (NotProviderFailure, CircuitOpenError):
+        # Not the source's answer: the caller decides what a skipped call means
+        raise
     except Exception as e:
         logger.error(f"Error fetching place details: {str(e)}")
         return None
 
-def fetch_from_yelp(restaurant_name, location):
+def prefetch_place_details(place_ids, profile="website-only"):
+    """
+    Fetch details for all given places concurrently so later lookups are
+    served from the cache. Returns a dict of place_id -> details (or None).
+    Requests run at prefetch priority, behind interactive API calls; one
+    that is throttled, over the prefetch quota or skipped by an open circuit
+    gives None and is left for the interactive lookup.
+    """
+    unique_ids = list(dict.fromkeys(place_id for place_id in place_ids if place_id))
+    if not unique_ids:
+        return {}
+
+    def prefetch(place_id):
+        with prefetch_priority():
+            try:
+                return get_place_details(place_id, profile)
+            except (NotProviderFailure, CircuitOpenError) as e:
+                logger.info(f"Skipped prefetching details for {place_id}: {str(e)}")
+                return None
+
+    with ThreadPoolExecutor(max_workers=min(PLACE_DETAILS_PREFETCH_WORKERS, len(unique_ids))) as executor:
+        details = executor.map(in_current_context(prefetch), unique_ids)
+        return dict(zip(unique_ids, details))
+
+def fetch_from_yelp(restaurant_name, location, deadline=None):
     """
     Try to fetch menu information from Yelp
     Note: This is a simplified version that doesn't use the actual Yelp API
     but instead scrapes public Yelp pages
     """
+    if not SERPAPI_API_KEY:
+        raise SourceNotApplicable("no SerpAPI key to find the Yelp page with")
     try:
         # Format the search query for Yelp
         search_query = f"{restaurant_name} {location} site:yelp.com"
         
         # Use Google Search to find the Yelp page
-        url = "https://serpapi.com/search"
+        url = f"{SERPAPI_BASE_URL}/search"
         params = {
             "engine": "google",
             "q": search_query,
@@ -68,7 +166,9 @@ def fetch_from_yelp(restaurant_name, location):
         }
         
         logger.info(f"Searching for Yelp page: {search_query}")
-        response = requests.get(url, params=params)
+        timeout = timeout_for(deadline, SEARCH_TIMEOUT)
+        response = get_breaker("serpapi").call_within(
+            deadline, api_call, "serpapi", requests.get, url, params=params, timeout=timeout, max_wait=timeout)
         
         if response.status_code != 200:
             logger.warning(f"SerpAPI search failed: {response.status_code}")
@@ -93,41 +193,19 @@ def fetch_from_yelp(restaurant_name, location):
         }
         
         logger.info(f"Fetching Yelp page: {yelp_url}")
-        response = requests.get(yelp_url, headers=headers, timeout=10)
+        response = get_breaker("yelp").call_within(
+            deadline, fetch_page, yelp_url, headers=headers, timeout=10, deadline=deadline,
+            stop_when=MenuStopCondition(YELP_MENU_SECTION, min_prices=0))
         
         if response.status_code != 200:
             logger.warning(f"Failed to fetch Yelp page: {response.status_code}")
             return None
             
-        # Parse the page to find menu items
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Look for menu section
-        menu_section = soup.find('section', {'aria-label': 'Menu'}) or soup.find('section', {'data-testid': 'menu-section'})
-        
-        if not menu_section:
-            # Try to find any section that might contain menu items
-            menu_section = soup.find('section', string=lambda text: text and 'menu' in text.lower())
-            
-        if not menu_section:
-            logger.warning("No menu section found on Yelp page")
-            return None
-            
-        # Extract menu items
-        menu_items = []
-        menu_categories = {}
-        
-        # Look for menu item elements
-        item_elements = menu_section.find_all(['div', 'li'], class_=lambda c: c and ('menu-item' in str(c).lower() or 'dish-name' in str(c).lower()))
-        
-        if not item_elements:
-            # Try a more general approach
-            item_elements = menu_section.find_all(['h4', 'h5', 'p'])
-            
-        for item in item_elements:
-            text = item.get_text().strip()
-            if text and len(text) > 5 and len(text) < 100:
-                menu_items.append(text)
+        # Parse the page to find menu items (unchanged pages reuse the last parse)
+        menu_items = get_parsed(response, "yelp")
+        if menu_items is None:
+            menu_items = parse_yelp_menu_items(response.text)
+            set_parsed(response, "yelp", menu_items)
                 
         if menu_items:
             logger.info(f"Found {len(menu_items)} menu items on Yelp")
@@ -139,20 +217,55 @@ def fetch_from_yelp(restaurant_name, location):
             
         return None
         
+    except (NotProviderFailure, CircuitOpenError):
+        # Not the source's answer: the caller decides what a skipped call means
+        raise
     except Exception as e:
         logger.error(f"Error fetching from Yelp: {str(e)}")
         return None
 
-def search_for_menu(restaurant_name, location):
+def parse_yelp_menu_items(html):
+    """Menu item names from a Yelp business page (empty list if none are found)"""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    # Look for menu section
+    menu_section = soup.find('section', {'aria-label': 'Menu'}) or soup.find('section', {'data-testid': 'menu-section'})
+    
+    if not menu_section:
+        # Try to find any section that might contain menu items
+        menu_section = soup.find('section', string=lambda text: text and 'menu' in text.lower())
+        
+    if not menu_section:
+        logger.warning("No menu section found on Yelp page")
+        return []
+        
+    # Extract menu items
+    menu_items = []
+    
+    # Look for menu item elements
+    item_elements = menu_section.find_all(['div', 'li'], class_=lambda c: c and ('menu-item' in str(c).lower() or 'dish-name' in str(c).lower()))
+    
+    if not item_elements:
+        # Try a more general approach
+        item_elements = menu_section.find_all(['h4', 'h5', 'p'])
+        
+    for item in item_elements:
+        text = item.get_text().strip()
+        if text and len(text) > 5 and len(text) < 100:
+            menu_items.append(text)
+    return menu_items
+
+def search_for_menu(restaurant_name, location, deadline=None):
     """
     Search for a restaurant menu using Serper API (Google Search API alternative)
     """
     if not SERPER_API_KEY:
         logger.warning("No Serper API key found. Please add SERPER_API_KEY to your .env file.")
-        return None
+        raise SourceNotApplicable("no Serper API key")
         
     try:
-        url = "https://google.serper.dev/search"
+        url = f"{SERPER_BASE_URL}/search"
         
         # Create a more specific search query
         query = f"{restaurant_name} restaurant menu {location}"
@@ -170,7 +283,9 @@ def search_for_menu(restaurant_name, location):
             'Content-Type': 'application/json'
         }
         
-        response = requests.request("POST", url, headers=headers, data=payload)
+        timeout = timeout_for(deadline, SEARCH_TIMEOUT)
+        response = get_breaker("serper").call_within(
+            deadline, api_call, "serper", requests.request, "POST", url, headers=headers, data=payload, timeout=timeout, max_wait=timeout)
         
         if response.status_code != 200:
             logger.error(f"Serper API Error: Status {response.status_code}")
@@ -237,20 +352,23 @@ def search_for_menu(restaurant_name, location):
         logger.warning(f"No menu found for {restaurant_name} in {location}")
         return None
         
+    except (NotProviderFailure, CircuitOpenError):
+        # Not the source's answer: the caller decides what a skipped call means
+        raise
     except Exception as e:
         logger.error(f"Error searching for menu: {str(e)}")
         return None
 
-def search_for_menu_with_serpapi(restaurant_name, location):
+def search_for_menu_with_serpapi(restaurant_name, location, deadline=None):
     """
     Alternative search using SerpAPI
     """
     if not SERPAPI_API_KEY:
         logger.warning("No SerpAPI key found. Skipping this search method.")
-        return None
+        raise SourceNotApplicable("no SerpAPI key")
         
     try:
-        url = "https://serpapi.com/search.json"
+        url = f"{SERPAPI_BASE_URL}/search.json"
         
         params = {
             "q": f"{restaurant_name} menu {location}",
@@ -262,7 +380,9 @@ def search_for_menu_with_serpapi(restaurant_name, location):
         }
         
         logger.info(f"Searching with SerpAPI for: {restaurant_name} menu")
-        response = requests.get(url, params=params)
+        timeout = timeout_for(deadline, SEARCH_TIMEOUT)
+        response = get_breaker("serpapi").call_within(
+            deadline, api_call, "serpapi", requests.get, url, params=params, timeout=timeout, max_wait=timeout)
         
         if response.status_code != 200:
             logger.error(f"SerpAPI Error: Status {response.status_code}")
@@ -295,14 +415,21 @@ def search_for_menu_with_serpapi(restaurant_name, location):
         
         return None
         
+    except (NotProviderFailure, CircuitOpenError):
+        # Not the source's answer: the caller decides what a skipped call means
+        raise
     except Exception as e:
         logger.error(f"Error with SerpAPI: {str(e)}")
         return None
 
-def extract_menu_items_from_website(url):
+def extract_menu_items_from_website(url, follow_menu_links=True, deadline=None):
     """
     Try to extract menu items from a restaurant website
-    This is a simplified version and may not work for all websites
+    Structured schema.org menu data is used whenever the page has it (following
+    hasMenu links once); otherwise falls back to HTML heuristics, which may
+    not work for all websites.
+    Returns (menu_items, menu_categories), or (None, None) when the page
+    could not be fetched.
     """
     try:
         headers = {
@@ -310,13 +437,74 @@ def extract_menu_items_from_website(url):
         }
         
         logger.info(f"Attempting to extract menu from: {url}")
-        response = requests.get(url, headers=headers, timeout=15)
+        response = fetch_page(url, headers=headers, timeout=15, stop_when=MenuStopCondition(), deadline=deadline)
         
         if response.status_code != 200:
             logger.warning(f"Failed to fetch website: {response.status_code}")
-            return None
-            
-        soup = BeautifulSoup(response.text, 'html.parser')
+            return None, None
+        
+        # Unchanged pages (HTTP 304) reuse the parse stored with the cached body
+        parser = f"menu:{MENU_EXTRACTOR}"
+        page_menu = get_parsed(response, parser)
+        if page_menu is None:
+            page_menu = parse_menu_page(response.text, url)
+            set_parsed(response, parser, page_menu)
+        
+        if page_menu['structured']:
+            return page_menu['items'], page_menu['categories']
+        
+        if follow_menu_links:
+            for menu_url in page_menu['menu_urls'][:MAX_MENU_LINKS]:
+                if menu_url.rstrip('/') == url.rstrip('/'):
+                    continue
+                logger.info(f"Following hasMenu link: {menu_url}")
+                menu_items, menu_categories = extract_menu_items_from_website(menu_url, follow_menu_links=False, deadline=deadline)
+                if menu_items:
+                    return menu_items, menu_categories
+        
+        if not page_menu['items']:
+            logger.warning(f"Not enough menu items found on {url}")
+        return page_menu['items'], page_menu['categories']
+        
+    except (NotProviderFailure, CircuitOpenError):
+        # Not the source's answer: the caller decides what a skipped call means
+        raise
+    except Exception as e:
+        logger.error(f"Error extracting menu items: {str(e)}")
+        return None, None
+
+def parse_menu_page(html, url=""):
+    """
+    Parse a restaurant page into {"structured", "items", "categories", "menu_urls"}.
+    Structured schema.org menu data is used when the page has at least 3
+    items; otherwise the HTML heuristics run and hasMenu links are returned
+    for the caller to follow.
+    """
+    structured_menu = parse_menu_ld_json(html, url)
+    if structured_menu and len(structured_menu['items']) >= 3:
+        logger.info(f"Extracted {len(structured_menu['items'])} menu items from structured data")
+        menu_items, categories = menu_items_from_schema(structured_menu)
+        return {'structured': True, 'items': menu_items, 'categories': categories, 'menu_urls': []}
+    
+    if MENU_EXTRACTOR == "legacy":
+        menu_items, categories = parse_menu_items_from_html(html, url) or (None, None)
+    else:
+        menu_items, categories = extract_menu_items(html, structured=False)
+    return {
+        'structured': False,
+        'items': menu_items,
+        'categories': categories,
+        'menu_urls': structured_menu['menu_urls'] if structured_menu else []
+    }
+
+def parse_menu_items_from_html(html, url=""):
+    """
+    Extract menu items from a restaurant web page with BeautifulSoup heuristics
+    (the original extractor, kept for comparison with menu_html_extractor)
+    """
+    from bs4 import BeautifulSoup
+    try:
+        soup = BeautifulSoup(html, 'html.parser')
         
         # First, check for structured menu data
         menu_data = None
@@ -438,83 +626,182 @@ def extract_menu_items_from_website(url):
         logger.warning(f"Not enough menu items found on {url}")
         return None, None
         
+    except (NotProviderFailure, CircuitOpenError):
+        # Not the source's answer: the caller decides what a skipped call means
+        raise
     except Exception as e:
         logger.error(f"Error extracting menu items: {str(e)}")
         return None, None
 
-def get_real_menu(restaurant_name, address, place_id=None):
+def menu_from_yelp(restaurant_name, location_terms, place_id, deadline):
+    yelp_result = fetch_from_yelp(restaurant_name, location_terms, deadline=deadline)
+    if yelp_result:
+        menu_items = yelp_result.get('items')
+        if menu_items and len(menu_items) >= 3:
+            logger.info(f"Successfully found menu on Yelp with {len(menu_items)} items")
+            return menu_items, None, "Yelp", yelp_result.get('url')
+    return None
+
+def menu_from_website(restaurant_name, location_terms, place_id, deadline):
+    if not place_id:
+        raise SourceNotApplicable("no place_id to look up a website for")
+    place_details = get_place_details(place_id, profile="website-only", deadline=deadline)
+    website = place_details.get('website') if place_details else None
+    if website:
+        menu_items, menu_categories = extract_menu_items_from_website(website, deadline=deadline)
+        if menu_items:
+            logger.info(f"Successfully found menu on restaurant website with {len(menu_items)} items")
+            return menu_items, menu_categories, "Restaurant's official website", website
+    return None
+
+def menu_from_serper(restaurant_name, location_terms, place_id, deadline):
+    search_result = search_for_menu(restaurant_name, location_terms, deadline=deadline)
+    menu_url = search_result.get('link') if search_result else None
+    if menu_url:
+        menu_items, menu_categories = extract_menu_items_from_website(menu_url, deadline=deadline)
+        if menu_items:
+            logger.info(f"Successfully found menu via Serper search with {len(menu_items)} items")
+            return menu_items, menu_categories, search_result.get('source', 'Online search'), menu_url
+    return None
+
+def menu_from_serpapi(restaurant_name, location_terms, place_id, deadline):
+    serpapi_result = search_for_menu_with_serpapi(restaurant_name, location_terms, deadline=deadline)
+    menu_url = serpapi_result.get('link') if serpapi_result else None
+    if menu_url:
+        menu_items, menu_categories = extract_menu_items_from_website(menu_url, deadline=deadline)
+        if menu_items:
+            logger.info(f"Successfully found menu via SerpAPI with {len(menu_items)} items")
+            return menu_items, menu_categories, serpapi_result.get('source', 'SerpAPI search'), menu_url
+    return None
+
+# Menu sources in the order they are tried, with the breakers each one
+# depends on (a source is skipped while any of them is open)
+MENU_SOURCES = [
+    ("yelp", menu_from_yelp, ("serpapi", "yelp")),
+    ("website", menu_from_website, ("places",)),
+    ("serper", menu_from_serper, ("serper",)),
+    ("serpapi", menu_from_serpapi, ("serpapi",))
+]
+
+def restaurant_domain(place_id, fetch=False):
+    """
+    Website domain of a place from its cached details; with fetch, details
+    that are not cached yet are requested (website field only)
+    """
+    if not place_id:
+        return None
+    if fetch:
+        try:
+            details = get_place_details(place_id, profile="website-only")
+        except (NotProviderFailure, CircuitOpenError) as e:
+            logger.info(f"No website domain for {place_id}: {str(e)}")
+            details = None
+    else:
+        details = _cached_place_details(place_id, "website-only")
+    return domain_key(details.get('website')) if details and details.get('website') else None
+
+def explain_menu_sources(restaurant_name, place_id=None):
+    """
+    The order get_real_menu will try sources in for this restaurant, each with
+    the statistics scope, success rate, latency and score that placed it there
+    """
+    names = [name for name, _, _ in MENU_SOURCES]
+    return explain_source_order(names, restaurant_name, restaurant_domain(place_id))
+
+def _try_source(name, restaurant_name, location_terms, place_id, deadline, domain):
+    """Run one menu source and record its outcome; returns its result or None"""
+    source, breakers = next((source, breakers) for source_name, source, breakers in MENU_SOURCES if source_name == name)
+    with span("menu_source", source=name, restaurant=restaurant_name) as source_span:
+        open_breakers = [breaker for breaker in breakers if get_breaker(breaker).state == "open"]
+        if open_breakers:
+            logger.info(f"Skipping {name}: circuit open for {', '.join(open_breakers)}")
+            source_span.set(skipped="circuit open")
+            return None
+        started = time.monotonic()
+        result = None
+        try:
+            result = source(restaurant_name, location_terms, place_id, deadline)
+        except (SourceNotApplicable, CircuitOpenError) as e:
+            # Nothing was tried, so the source's statistics are left alone
+            logger.info(f"Skipping {name}: {str(e)}")
+            source_span.set(skipped=str(e))
+            return None
+        except NotProviderFailure as e:
+            # Cut short by our deadline or quota: says nothing about the source either
+            logger.warning(f"Menu source {name} stopped: {str(e)}")
+            source_span.set_error(e)
+            return None
+        except Exception as e:
+            logger.error(f"Error with menu source {name}: {str(e)}")
+            source_span.set_error(e)
+        record_attempt(name, bool(result), time.monotonic() - started, restaurant_name, domain)
+        source_span.set(found=bool(result))
+        return result
+
+_menu_flight = SingleFlight("real_menu")
+
+def get_real_menu(restaurant_name, address, place_id=None, deadline=None):
     """
     Main function to get a real menu for a restaurant
-    Falls back to different methods if one fails
+    Falls back to different methods if one fails. Sources are tried in the
+    order explain_menu_sources gives, share one Deadline
+    (MENU_DEADLINE_SECONDS by default), and are skipped while their circuit
+    breaker is open. Locations of a known chain reuse the chain's menu, and
+    concurrent calls for the same place share one lookup.
     """
+    key = location_key(restaurant_name, address, place_id)
+    with span("menu_lookup", restaurant=restaurant_name) as lookup_span:
+        menu, is_real, menu_url = _menu_flight.do(key, _find_real_menu, restaurant_name, address, place_id, deadline)
+        lookup_span.set(found=bool(is_real))
+        return menu, is_real, menu_url
+
+def _find_real_menu(restaurant_name, address, place_id=None, deadline=None):
     menu_items = None
     menu_categories = None
     menu_source = None
     menu_url = None
+    deadline = deadline or Deadline(MENU_DEADLINE_SECONDS)
     
     logger.info(f"Attempting to find real menu for: {restaurant_name} at {address}")
     
-    # Step 1: Try to fetch from Yelp first (often has the most reliable menus)
     location_terms = address.split(',')[0] if address else ""
-    try:
-        yelp_result = fetch_from_yelp(restaurant_name, location_terms)
-        if yelp_result:
-            menu_items = yelp_result.get('items')
-            if menu_items and len(menu_items) >= 3:
-                menu_source = "Yelp"
-                menu_url = yelp_result.get('url')
-                logger.info(f"Successfully found menu on Yelp with {len(menu_items)} items")
-    except Exception as e:
-        logger.error(f"Error fetching from Yelp: {str(e)}")
+    domain = restaurant_domain(place_id)
+    chain = detect_chain(restaurant_name, place_id, domain, address)
+    shared = get_chain_menu(chain, source="Web")
+    if shared:
+        logger.info(f"Using shared chain menu for {restaurant_name}")
+        return shared['menu'], True, shared['url']
     
-    # Step 2: If no Yelp menu, try to get place details and website
-    if not menu_items and place_id:
-        try:
-            place_details = get_place_details(place_id)
-            if place_details:
-                website = place_details.get('website')
-                if website:
-                    result = extract_menu_items_from_website(website)
-                    if result is not None and isinstance(result, tuple) and len(result) == 2:
-                        menu_items, menu_categories = result
-                        if menu_items:
-                            menu_source = "Restaurant's official website"
-                            menu_url = website
-                            logger.info(f"Successfully found menu on restaurant website with {len(menu_items)} items")
-        except Exception as e:
-            logger.error(f"Error extracting from restaurant website: {str(e)}")
+    ranking = explain_source_order([name for name, _, _ in MENU_SOURCES], restaurant_name, domain)
+    order = [choice['source'] for choice in ranking]
+    logger.info("Menu source order: " + ", ".join(
+        f"{choice['source']} ({choice['scope']}, score {choice['score']})" if choice['scope'] else f"{choice['source']} (no history)"
+        for choice in ranking))
     
-    # Step 3: If no menu found yet, try searching with Serper API
-    if not menu_items:
+    result = None
+    while order and not result:
+        if deadline.expired():
+            logger.warning(f"Menu deadline reached for {restaurant_name}; skipping remaining sources")
+            break
+        batch, order = order[:MENU_SOURCE_PARALLELISM], order[MENU_SOURCE_PARALLELISM:]
+        if len(batch) == 1:
+            result = _try_source(batch[0], restaurant_name, location_terms, place_id, deadline, domain)
+            continue
+        # Take the first source in the batch to return a menu
+        executor = ThreadPoolExecutor(max_workers=len(batch))
+        futures = [executor.submit(in_current_context(_try_source), name, restaurant_name, location_terms, place_id, deadline, domain)
+                   for name in batch]
         try:
-            search_result = search_for_menu(restaurant_name, location_terms)
-            if search_result:
-                menu_url = search_result.get('link')
-                if menu_url:
-                    result = extract_menu_items_from_website(menu_url)
-                    if result is not None and isinstance(result, tuple) and len(result) == 2:
-                        menu_items, menu_categories = result
-                        if menu_items:
-                            menu_source = search_result.get('source', 'Online search')
-                            logger.info(f"Successfully found menu via Serper search with {len(menu_items)} items")
-        except Exception as e:
-            logger.error(f"Error with Serper search: {str(e)}")
+            for future in as_completed(futures, timeout=deadline.remaining()):
+                result = future.result()
+                if result:
+                    break
+        except FuturesTimeoutError:
+            logger.warning(f"Menu deadline reached for {restaurant_name} while sources were running")
+        executor.shutdown(wait=False, cancel_futures=True)
     
-    # Step 4: Try with SerpAPI as a last resort
-    if not menu_items:
-        try:
-            serpapi_result = search_for_menu_with_serpapi(restaurant_name, location_terms)
-            if serpapi_result:
-                menu_url = serpapi_result.get('link')
-                if menu_url:
-                    result = extract_menu_items_from_website(menu_url)
-                    if result is not None and isinstance(result, tuple) and len(result) == 2:
-                        menu_items, menu_categories = result
-                        if menu_items:
-                            menu_source = serpapi_result.get('source', 'SerpAPI search')
-                            logger.info(f"Successfully found menu via SerpAPI with {len(menu_items)} items")
-        except Exception as e:
-            logger.error(f"Error with SerpAPI search: {str(e)}")
+    if result:
+        menu_items, menu_categories, menu_source, menu_url = result
     
     # Format the menu if we found one
     if menu_items and len(menu_items) >= 3:
@@ -597,6 +884,7 @@ def get_real_menu(restaurant_name, address, place_id=None):
             formatted_menu += f"View full menu: {menu_url}\n"
             
         logger.info(f"Successfully formatted real menu with source: {menu_source}")
+        set_chain_menu(chain, formatted_menu, "Web", menu_url)
         return formatted_menu, True, menu_url
     
     # Return None if no menu found
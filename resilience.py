@@ -0,0 +1,173 @@
+import os
+import time
+import threading
+import logging
+import requests
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('resilience')
+
+# A source's circuit opens after this many consecutive failures or slow
+# calls, and stays open (calls are skipped) for the cooldown
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", 3))
+BREAKER_SLOW_CALL_SECONDS = float(os.getenv("BREAKER_SLOW_CALL_SECONDS", 8))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("BREAKER_COOLDOWN_SECONDS", 60))
+# A timeout with this little of its Deadline left was cut short by the deadline
+DEADLINE_TIMEOUT_SLACK = 0.25  # seconds
+
+class NotProviderFailure(Exception):
+    """
+    A call that never reached the provider or was cut short by our own
+    limits (quota, throttling, deadlines). Circuit breakers do not count it
+    against the provider.
+    """
+
+class DeadlineExceeded(NotProviderFailure):
+    pass
+
+class CircuitOpenError(Exception):
+    pass
+
+class Deadline:
+    """A fixed point in time shared by every step of one operation"""
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def timeout(self, cap):
+        """Timeout for the next request: cap, shortened to the time left"""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"Deadline of {self.seconds}s exceeded")
+        return min(cap, remaining)
+
+def timeout_for(deadline, cap):
+    """Request timeout honouring an optional Deadline"""
+    return deadline.timeout(cap) if deadline is not None else cap
+
+class CircuitBreaker:
+    """
+    Skips calls to a source after repeated failures. Exceptions, HTTP 429
+    and 5xx responses and calls slower than slow_call_seconds all count as
+    failures; after failure_threshold of them in a row the circuit opens
+    for cooldown seconds, then a single trial call decides whether it
+    closes again.
+    """
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD,
+                 slow_call_seconds=BREAKER_SLOW_CALL_SECONDS, cooldown=BREAKER_COOLDOWN_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at < self.cooldown:
+                return "open"
+            return "half-open"
+
+    def allow(self):
+        """Whether a call may go ahead now (claims the trial call when half-open)"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self, duration=0.0):
+        if duration > self.slow_call_seconds:
+            logger.warning(f"Slow call to {self.name}: {duration:.1f}s")
+            self.record_failure()
+            return
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info(f"Circuit for {self.name} closed")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def release(self):
+        """End a call that says nothing about the provider's health (see NotProviderFailure)"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            reopen = self._trial_in_flight
+            self._trial_in_flight = False
+            if reopen or (self._opened_at is None and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                logger.warning(f"Circuit for {self.name} opened for {self.cooldown}s after {self._failures} failures")
+
+    def call(self, fn, /, *args, **kwargs):
+        """
+        Run fn through the breaker. Raises CircuitOpenError without calling
+        fn while the circuit is open. A result with a status_code of 429 or
+        5xx (requests or page_fetcher responses), or one the API scheduler
+        marked rate_limited, is recorded as a failure. NotProviderFailure
+        errors are raised without being recorded.
+        """
+        return self.call_within(None, fn, *args, **kwargs)
+
+    def call_within(self, deadline, fn, /, *args, **kwargs):
+        """
+        call() for a request whose timeout a Deadline may have shortened: a
+        timeout once the deadline has run out is ours, not the provider's,
+        and is not recorded. deadline and fn are positional-only, so fn can
+        take a deadline keyword of its own.
+        """
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} skipped: circuit open")
+        started = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except NotProviderFailure:
+            self.release()
+            raise
+        except Exception as e:
+            if deadline is not None and _is_timeout(e) and deadline.remaining() <= DEADLINE_TIMEOUT_SLACK:
+                self.release()
+            else:
+                self.record_failure()
+            raise
+        status = getattr(result, 'status_code', None)
+        if getattr(result, 'rate_limited', False) or (status is not None and (status == 429 or status >= 500)):
+            self.record_failure()
+        else:
+            self.record_success(time.monotonic() - started)
+        return result
+
+def _is_timeout(error):
+    return isinstance(error, (TimeoutError, requests.exceptions.Timeout))
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(name):
+    """The process-wide circuit breaker for a source"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name)
+        return breaker
+
+def breaker_states():
+    with _breakers_lock:
+        return {name: breaker.state for name, breaker in _breakers.items()}
@@ -2,11 +2,37 @@
 import requests
 import os
 import re
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from cache_store import PersistentLRUCache
+from api_scheduler import api_call
+from tracing import span, traced, in_current_context
 
 load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
+PLACES_API_BASE = os.getenv("PLACES_API_BASE", "https://maps.googleapis.com/maps/api/place")
+PLACES_NEARBY_URL = f"{PLACES_API_BASE}/nearbysearch/json"
+PLACES_MAX_RADIUS = 50000  # meters, Places API limit
+PLACES_MAX_PAGES = 3  # Nearby Search returns at most 3 pages of 20 results
+PLACES_PAGE_TOKEN_DELAY = 2  # seconds before a next_page_token becomes valid
+CUISINE_SEARCH_WORKERS = 4
+
+# Nearby searches are cached per geohash tile, radius and keyword. A search
+# is answered by the one tile holding its centre, so searches from
+# neighbouring users share it instead of hitting the API again.
+PLACES_TILE_TTL = int(os.getenv("PLACES_TILE_TTL", 6 * 60 * 60))  # seconds
+PLACES_TILE_MAX_ENTRIES = 5000
+# Largest tile half-diagonal, as a share of the search radius: larger tiles
+# are shared by more users but search further beyond the requested circle
+PLACES_TILE_MAX_OFFSET = 0.25
+EARTH_RADIUS_METERS = 6371000
+METERS_PER_DEGREE = 111320
+
+_tile_cache = PersistentLRUCache("places_tiles", max_entries=PLACES_TILE_MAX_ENTRIES, ttl=PLACES_TILE_TTL)
+
 def validate_coordinates(lat, lng):
     """
     Validate latitude and longitude coordinates
@@ -22,9 +48,190 @@ def validate_coordinates(lat, lng):
     except ValueError:
         return False, "Coordinates must be valid numbers."
 
-def get_nearby_restaurants(location, radius_meters=5000, cuisine_types=None):
+def haversine_meters(lat1, lng1, lat2, lng2):
+    """
+    Great-circle distance between two points in meters
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(a))
+
+def _tile_steps(bits):
+    """Height and width in degrees of a geohash cell with the given number of bits"""
+    lat_bits = bits // 2
+    lng_bits = bits - lat_bits
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lng_bits)
+
+def _geohash(lat_index, lng_index, bits):
+    """Interleave cell indices into a geohash value (longitude bit first)"""
+    lat_bits = bits // 2
+    lng_bits = bits - lat_bits
+    value = 0
+    for i in range(bits):
+        if i % 2 == 0:
+            bit = (lng_index >> (lng_bits - 1 - i // 2)) & 1
+        else:
+            bit = (lat_index >> (lat_bits - 1 - i // 2)) & 1
+        value = (value << 1) | bit
+    return value
+
+def _search_tile(lat, lng, radius_meters):
     """
-    Get nearby restaurants using Google Places API
+    The tile answering a search circle, as a (tile_key, center_lat,
+    center_lng, fetch_radius) tuple: the largest geohash tile holding the
+    centre whose half-diagonal is at most PLACES_TILE_MAX_OFFSET of the
+    radius, searched around its own centre with the radius widened by that
+    half-diagonal. One Nearby Search covers the circle of every search
+    centred in the tile, and the widened circle is only slightly larger
+    than the one searched.
+    """
+    for bits in range(2, 41):
+        lat_step, lng_step = _tile_steps(bits)
+        lat_index = min(int((lat + 90) // lat_step), int(180.0 / lat_step) - 1)
+        lng_index = min(int((lng + 180) // lng_step), int(360.0 / lng_step) - 1)
+        south = lat_index * lat_step - 90
+        west = lng_index * lng_step - 180
+        center_lat = south + lat_step / 2
+        center_lng = west + lng_step / 2
+        # The corner on the side nearer the equator is the farthest one
+        half_diagonal = max(haversine_meters(center_lat, center_lng, south, west),
+                            haversine_meters(center_lat, center_lng, south + lat_step, west))
+        if half_diagonal <= radius_meters * PLACES_TILE_MAX_OFFSET:
+            break
+    fetch_radius = min(math.ceil(radius_meters + half_diagonal), PLACES_MAX_RADIUS)
+    tile_key = f"{bits}:{_geohash(lat_index, lng_index, bits)}:{fetch_radius}"
+    return tile_key, center_lat, center_lng, fetch_radius
+
+def _format_place(place):
+    """Convert a Places API result into the restaurant dict used by the app"""
+    name = place.get('name', '')
+    rating = place.get('rating', 'N/A')
+    address = place.get('vicinity', 'Address unavailable')
+    place_id = place.get('place_id', '')
+    types = place.get('types', [])
+    price_level = place.get('price_level', 0)
+    location = place.get('geometry', {}).get('location', {})
+    
+    # Format price level as $ symbols
+    price_display = '$' * (price_level if price_level else 1)
+    
+    # Determine cuisine from types or default to restaurant
+    cuisine = next((t for t in types if t != 'restaurant' and not t.startswith('point_of_interest')), 'restaurant')
+    cuisine = cuisine.replace('_', ' ').title()
+    
+    return {
+        "name": name,
+        "rating": rating,
+        "address": address,
+        "place_id": place_id,
+        "cuisine": cuisine,
+        "price": price_display,
+        "lat": location.get('lat'),
+        "lng": location.get('lng')
+    }
+
+def _places_nearby_search(params, max_pages=1):
+    """
+    Run a Nearby Search and follow next_page_token for up to max_pages pages.
+    Returns (places, pages, next_page_token, error): pages is the number of
+    pages fetched and next_page_token the token of the next page still to
+    fetch, None when Google has no further pages. A page after the first
+    that fails ends the search with the pages fetched so far and the token
+    of the failed page, so a later search can resume from it.
+    """
+    places = []
+    for page in range(max_pages):
+        response = api_call("places", requests.get, PLACES_NEARBY_URL, params=params, timeout=10)
+        
+        # Add debug logging
+        if response.status_code != 200:
+            print(f"API Error: Status {response.status_code}")
+            print(f"Response: {response.text}")
+            if page == 0:
+                return None, 0, None, f"API Error: Status {response.status_code}"
+            return places, page, params['pagetoken'], None
+            
+        data = response.json()
+        
+        # A fresh page token is rejected until it becomes valid on Google's side
+        if 'pagetoken' in params and data.get('status') == 'INVALID_REQUEST':
+            time.sleep(PLACES_PAGE_TOKEN_DELAY)
+            response = api_call("places", requests.get, PLACES_NEARBY_URL, params=params, timeout=10)
+            data = response.json() if response.status_code == 200 else {'error_message': f"Status {response.status_code}"}
+        
+        if 'error_message' in data or data.get('status') not in (None, 'OK', 'ZERO_RESULTS'):
+            message = data.get('error_message') or data.get('status')
+            print(f"API Error: {message}")
+            if page == 0:
+                return None, 0, None, f"API Error: {message}"
+            return places, page, params['pagetoken'], None
+        
+        places.extend(data.get('results', []))
+        next_page_token = data.get('next_page_token')
+        if not next_page_token:
+            return places, page + 1, None, None
+        params = {'pagetoken': next_page_token, 'key': GOOGLE_API_KEY}
+        if page + 1 < max_pages:
+            time.sleep(PLACES_PAGE_TOKEN_DELAY)
+    return places, max_pages, params['pagetoken'], None
+
+def _fetch_tile(tile_key, center_lat, center_lng, fetch_radius, keyword, max_pages=1):
+    """
+    Return the restaurants for one geohash tile and keyword, from the tile
+    cache when it already holds max_pages pages (or every page Google has),
+    otherwise from a Nearby Search of fetch_radius around the tile's centre. A cached tile
+    with fewer pages is extended from its stored next_page_token.
+    Returns (restaurants, error).
+    """
+    cache_key = f"{tile_key}|{keyword.lower()}"
+    cached = _tile_cache.get(cache_key)
+    if isinstance(cached, dict) and (cached['exhausted'] or cached['pages'] >= max_pages):
+        return cached['results'], None
+
+    if isinstance(cached, dict) and cached.get('next_page_token'):
+        params = {'pagetoken': cached['next_page_token'], 'key': GOOGLE_API_KEY}
+        places, pages, next_page_token, error = _places_nearby_search(params, max_pages=max_pages - cached['pages'])
+        if not error:
+            restaurants = cached['results'] + [_format_place(place) for place in places]
+            _store_tile(cache_key, restaurants, cached['pages'] + pages, next_page_token)
+            return restaurants, None
+        # The token has expired: search the tile again from the first page
+
+    params = {
+        'location': f"{center_lat},{center_lng}",
+        'radius': fetch_radius,
+        'type': 'restaurant',
+        'key': GOOGLE_API_KEY
+    }
+    if keyword:
+        params['keyword'] = keyword
+    
+    places, pages, next_page_token, error = _places_nearby_search(params, max_pages=max_pages)
+    if error:
+        if isinstance(cached, dict):
+            return cached['results'], None
+        return None, error
+    
+    restaurants = [_format_place(place) for place in places]
+    _store_tile(cache_key, restaurants, pages, next_page_token)
+    return restaurants, None
+
+def _store_tile(cache_key, restaurants, pages, next_page_token):
+    _tile_cache.set(cache_key, {'results': restaurants, 'pages': pages, 'next_page_token': next_page_token,
+                                'exhausted': next_page_token is None})
+
+def clear_tile_cache():
+    """Forget every cached Nearby Search tile"""
+    _tile_cache.clear()
+
+def get_nearby_restaurants(location, radius_meters=5000, cuisine_types=None, max_pages=1):
+    """
+    Get nearby restaurants using Google Places API.
+    Results come from the geohash tile holding the search centre (fetched
+    and cached per tile, radius and keyword, following up to max_pages
+    result pages) and are filtered to the requested radius locally.
     """
     try:
         # Split and validate coordinates
@@ -38,68 +245,91 @@ def get_nearby_restaurants(location, radius_meters=5000, cuisine_types=None):
             return [], result
             
         lat_float, lng_float = result
-        base_url = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
-        
-        params = {
-            'location': f"{lat_float},{lng_float}",
-            'radius': radius_meters,
-            'type': 'restaurant',
-            'key': GOOGLE_API_KEY
-        }
+        radius_meters = min(int(radius_meters), PLACES_MAX_RADIUS)
         
         # Add keyword for cuisine if provided
+        keyword = ''
         if cuisine_types and len(cuisine_types) > 0:
             # Join multiple cuisines with OR for the keyword search
-            params['keyword'] = ' OR '.join(cuisine_types)
+            keyword = ' OR '.join(cuisine_types)
         
-        response = requests.get(base_url, params=params)
-        
-        # Add debug logging
-        if response.status_code != 200:
-            print(f"API Error: Status {response.status_code}")
-            print(f"Response: {response.text}")
-            return [], f"API Error: Status {response.status_code}"
-            
-        data = response.json()
+        tile_restaurants, error = _fetch_tile(*_search_tile(lat_float, lng_float, radius_meters), keyword, max_pages)
+        if error:
+            return [], error
         
-        if 'error_message' in data:
-            print(f"API Error: {data['error_message']}")
-            return [], f"API Error: {data['error_message']}"
+        # Keep Google's prominence order, dropping places outside the radius
+        restaurants = []
+        seen = set()
+        for restaurant in tile_restaurants:
+            if restaurant.get('lat') is None or restaurant.get('lng') is None:
+                continue
+            if haversine_meters(lat_float, lng_float, restaurant['lat'], restaurant['lng']) > radius_meters:
+                continue
+            key = restaurant.get('place_id') or restaurant.get('name')
+            if key not in seen:
+                seen.add(key)
+                restaurants.append(restaurant)
             
-        results = data.get('results', [])
-        
-        if not results:
+        if not restaurants:
             print(f"No results found for location: {location}")
             return [], "No restaurants found in this area. Try a different location or increasing the radius."
-            
-        # Extract restaurant details
-        restaurants = []
-        for place in results:
-            name = place.get('name', '')
-            rating = place.get('rating', 'N/A')
-            address = place.get('vicinity', 'Address unavailable')
-            place_id = place.get('place_id', '')
-            types = place.get('types', [])
-            price_level = place.get('price_level', 0)
-            
-            # Format price level as $ symbols
-            price_display = '$' * (price_level if price_level else 1)
-            
-            # Determine cuisine from types or default to restaurant
-            cuisine = next((t for t in types if t != 'restaurant' and not t.startswith('point_of_interest')), 'restaurant')
-            cuisine = cuisine.replace('_', ' ').title()
-            
-            restaurants.append({
-                "name": name,
-                "rating": rating,
-                "address": address,
-                "place_id": place_id,
-                "cuisine": cuisine,
-                "price": price_display
-            })
-            
+        
         return restaurants, None
 
     except Exception as e:
         print(f"Error fetching restaurants: {str(e)}")
         return [], f"Error: {str(e)}"
+
+@traced("restaurant_search")
+def search_restaurants_by_cuisine(location, radius_meters=5000, cuisines=None, top_n=3):
+    """
+    Search every cuisine concurrently and return (restaurants_by_cuisine, error),
+    where restaurants_by_cuisine maps each cuisine (in the given order) to at
+    most top_n restaurants. Places are deduplicated by place_id across
+    cuisines and kept under the first cuisine that lists them; cuisines left
+    short of top_n are searched again following next_page_token pagination.
+    Each returned restaurant carries the cuisine it was found for under
+    "search_cuisine".
+    """
+    # An empty cuisine searches all restaurants without a keyword
+    cuisines = list(cuisines) if cuisines else [""]
+
+    def search(cuisine, max_pages):
+        with span("cuisine_search", cuisine=cuisine or "any", max_pages=max_pages) as search_span:
+            result = get_nearby_restaurants(location, radius_meters=radius_meters,
+                                            cuisine_types=[cuisine] if cuisine else None,
+                                            max_pages=max_pages)
+            search_span.set(results=len(result[0]))
+            return result
+
+    def assign(results):
+        seen = set()
+        by_cuisine = {}
+        for cuisine in cuisines:
+            by_cuisine[cuisine] = []
+            for restaurant in results[cuisine][0]:
+                key = restaurant.get('place_id') or restaurant.get('name')
+                if key in seen:
+                    continue
+                if len(by_cuisine[cuisine]) < top_n:
+                    seen.add(key)
+                    by_cuisine[cuisine].append(dict(restaurant, search_cuisine=cuisine))
+        return by_cuisine
+
+    with ThreadPoolExecutor(max_workers=min(CUISINE_SEARCH_WORKERS, len(cuisines))) as executor:
+        results = dict(zip(cuisines, executor.map(in_current_context(lambda c: search(c, 1)), cuisines)))
+        by_cuisine = assign(results)
+
+        # Follow pagination only for cuisines that still need more places
+        short = [c for c in cuisines if len(by_cuisine[c]) < top_n and results[c][0]]
+        if short:
+            deeper = executor.map(in_current_context(lambda c: search(c, PLACES_MAX_PAGES)), short)
+            for cuisine, result in zip(short, deeper):
+                if result[0]:
+                    results[cuisine] = result
+            by_cuisine = assign(results)
+
+    if not any(by_cuisine.values()):
+        errors = [error for _, error in results.values() if error and error.startswith(("API Error", "Error"))]
+        return by_cuisine, errors[0] if errors else "No restaurants found for the selected cuisines."
+    return by_cuisine, None
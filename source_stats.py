@@ -0,0 +1,106 @@
+import re
+import threading
+import logging
+from urllib.parse import urlparse
+from cache_store import PersistentLRUCache
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('source_stats')
+
+# Statistics for a chain or domain are only used once they have this many
+# attempts for a source; below that the next broader scope decides
+MIN_SCOPE_ATTEMPTS = 3
+# Beta prior added to every success rate so new sources are neither
+# written off nor trusted after one call
+PRIOR_ATTEMPTS = 2
+PRIOR_SUCCESS_RATE = 0.5
+# Latency (seconds) at which a source's score is halved
+LATENCY_SCALE = 5.0
+STATS_MAX_ENTRIES = 5000
+
+_stats = PersistentLRUCache("source_stats", max_entries=STATS_MAX_ENTRIES)
+_lock = threading.Lock()
+
+def chain_key(restaurant_name):
+    """Normalized restaurant name shared by every location of a chain"""
+    name = re.sub(r"[^a-z0-9 ]", "", (restaurant_name or "").lower().replace("&", " and "))
+    name = re.sub(r"\s+", " ", name).strip()
+    return re.sub(r"^the ", "", name)
+
+def domain_key(url):
+    """Registered host of a URL without a leading www."""
+    host = urlparse(url or "").netloc.lower().split(':')[0]
+    return host[4:] if host.startswith("www.") else host
+
+def _scopes(restaurant_name=None, domain=None):
+    """Stat scopes from most to least specific"""
+    scopes = []
+    if restaurant_name and chain_key(restaurant_name):
+        scopes.append(f"chain:{chain_key(restaurant_name)}")
+    if domain:
+        scopes.append(f"domain:{domain}")
+    scopes.append("global")
+    return scopes
+
+def record_attempt(source, success, latency, restaurant_name=None, domain=None):
+    """Add one attempt of source (with its latency in seconds) to every scope, in one write"""
+    with _lock:
+        updates = {}
+        for scope in _scopes(restaurant_name, domain):
+            key = f"{scope}|{source}"
+            entry = _stats.get(key) or {'attempts': 0, 'successes': 0, 'total_latency': 0.0}
+            updates[key] = {
+                'attempts': entry['attempts'] + 1,
+                'successes': entry['successes'] + (1 if success else 0),
+                'total_latency': entry['total_latency'] + latency
+            }
+        _stats.set_many(updates)
+
+def _score(entry):
+    success_rate = (entry['successes'] + PRIOR_ATTEMPTS * PRIOR_SUCCESS_RATE) / (entry['attempts'] + PRIOR_ATTEMPTS)
+    mean_latency = entry['total_latency'] / entry['attempts'] if entry['attempts'] else 0.0
+    return success_rate / (1 + mean_latency / LATENCY_SCALE), success_rate, mean_latency
+
+def explain_source_order(sources, restaurant_name=None, domain=None):
+    """
+    Rank sources for one restaurant by expected value: smoothed success rate
+    discounted by mean latency, using the most specific scope (chain, then
+    domain, then global) with at least MIN_SCOPE_ATTEMPTS attempts. Sources
+    without statistics keep their default position. Returns one dict per
+    source, best first, with the scope and numbers behind its score.
+    """
+    ranked = []
+    for position, source in enumerate(sources):
+        choice = {'source': source, 'scope': None, 'attempts': 0, 'success_rate': None,
+                  'mean_latency': None, 'score': None, 'default_position': position}
+        for scope in _scopes(restaurant_name, domain):
+            entry = _stats.peek(f"{scope}|{source}")
+            if entry and (scope == "global" or entry['attempts'] >= MIN_SCOPE_ATTEMPTS):
+                score, success_rate, mean_latency = _score(entry)
+                choice.update(scope=scope, attempts=entry['attempts'], score=round(score, 3),
+                              success_rate=round(success_rate, 3), mean_latency=round(mean_latency, 2))
+                break
+        ranked.append(choice)
+
+    # Sources with no history are scored as the prior with no latency
+    prior_score = PRIOR_SUCCESS_RATE
+    ranked.sort(key=lambda choice: (-(choice['score'] if choice['score'] is not None else prior_score),
+                                    choice['default_position']))
+    return ranked
+
+def get_source_stats():
+    """All recorded statistics as {scope: {source: {...}}}"""
+    stats = {}
+    for key in _stats.keys():
+        entry = _stats.peek(key)
+        if entry is None:
+            continue
+        scope, source = key.rsplit('|', 1)
+        score, success_rate, mean_latency = _score(entry)
+        stats.setdefault(scope, {})[source] = dict(entry, success_rate=round(success_rate, 3),
+                                                   mean_latency=round(mean_latency, 2), score=round(score, 3))
+    return stats
+
+def clear_source_stats():
+    _stats.clear()
@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+# Caches and API keys are read at import time: keep the tests off real
+# services and away from the app's own cache directory
+os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="tests-cache-")
+for key in ("GOOGLE_API_KEY", "SERPER_API_KEY", "SERPAPI_API_KEY"):
+    os.environ.setdefault(key, "test-key")
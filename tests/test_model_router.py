@@ -0,0 +1,33 @@
+import time
+import pytest
+
+import model_router
+import resilience
+from llm_meter import BudgetExceeded
+
+def half_open_breaker(model):
+    breaker = resilience.get_breaker(f"llm:{model}")
+    breaker._opened_at = time.monotonic() - breaker.cooldown - 1
+    return breaker
+
+def test_budget_exceeded_frees_the_half_open_trial(monkeypatch):
+    router = model_router.ModelRouter()
+    model = router.candidates("chat_advice")[0]
+    breaker = half_open_breaker(model)
+
+    def over_budget_mid_call(*args, **kwargs):
+        raise BudgetExceeded("over budget")
+    def over_budget_mid_stream(*args, **kwargs):
+        yield over_budget_mid_call()
+    monkeypatch.setattr(model_router, "over_budget", lambda: False)
+    monkeypatch.setattr(model_router, "metered_call", over_budget_mid_call)
+    monkeypatch.setattr(model_router, "metered_stream", over_budget_mid_stream)
+
+    with pytest.raises(BudgetExceeded):
+        router.kickoff("chat_advice", "chat", make_crew=None)
+    assert breaker.allow()
+    breaker.release()
+
+    with pytest.raises(BudgetExceeded):
+        next(router.stream("chat_advice", "chat", messages=[]))
+    assert breaker.allow()
@@ -0,0 +1,47 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+import page_fetcher
+from page_fetcher import MenuStopCondition, fetch_page
+
+MENU = '<div class="menu"><p>Soup $6</p><p>Salad $8</p><p>Steak $24</p></div>'
+TAIL = '<p>' + 'x' * 200 * 1024 + '</p>'
+
+class PageHandler(BaseHTTPRequestHandler):
+    bodies = []
+
+    def do_GET(self):
+        etag, body = self.bodies.pop(0)
+        data = body.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def site(monkeypatch):
+    monkeypatch.setattr(page_fetcher, "HOST_MIN_INTERVAL", 0)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/menu"
+    server.shutdown()
+    page_fetcher.clear_http_cache()
+
+def test_revalidated_page_with_changed_body_stops_at_its_own_menu(site):
+    PageHandler.bodies[:] = [
+        ('"v1"', '<p>' + 'a' * 60 * 1024 + '</p>' + MENU + TAIL),
+        ('"v2"', MENU + TAIL)
+    ]
+    first = fetch_page(site, stop_when=MenuStopCondition())
+    assert first.stopped_early
+
+    second = fetch_page(site, stop_when=MenuStopCondition())
+    assert not second.from_cache
+    assert second.stopped_early
+    assert second.bytes_read < len(MENU + TAIL)
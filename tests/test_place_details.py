@@ -0,0 +1,13 @@
+import real_menu_fetcher
+import resilience
+
+def test_prefetch_skips_places_behind_an_open_circuit():
+    breaker = resilience.get_breaker("places")
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    try:
+        assert real_menu_fetcher.prefetch_place_details(["stub-place-1", "stub-place-2", None]) == {
+            "stub-place-1": None, "stub-place-2": None
+        }
+    finally:
+        breaker.record_success()
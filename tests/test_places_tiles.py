@@ -0,0 +1,48 @@
+import random
+import pytest
+
+import restaurant_recommender
+from restaurant_recommender import haversine_meters, search_restaurants_by_cuisine, _search_tile
+
+class FakeResponse:
+    status_code = 200
+    headers = {'Content-Type': 'application/json'}
+
+    def __init__(self, lat, lng):
+        self.lat, self.lng = lat, lng
+
+    def json(self):
+        return {'status': 'OK', 'results': [
+            {'name': f"Place {i}", 'place_id': f"place-{self.lat:.4f}-{self.lng:.4f}-{i}", 'types': ['restaurant'],
+             'geometry': {'location': {'lat': self.lat + i * 0.001, 'lng': self.lng}}}
+            for i in range(20)
+        ]}
+
+@pytest.fixture
+def places_calls(monkeypatch):
+    calls = []
+    def fake_api_call(provider, fn, url, params=None, **kwargs):
+        calls.append(params)
+        lat, lng = map(float, params['location'].split(','))
+        return FakeResponse(lat, lng)
+    monkeypatch.setattr(restaurant_recommender, "api_call", fake_api_call)
+    restaurant_recommender._tile_cache.clear()
+    return calls
+
+def test_cold_search_makes_one_places_call_per_cuisine(places_calls):
+    random.seed(7)
+    for _ in range(20):
+        location = f"{random.uniform(-60, 60):.5f},{random.uniform(-180, 180):.5f}"
+        places_calls.clear()
+        by_cuisine, error = search_restaurants_by_cuisine(location, cuisines=["Italian", "Thai"])
+        assert error is None
+        assert len(places_calls) == 2
+
+def test_search_tile_covers_the_search_circle():
+    random.seed(11)
+    for _ in range(200):
+        lat, lng = random.uniform(-70, 70), random.uniform(-180, 180)
+        radius = random.choice([1000, 5000, 20000])
+        _, center_lat, center_lng, fetch_radius = _search_tile(lat, lng, radius)
+        assert haversine_meters(center_lat, center_lng, lat, lng) + radius <= fetch_radius
+        assert fetch_radius <= radius * 1.25 + 1
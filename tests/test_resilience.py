@@ -0,0 +1,7 @@
+from resilience import CircuitBreaker, Deadline
+
+def test_call_within_passes_deadline_keyword_to_fn():
+    deadline = Deadline(5)
+    fetch = lambda url, deadline=None: (url, deadline)
+    assert CircuitBreaker("pages").call_within(deadline, fetch, "https://example.com", deadline=deadline) \
+        == ("https://example.com", deadline)
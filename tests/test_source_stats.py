@@ -0,0 +1,44 @@
+import time
+import pytest
+
+import real_menu_fetcher
+import resilience
+import source_stats
+from resilience import Deadline
+
+@pytest.fixture(autouse=True)
+def fresh_state():
+    source_stats.clear_source_stats()
+    with resilience._breakers_lock:
+        resilience._breakers.clear()
+    yield
+    source_stats.clear_source_stats()
+
+def try_source(name, deadline=None):
+    return real_menu_fetcher._try_source(name, "Stub Bistro", "Market St", "stub-place-0",
+                                         deadline or Deadline(5), None)
+
+def test_breaker_with_trial_in_flight_leaves_stats_unchanged():
+    breaker = resilience.get_breaker("serper")
+    breaker._opened_at = time.monotonic() - breaker.cooldown - 1
+    assert breaker.allow()  # another lookup holds the half-open trial
+    assert try_source("serper") is None
+    assert source_stats.get_source_stats() == {}
+
+def test_expired_deadline_leaves_stats_unchanged():
+    deadline = Deadline(0)
+    assert try_source("serpapi", deadline) is None
+    assert try_source("yelp", deadline) is None
+    assert source_stats.get_source_stats() == {}
+
+def test_missing_key_leaves_stats_unchanged(monkeypatch):
+    monkeypatch.setattr(real_menu_fetcher, "SERPAPI_API_KEY", None)
+    monkeypatch.setattr(real_menu_fetcher, "SERPER_API_KEY", None)
+    for name in ("yelp", "serper", "serpapi"):
+        assert try_source(name) is None
+    assert source_stats.get_source_stats() == {}
+
+def test_answered_attempt_is_recorded(monkeypatch):
+    monkeypatch.setattr(real_menu_fetcher, "search_for_menu", lambda *args, **kwargs: None)
+    try_source("serper")
+    assert source_stats.get_source_stats()["global"]["serper"]["attempts"] == 1
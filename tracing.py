@@ -0,0 +1,249 @@
+import os
+import json
+import time
+import queue
+import random
+import threading
+import atexit
+import logging
+import functools
+from contextvars import ContextVar, copy_context
+import requests
+from cache_store import CACHE_DIR
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('tracing')
+
+# Where finished spans go: "" (not exported), "jsonl" (one JSON object per
+# line in TRACE_FILE) or "otlp" (OTLP/HTTP JSON to an OpenTelemetry collector)
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(CACHE_DIR, "traces.jsonl"))
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318").rstrip("/")
+TRACE_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "cgm-travel-assistant")
+TRACE_BATCH_SIZE = 100
+TRACE_FLUSH_SECONDS = 2.0
+
+_current_span = ContextVar("current_span", default=None)
+
+def _new_id(bits):
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+class Span:
+    """
+    One timed step of a request. Used as a context manager it becomes the
+    current span, so spans started inside it (in this thread, or in work
+    handed to other threads through in_current_context) are its children.
+    """
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else _new_id(128)
+        self.span_id = _new_id(64)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+        self._token = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+        return self
+
+    def set_error(self, error):
+        self.error = f"{type(error).__name__}: {error}"
+
+    @property
+    def duration_ms(self):
+        end_ns = self.end_ns or time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            # A span started with start_trace stops being current here
+            if _current_span.get() is self:
+                _current_span.set(self.parent)
+            _exporter.export(self)
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.set_error(exc)
+        _current_span.reset(self._token)
+        self.end()
+        return False
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_ns / 1e9,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error
+        }
+
+def span(name, **attributes):
+    """A child of the current span (or a new trace); use in a with block"""
+    return Span(name, _current_span.get(), attributes)
+
+def start_trace(name, **attributes):
+    """
+    Begin a new trace for one user request and make it current until
+    end() is called. For request handlers that cannot wrap their body in
+    a with block.
+    """
+    root = Span(name, None, attributes)
+    _current_span.set(root)
+    return root
+
+def current_span():
+    return _current_span.get()
+
+def traced(name=None, **attributes):
+    """Decorator running the function inside a span"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name or fn.__name__, **attributes):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def in_current_context(fn):
+    """
+    Wrap fn so that it runs under the spans current where it was wrapped.
+    Thread pools and threads do not inherit context variables, so pass work
+    through this to keep its spans in the request's trace.
+    """
+    context = copy_context()
+    def wrapper(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return wrapper
+
+def usage_counts(result):
+    """
+    Token counts of a crewai CrewOutput (token_usage) or an OpenAI response
+    (usage) as a dict with whichever of prompt_tokens, completion_tokens,
+    total_tokens and successful_requests it reports
+    """
+    usage = result.get("usage") if isinstance(result, dict) else (
+        getattr(result, "token_usage", None) or getattr(result, "usage", None))
+    if usage is None:
+        return {}
+    read = usage.get if isinstance(usage, dict) else lambda key: getattr(usage, key, None)
+    counts = {}
+    for key in ("prompt_tokens", "completion_tokens", "total_tokens", "successful_requests"):
+        value = read(key)
+        if value is not None:
+            counts[key] = value
+    return counts
+
+def record_llm_usage(llm_span, result, model=None):
+    """Copy model and token counts onto an LLM span"""
+    if model:
+        llm_span.set(model=model)
+    llm_span.set(**usage_counts(result))
+
+def crew_model(crew):
+    """Models used by a crew's agents, comma separated"""
+    return ",".join(sorted({str(getattr(getattr(agent, "llm", None), "model", None) or "unknown") for agent in crew.agents}))
+
+def traced_kickoff(task, crew, kickoff=None):
+    """
+    crew.kickoff(), or kickoff() when given, inside an llm_crew span
+    recording the agents' models and token usage
+    """
+    with span("llm_crew", task=task, model=crew_model(crew)) as llm_span:
+        result = (kickoff or crew.kickoff)()
+        record_llm_usage(llm_span, result)
+        return result
+
+class SpanExporter:
+    """Writes finished spans from a background thread so requests never wait on I/O"""
+    def __init__(self, mode):
+        self.mode = mode
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def export(self, finished):
+        if not self.mode:
+            return
+        self._queue.put(finished.to_dict())
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + TRACE_FLUSH_SECONDS
+            while len(batch) < TRACE_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                if self.mode == "otlp":
+                    self._send_otlp(batch)
+                else:
+                    self._write_jsonl(batch)
+            except Exception as e:
+                logger.warning(f"Could not export {len(batch)} spans: {str(e)}")
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self, timeout=TRACE_FLUSH_SECONDS + 5):
+        """Wait (up to timeout seconds) until queued spans are exported"""
+        give_up_at = time.monotonic() + timeout
+        while self._thread is not None and self._queue.unfinished_tasks and time.monotonic() < give_up_at:
+            time.sleep(0.05)
+
+    def _write_jsonl(self, batch):
+        os.makedirs(os.path.dirname(TRACE_FILE) or ".", exist_ok=True)
+        with open(TRACE_FILE, "a") as f:
+            for record in batch:
+                f.write(json.dumps(record, default=str) + "\n")
+
+    def _send_otlp(self, batch):
+        spans = [{
+            "traceId": record["trace_id"],
+            "spanId": record["span_id"],
+            "parentSpanId": record["parent_id"] or "",
+            "name": record["name"],
+            "kind": 1,
+            "startTimeUnixNano": str(int(record["start"] * 1e9)),
+            "endTimeUnixNano": str(int(record["start"] * 1e9 + record["duration_ms"] * 1e6)),
+            "attributes": [_otlp_attribute(key, value) for key, value in record["attributes"].items()],
+            "status": {"code": 2, "message": record["error"]} if record["error"] else {"code": 1}
+        } for record in batch]
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", TRACE_SERVICE_NAME)]},
+            "scopeSpans": [{"scope": {"name": "tracing"}, "spans": spans}]
+        }]}
+        response = requests.post(f"{OTLP_ENDPOINT}/v1/traces", json=payload, timeout=5)
+        response.raise_for_status()
+
+def _otlp_attribute(key, value):
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+_exporter = SpanExporter(TRACE_EXPORT if TRACE_EXPORT in ("jsonl", "otlp") else "")
+atexit.register(_exporter.flush)